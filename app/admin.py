@@ -1,6 +1,89 @@
 from django.contrib.auth.admin import UserAdmin
 from django.contrib import admin
-from .models import CustomUser, FitnessClass, Booking
+import datetime
+
+from django import forms
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.functional import cached_property
+from django.utils.html import format_html
+from .models import CustomUser, ClassSchedule, FitnessClass, Booking, WaitlistEntry, ArchivedFitnessClass, ArchivedBooking
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for changelists over very large tables. An exact COUNT(*)
+    reads the whole table or index on every page load, so the count is
+    capped at ADMIN_COUNT_LIMIT rows. On PostgreSQL an unfiltered list uses
+    the planner's row estimate instead, so every page stays reachable.
+    Filtered lists above the cap show the cap, and admins narrow them with
+    filters or search.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        limit = getattr(settings, 'ADMIN_COUNT_LIMIT', 10000)
+        if not queryset.query.where:
+            estimate = self.estimate(queryset)
+            if estimate is not None and estimate > limit:
+                return estimate
+        return queryset.order_by().values('pk')[:limit].count()
+
+    @staticmethod
+    def estimate(queryset):
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [connection.ops.quote_name(queryset.model._meta.db_table)],
+            )
+            row = cursor.fetchone()
+        # reltuples is -1 for a table that has never been analyzed.
+        return row[0] if row and row[0] >= 0 else None
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Changelist settings that keep page loads bounded on million-row tables:
+    capped counts, no second unfiltered COUNT(*), and sorting only on
+    indexed columns (set sortable_by per admin).
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class ClassDateFilter(admin.SimpleListFilter):
+    title = 'class date'
+    parameter_name = 'when'
+
+    def lookups(self, request, model_admin):
+        return (
+            ('upcoming', 'Upcoming'),
+            ('today', 'Today'),
+            ('next_7_days', 'Next 7 days'),
+            ('past', 'Past'),
+        )
+
+    def queryset(self, request, queryset):
+        # Range lookups on date_time only, so the date_time index is used.
+        now = timezone.now()
+        start_of_today = timezone.localtime(now).replace(hour=0, minute=0, second=0, microsecond=0)
+        if self.value() == 'upcoming':
+            return queryset.filter(date_time__gte=now)
+        if self.value() == 'today':
+            return queryset.filter(date_time__gte=start_of_today, date_time__lt=start_of_today + datetime.timedelta(days=1))
+        if self.value() == 'next_7_days':
+            return queryset.filter(date_time__gte=now, date_time__lt=now + datetime.timedelta(days=7))
+        if self.value() == 'past':
+            return queryset.filter(date_time__lt=now)
+        return queryset
+
 
 @admin.register(CustomUser)
 class CustomUserAdmin(UserAdmin):
@@ -23,14 +106,122 @@ class CustomUserAdmin(UserAdmin):
     ordering = ('email',)
 
 @admin.register(FitnessClass)
-class FitnessClassAdmin(admin.ModelAdmin):
-    list_display = ('id', 'name', 'date_time', 'instructor', 'total_slots', 'available_slots')
-    list_filter = ('instructor', 'date_time')
+class FitnessClassAdmin(LargeTableAdmin):
+    list_display = ('id', 'name', 'date_time', 'instructor', 'total_slots', 'available_slots', 'shard_count', 'bookings_link')
+    list_filter = (ClassDateFilter,)
+    # Exact matches, answered from the name and instructor indexes.
+    search_fields = ('name__exact', 'instructor__exact')
+    search_help_text = "Exact class name or instructor."
+    sortable_by = ('id', 'date_time')
+    raw_id_fields = ('schedule',)
+    readonly_fields = ('shard_count',)
+    actions = ['shard_seats', 'unshard_seats']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_free_seats()
+
+    def get_readonly_fields(self, request, obj=None):
+        # A sharded class's seats live in its shards, which overwrite available_slots.
+        if obj is not None and obj.shard_count:
+            return (*self.readonly_fields, 'available_slots')
+        return self.readonly_fields
+
+    @admin.display(description="Bookings")
+    def bookings_link(self, obj):
+        url = reverse('admin:app_booking_changelist') + f'?fitness_class__id__exact={obj.pk}'
+        return format_html('<a href="{}">{} booked</a>', url, obj.total_slots - obj.available_slots)
+
+    @admin.action(description="Shard seats for high-demand booking")
+    def shard_seats(self, request, queryset):
+        shard_count = getattr(settings, 'SLOT_SHARD_COUNT', 8)
+        for fitness_class in queryset:
+            fitness_class.set_shard_count(shard_count)
+        self.message_user(request, f"Split the seats of {len(queryset)} classes over {shard_count} shards.")
+
+    @admin.action(description="Unshard seats")
+    def unshard_seats(self, request, queryset):
+        for fitness_class in queryset.filter(shard_count__gt=0):
+            fitness_class.set_shard_count(0)
+        self.message_user(request, "Folded the shards back into available slots.")
+
+@admin.register(ClassSchedule)
+class ClassScheduleAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'instructor', 'weekdays', 'start_time', 'timezone', 'capacity', 'starts_on', 'ends_on')
+    list_filter = ('instructor',)
     search_fields = ('name', 'instructor')
+    actions = ['materialize']
+
+    @admin.action(description="Generate classes for the scheduling horizon")
+    def materialize(self, request, queryset):
+        until = timezone.localdate() + datetime.timedelta(days=getattr(settings, 'SCHEDULE_HORIZON_DAYS', 90))
+        created = sum(schedule.materialize(until) for schedule in queryset)
+        self.message_user(request, f"Created {created} classes from {len(queryset)} schedules up to {until}.")
+
+# Bookings and waitlist entries are narrowed to one class from the class
+# changelist's "booked" link (?fitness_class__id__exact=<id>) rather than a
+# sidebar filter listing every class.
+class BookingAdminForm(forms.ModelForm):
+
+    def clean(self):
+        cleaned_data = super().clean()
+        fitness_class = cleaned_data.get('fitness_class')
+        # Saving a new booking claims a seat like POST /api/book/ (see BookingManager.add()).
+        if self.instance._state.adding and fitness_class is not None:
+            if fitness_class.shard_count:
+                has_seats = fitness_class.slot_shards.filter(available__gt=0).exists()
+            else:
+                has_seats = fitness_class.available_slots > 0
+            if not has_seats:
+                raise forms.ValidationError("No available slots for this class.")
+        return cleaned_data
 
 @admin.register(Booking)
-class BookingAdmin(admin.ModelAdmin):
+class BookingAdmin(LargeTableAdmin):
+    form = BookingAdminForm
     list_display = ('id','fitness_class', 'client_name', 'client_email', 'booking_time')
-    list_filter = ('fitness_class', 'booking_time')
-    search_fields = ('client_name', 'client_email')
+    list_select_related = ('fitness_class',)
+    list_filter = ('booking_time',)
+    search_fields = ('client_email__exact',)
+    search_help_text = "Exact client email."
+    sortable_by = ('id', 'booking_time')
+    raw_id_fields = ('fitness_class',)
+
+@admin.register(WaitlistEntry)
+class WaitlistEntryAdmin(LargeTableAdmin):
+    list_display = ('id', 'fitness_class', 'client_name', 'client_email', 'joined_at')
+    list_select_related = ('fitness_class',)
+    search_fields = ('client_email__exact',)
+    search_help_text = "Exact client email."
+    sortable_by = ('id', 'joined_at')
+    raw_id_fields = ('fitness_class',)
+
+
+class ArchiveAdmin(LargeTableAdmin):
+    """
+    Read-only: archive rows are only written by the archive_classes command.
+    """
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(ArchivedFitnessClass)
+class ArchivedFitnessClassAdmin(ArchiveAdmin):
+    list_display = ('id', 'name', 'date_time', 'instructor', 'total_slots', 'archived_at')
+    search_fields = ('name__exact', 'instructor__exact')
+    search_help_text = "Exact class name or instructor."
+    sortable_by = ('id', 'date_time')
 
+@admin.register(ArchivedBooking)
+class ArchivedBookingAdmin(ArchiveAdmin):
+    list_display = ('id', 'fitness_class', 'client_name', 'client_email', 'booking_time')
+    list_select_related = ('fitness_class',)
+    search_fields = ('client_email__exact',)
+    search_help_text = "Exact client email."
+    sortable_by = ('id', 'booking_time')
+    raw_id_fields = ('fitness_class',)
@@ -4,3 +4,18 @@ from django.apps import AppConfig
 class AppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app'
+
+    def ready(self):
+        from django.core import checks
+        from django.db.backends.signals import connection_created
+        from . import cache, hashing, log
+        from .idempotency import check_idempotency_cache
+        from .metrics import install_query_wrapper, registry
+        from .routers import check_replica_pin_cache
+        log.configure_from_settings()
+        connection_created.connect(install_query_wrapper, dispatch_uid='app.metrics.install_query_wrapper')
+        checks.register(check_idempotency_cache, checks.Tags.caches, deploy=True)
+        checks.register(check_replica_pin_cache, checks.Tags.caches, deploy=True)
+        registry.add_collector(cache.collect_metrics)
+        registry.add_collector(hashing.collect_metrics)
+        registry.add_collector(log.collect_metrics)
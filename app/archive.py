@@ -0,0 +1,60 @@
+"""
+Archival of classes that started long ago, with their bookings.
+
+The hot queries only read upcoming classes and a client's recent bookings,
+but the live tables' indexes (and, on PostgreSQL, vacuum) grow with all of
+history. archive_batch() copies the oldest classes before a cutoff into
+ArchivedFitnessClass, with their bookings into ArchivedBooking, and deletes
+them from the live tables, so those stay bounded by the archive horizon.
+
+Each batch is copied and deleted in one transaction, oldest first. An
+interrupted run never leaves a class half-moved, and the next run carries
+on from the oldest class still live. Their waitlist entries and slot
+shards are dropped with the class; a sharded class is archived with its
+shard total as available_slots, since its stored value is only exact at
+zero.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ArchivedBooking, ArchivedFitnessClass, Booking, FitnessClass
+
+CLASS_FIELDS = ('id', 'name', 'date_time', 'instructor', 'total_slots', 'available_slots', 'updated_at')
+BOOKING_FIELDS = ('id', 'fitness_class_id', 'client_name', 'client_email', 'booking_time', 'updated_at')
+
+
+def archivable_classes(cutoff, using=None):
+    """
+    Live classes that started before `cutoff`, oldest first.
+    """
+    return FitnessClass.objects.using(using).filter(date_time__lt=cutoff).order_by('date_time', 'id')
+
+
+def archive_batch(cutoff, batch_size=500, using=None):
+    """
+    Moves up to `batch_size` of the oldest classes that started before
+    `cutoff`, and their bookings, to the archive tables. Returns the number
+    of (classes, bookings) moved; (0, 0) once nothing is left to archive.
+    """
+    with transaction.atomic(using=using):
+        classes = [
+            {field: getattr(fitness_class, field) for field in CLASS_FIELDS}
+            for fitness_class in archivable_classes(cutoff, using).with_free_seats()[:batch_size]
+        ]
+        if not classes:
+            return 0, 0
+        class_ids = [fitness_class['id'] for fitness_class in classes]
+        bookings = list(Booking.objects.using(using).filter(fitness_class_id__in=class_ids).values(*BOOKING_FIELDS))
+
+        archived_at = timezone.now()
+        # ignore_conflicts: rows restored by hand and archived again keep their first copy.
+        ArchivedFitnessClass.objects.using(using).bulk_create(
+            [ArchivedFitnessClass(archived_at=archived_at, **fitness_class) for fitness_class in classes],
+            ignore_conflicts=True,
+        )
+        ArchivedBooking.objects.using(using).bulk_create(
+            [ArchivedBooking(**booking) for booking in bookings], ignore_conflicts=True,
+        )
+        # Cascades to the bookings, waitlist entries and slot shards.
+        FitnessClass.objects.using(using).filter(id__in=class_ids).delete()
+    return len(classes), len(bookings)
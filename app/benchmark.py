@@ -0,0 +1,126 @@
+"""
+Small helpers shared by the benchmark management commands.
+"""
+import datetime
+import math
+import random
+import time
+from contextlib import contextmanager
+
+from django.utils import timezone
+
+# Seeded rows are tagged with this instructor so they can be removed afterwards.
+BENCHMARK_INSTRUCTOR = '__benchmark__'
+
+
+def percentile(samples, pct):
+    """
+    Nearest-rank percentile of a list of numbers, e.g. percentile(latencies, 99).
+    """
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(samples):
+    """
+    Latency summary in milliseconds for a list of durations in seconds.
+    """
+    return {
+        'count': len(samples),
+        'mean': sum(samples) / len(samples) * 1000 if samples else 0.0,
+        'p50': percentile(samples, 50) * 1000,
+        'p95': percentile(samples, 95) * 1000,
+        'p99': percentile(samples, 99) * 1000,
+        'max': max(samples) * 1000 if samples else 0.0,
+    }
+
+
+def format_summary(summary):
+    return (
+        f"p50={summary['p50']:.2f}ms p95={summary['p95']:.2f}ms "
+        f"p99={summary['p99']:.2f}ms max={summary['max']:.2f}ms (n={summary['count']})"
+    )
+
+
+@contextmanager
+def stopwatch(samples):
+    """
+    Append the duration of the `with` block, in seconds, to `samples`.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        samples.append(time.perf_counter() - start)
+
+
+def seed_classes(count, batch_size=10_000, full_ratio=0.2, seed=0):
+    """
+    bulk_create `count` benchmark classes spread over half a year of history
+    and half a year of schedule, a `full_ratio` share of them with no seats left.
+    """
+    from .models import FitnessClass
+
+    now = timezone.now()
+    rng = random.Random(seed)
+    created = 0
+    while created < count:
+        batch = []
+        for _ in range(min(batch_size, count - created)):
+            total_slots = rng.randint(5, 50)
+            batch.append(FitnessClass(
+                name='Benchmark class',
+                date_time=now + datetime.timedelta(minutes=15 * rng.randint(-17_280, 17_280)),
+                instructor=BENCHMARK_INSTRUCTOR,
+                total_slots=total_slots,
+                available_slots=0 if rng.random() < full_ratio else rng.randint(1, total_slots),
+            ))
+        FitnessClass.objects.bulk_create(batch)
+        created += len(batch)
+
+
+def seed_open_classes(count, min_slots=5, max_slots=50, seed=0):
+    """
+    bulk_create `count` upcoming benchmark classes with every seat free, and
+    return their ids.
+    """
+    from .models import FitnessClass
+
+    now = timezone.now()
+    rng = random.Random(seed)
+    classes = []
+    for i in range(count):
+        total_slots = rng.randint(min_slots, max_slots)
+        classes.append(FitnessClass(
+            name=f'Benchmark class {i}',
+            date_time=now + datetime.timedelta(days=1, minutes=15 * i),
+            instructor=BENCHMARK_INSTRUCTOR,
+            total_slots=total_slots,
+            available_slots=total_slots,
+        ))
+    return [fitness_class.pk for fitness_class in FitnessClass.objects.bulk_create(classes)]
+
+
+def zipf_weights(count, exponent=1.1):
+    """
+    Popularity weights for `count` items where the k-th most popular gets
+    1/k**exponent, the skew real class demand tends to follow.
+    """
+    return [1 / (rank ** exponent) for rank in range(1, count + 1)]
+
+
+def delete_seeded_classes(batch_size=10_000):
+    """
+    Delete the benchmark classes, and through the cascade their bookings, in chunks.
+    """
+    from .models import FitnessClass
+
+    seeded = FitnessClass.objects.filter(instructor=BENCHMARK_INSTRUCTOR)
+    while True:
+        ids = list(seeded.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        FitnessClass.objects.filter(id__in=ids).delete()
@@ -0,0 +1,212 @@
+"""
+Versioned response cache for the class catalogue.
+
+Cached pages are keyed by a catalogue version number. Every write that can
+change what the class list shows bumps the version, so readers simply stop
+finding the old entries and they age out of the cache on their own. There is
+no key scanning or explicit deletion, which keeps it working on any Django
+cache backend that every worker shares, such as memcached or Redis.
+
+A version bump only reaches the workers that share the cache. With a
+process-local cache (LocMemCache, the default), the other workers would keep
+serving their pages with old slot counts, so pages are not cached at all.
+"""
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+CATALOGUE_VERSION_KEY = 'catalogue:version'
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+# Backends that live inside one process. A key written or deleted there is
+# not seen by the other workers of a deployment.
+PROCESS_LOCAL_CACHES = (LocMemCache, DummyCache)
+
+
+def is_shared_cache(cache):
+    """
+    Whether `cache` is shared by every worker process (Redis, memcached, the
+    database or file-based cache) rather than private to this one.
+    """
+    return not isinstance(cache, PROCESS_LOCAL_CACHES)
+
+
+def get_cache():
+    return caches[getattr(settings, 'CATALOGUE_CACHE_ALIAS', 'default')]
+
+
+def get_cache_timeout():
+    return getattr(settings, 'CATALOGUE_CACHE_TIMEOUT', 30)
+
+
+def get_catalogue_version():
+    cache = get_cache()
+    version = cache.get(CATALOGUE_VERSION_KEY)
+    if version is None:
+        # Start from the clock rather than 1 so an evicted counter can never
+        # rewind onto a version that still has live entries.
+        cache.add(CATALOGUE_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(CATALOGUE_VERSION_KEY, 0)
+    return version
+
+
+async def aget_catalogue_version():
+    cache = get_cache()
+    version = await cache.aget(CATALOGUE_VERSION_KEY)
+    if version is None:
+        await cache.aadd(CATALOGUE_VERSION_KEY, time.time_ns(), timeout=None)
+        version = await cache.aget(CATALOGUE_VERSION_KEY, 0)
+    return version
+
+
+def _increment_version():
+    cache = get_cache()
+    try:
+        cache.incr(CATALOGUE_VERSION_KEY)
+    except ValueError:
+        cache.set(CATALOGUE_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def bump_catalogue_version(using=None):
+    """
+    Invalidate every cached catalogue page. Call after any write that changes
+    a class or its slot count.
+    """
+    # Inside a transaction, bump only once the write is visible: a reader
+    # that picked up a new version before the commit would cache the
+    # pre-write rows under it. A rolled-back write then bumps nothing.
+    if transaction.get_connection(using).in_atomic_block:
+        transaction.on_commit(_increment_version, using=using)
+    else:
+        _increment_version()
+
+
+def _page_digest(request, parts):
+    raw = '|'.join([request.scheme, request.get_host(), request.path, *(str(part) for part in parts)])
+    return hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+
+def catalogue_cache_key(request, name, *parts):
+    """
+    Cache key for one rendered page of `name`, varying on the host and path
+    (the pagination links are absolute and point back at the endpoint), the
+    given request parts and the current catalogue version.
+    """
+    return f'catalogue:{name}:v{get_catalogue_version()}:{_page_digest(request, parts)}'
+
+
+async def acatalogue_cache_key(request, name, *parts):
+    return f'catalogue:{name}:v{await aget_catalogue_version()}:{_page_digest(request, parts)}'
+
+
+def _record_lookup(data):
+    with _stats_lock:
+        _stats['hits' if data is not None else 'misses'] += 1
+    return data
+
+
+def get_cached_response(key):
+    cache = get_cache()
+    if not is_shared_cache(cache):
+        return None
+    return _record_lookup(cache.get(key))
+
+
+async def aget_cached_response(key):
+    cache = get_cache()
+    if not is_shared_cache(cache):
+        return None
+    return _record_lookup(await cache.aget(key))
+
+
+def set_cached_response(key, data):
+    cache = get_cache()
+    if is_shared_cache(cache):
+        cache.set(key, data, timeout=get_cache_timeout())
+
+
+async def aset_cached_response(key, data):
+    cache = get_cache()
+    if is_shared_cache(cache):
+        await cache.aset(key, data, timeout=get_cache_timeout())
+
+
+def get_user_cache():
+    return caches[getattr(settings, 'AUTH_USER_CACHE_ALIAS', 'default')]
+
+
+def user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def get_cached_user(user_model, user_id, lookup_field='id'):
+    """
+    The user with the given id, from the cache when possible. Returns None if
+    no such user exists.
+
+    Only a shared cache is used: invalidate_cached_user() could not reach
+    another worker's process-local cache, which would keep authenticating
+    a deactivated user there until the entry expired.
+    """
+    cache = get_user_cache()
+    if not is_shared_cache(cache):
+        return user_model.objects.filter(**{lookup_field: user_id}).first()
+    key = user_cache_key(user_id)
+    user = cache.get(key)
+    if user is None:
+        user = user_model.objects.filter(**{lookup_field: user_id}).first()
+        if user is not None:
+            cache.set(key, user, timeout=getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 60))
+    return user
+
+
+def _delete_cached_user(user_id):
+    get_user_cache().delete(user_cache_key(user_id))
+
+
+def invalidate_cached_user(user_id, using=None):
+    """
+    Drop a user from the authentication cache. Call after any write to the
+    user row, so deactivation or a change of staff flags applies to the
+    next request on every worker sharing the cache.
+    """
+    _delete_cached_user(user_id)
+    # A request that reads the row before this transaction commits would
+    # cache the old flags, so drop the entry again once the write is visible.
+    if transaction.get_connection(using).in_atomic_block:
+        transaction.on_commit(lambda: _delete_cached_user(user_id), using=using)
+
+
+def get_cache_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = stats['hits'] / lookups if lookups else 0.0
+    return stats
+
+
+def reset_cache_stats():
+    with _stats_lock:
+        _stats.update(hits=0, misses=0)
+
+
+def collect_metrics():
+    """
+    Catalogue page cache lookups, for /api/metrics/.
+    """
+    stats = get_cache_stats()
+    return [
+        ('catalogue_cache_lookups_total', 'counter', 'Catalogue page cache lookups by result.', [
+            ({'result': 'hit'}, stats['hits']), ({'result': 'miss'}, stats['misses']),
+        ]),
+        ('catalogue_cache_hit_ratio', 'gauge', 'Share of catalogue page cache lookups that hit.', [({}, stats['hit_ratio'])]),
+    ]
@@ -0,0 +1,198 @@
+"""
+In-process fan-out of class slot changes for the Server-Sent Events stream.
+
+Writes that change `available_slots` publish a `(class_id, available_slots)`
+event once their transaction commits. Every event gets a sequence number and
+is kept in a ring buffer, so a client that reconnects with `Last-Event-ID`
+is sent only what it missed. The numbering starts from the clock, so an id
+issued before a restart is never mistaken for one of the new process's.
+Subscribers are asyncio queues on the ASGI event loop; publishing never
+blocks the request thread that made the change.
+
+The hub lives in the process that made the write. With several server
+processes, a client only sees changes made by the process it is connected
+to, so run the stream behind a single ASGI process or add a broker in
+front of publish().
+"""
+import asyncio
+import itertools
+import json
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import transaction
+
+
+class SlotEvent:
+    __slots__ = ('seq', 'class_id', 'available_slots')
+
+    def __init__(self, seq, class_id, available_slots):
+        self.seq = seq
+        self.class_id = class_id
+        self.available_slots = available_slots
+
+    def as_dict(self):
+        return {'class_id': self.class_id, 'available_slots': self.available_slots}
+
+
+class Subscription:
+    """
+    One stream's queue. `overflowed` is set when the client fell more than
+    `queue_size` events behind; the stream then ends so the client
+    reconnects and resumes from the ring buffer.
+    """
+
+    def __init__(self, loop, queue_size):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    def deliver(self, event):
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # The subscriber's loop has closed; it will be unsubscribed.
+            pass
+
+
+class SlotEventHub:
+    def __init__(self, buffer_size=1000, queue_size=100, first_seq=1):
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._seq = itertools.count(first_seq)
+        self._buffer = deque(maxlen=buffer_size)
+        self._subscribers = set()
+        self.last_seq = first_seq - 1
+
+    def publish(self, class_id, available_slots):
+        with self._lock:
+            event = SlotEvent(next(self._seq), class_id, available_slots)
+            self._buffer.append(event)
+            self.last_seq = event.seq
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.deliver(event)
+        return event
+
+    def subscribe(self, after_seq=None):
+        """
+        Registers a subscription on the running loop. Returns it with the
+        buffered events after `after_seq`. The list is None when the client
+        must reload the class list: those events have already left the
+        buffer, or `after_seq` was never issued by this hub (it comes from
+        before a restart).
+        """
+        subscription = Subscription(asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            self._subscribers.add(subscription)
+            if after_seq is None or after_seq == self.last_seq:
+                backlog = []
+            elif after_seq < self.last_seq and self._buffer and self._buffer[0].seq <= after_seq + 1:
+                backlog = [event for event in self._buffer if event.seq > after_seq]
+            else:
+                backlog = None
+        return subscription, backlog
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+
+_hub = None
+_hub_lock = threading.Lock()
+
+
+def get_config():
+    return getattr(settings, 'SLOT_EVENT_STREAM', {})
+
+
+def get_hub():
+    global _hub
+    if _hub is None:
+        with _hub_lock:
+            if _hub is None:
+                config = get_config()
+                _hub = SlotEventHub(
+                    buffer_size=config.get('BUFFER_SIZE', 1000),
+                    queue_size=config.get('SUBSCRIBER_QUEUE_SIZE', 100),
+                    # Microseconds: above any id a previous process issued,
+                    # and still exact as a JavaScript number.
+                    first_seq=time.time_ns() // 1000,
+                )
+    return _hub
+
+
+def publish_slots(class_id, available_slots, using=None):
+    """
+    Publish a known slot count once the current transaction commits.
+    """
+    transaction.on_commit(lambda: get_hub().publish(class_id, available_slots), using=using)
+
+
+def publish_slots_from_db(queryset, using=None):
+    """
+    Publish the committed slot counts of the classes in `queryset` after an
+    F() update, with one query once the current transaction commits. The
+    write has committed by then, so a failed query is only logged rather
+    than raised to the request that made it.
+    """
+    def publish():
+        hub = get_hub()
+        for class_id, available_slots in queryset.values_list('id', 'available_slots'):
+            hub.publish(class_id, available_slots)
+
+    transaction.on_commit(publish, using=using, robust=True)
+
+
+def format_event(event_id, name, data):
+    return f'id: {event_id}\nevent: {name}\ndata: {json.dumps(data)}\n\n'
+
+
+async def stream_events(after_seq=None, class_ids=None):
+    """
+    Server-Sent Events body: buffered events after `after_seq`, then live
+    events, with a comment line as heartbeat. Only events for `class_ids`
+    are sent when it is given. Ends after MAX_DURATION seconds, or when the
+    client falls too far behind, and the client reconnects with
+    Last-Event-ID.
+    """
+    config = get_config()
+    heartbeat = config.get('HEARTBEAT_INTERVAL', 15)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + config.get('MAX_DURATION', 300)
+    hub = get_hub()
+    subscription, backlog = hub.subscribe(after_seq)
+    try:
+        yield f"retry: {config.get('RETRY_MS', 3000)}\n\n"
+        if backlog is None:
+            # The missed events are gone; the client must reload /api/classes/.
+            yield format_event(hub.last_seq, 'reset', {})
+            backlog = []
+        for event in backlog:
+            if class_ids is None or event.class_id in class_ids:
+                yield format_event(event.seq, 'slots', event.as_dict())
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0 or (subscription.overflowed and subscription.queue.empty()):
+                return
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), timeout=min(heartbeat, remaining))
+            except asyncio.TimeoutError:
+                yield ': keep-alive\n\n'
+                continue
+            if class_ids is None or event.class_id in class_ids:
+                yield format_event(event.seq, 'slots', event.as_dict())
+    finally:
+        hub.unsubscribe(subscription)
@@ -0,0 +1,179 @@
+"""
+Bounded worker pool for password hashing and verification.
+
+PBKDF2 costs hundreds of milliseconds of CPU per call. Running it on the
+request thread lets a burst of signups or logins occupy every worker. Here
+each hash runs on a small dedicated pool (hashlib releases the GIL while it
+works). At most MAX_PENDING calls may be queued or running at once; beyond
+that the request fails fast with 503 and a Retry-After header, and the
+booking and listing endpoints keep their capacity.
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.http import HttpResponse
+from django.utils.deprecation import MiddlewareMixin
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .benchmark import percentile
+
+
+class CredentialPoolBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many sign-in requests right now. Please retry shortly.'
+    default_code = 'credential_pool_busy'
+
+    def __init__(self, wait=1):
+        super().__init__()
+        # DRF's exception handler turns `wait` into a Retry-After header.
+        self.wait = wait
+
+
+class CredentialPoolBusyMiddleware(MiddlewareMixin):
+    """
+    Answers 503 with Retry-After when the credential pool is saturated
+    outside DRF, e.g. on the admin login, where CredentialPoolBusy would
+    otherwise surface as a 500. DRF views handle it themselves.
+    """
+
+    def process_exception(self, request, exception):
+        if not isinstance(exception, CredentialPoolBusy):
+            return None
+        response = HttpResponse(str(exception.detail), status=exception.status_code, content_type='text/plain')
+        response['Retry-After'] = str(exception.wait)
+        return response
+
+
+class CredentialPool:
+    """
+    Runs credential functions on at most `max_workers` threads, with at most
+    `max_pending` calls queued or running. Records how long each call waited
+    for a worker.
+    """
+
+    def __init__(self, max_workers=2, max_pending=4, retry_after=1):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.retry_after = retry_after
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='credentials')
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=1024)
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+
+    def run(self, func, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise CredentialPoolBusy(wait=self.retry_after)
+        submitted_at = time.perf_counter()
+
+        def task():
+            wait = time.perf_counter() - submitted_at
+            with self._lock:
+                self._waits.append(wait)
+            return func(*args)
+
+        with self._lock:
+            self.submitted += 1
+        try:
+            return self._executor.submit(task).result()
+        finally:
+            self._slots.release()
+            with self._lock:
+                self.completed += 1
+
+    def stats(self):
+        with self._lock:
+            waits = list(self._waits)
+            stats = {
+                'submitted': self.submitted,
+                'rejected': self.rejected,
+                'completed': self.completed,
+            }
+        stats['in_flight'] = stats['submitted'] - stats['completed']
+        stats['queue_wait_p50_ms'] = percentile(waits, 50) * 1000
+        stats['queue_wait_p99_ms'] = percentile(waits, 99) * 1000
+        stats['queue_wait_max_ms'] = max(waits) * 1000 if waits else 0.0
+        return stats
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_credential_pool():
+    """
+    The process-wide pool configured by settings.PASSWORD_HASHING_POOL, or
+    None when the pool is disabled and hashing runs inline.
+    """
+    global _pool
+    config = getattr(settings, 'PASSWORD_HASHING_POOL', {})
+    if not config.get('ENABLED', False):
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = CredentialPool(
+                    max_workers=config.get('MAX_WORKERS', 2),
+                    max_pending=config.get('MAX_PENDING', 4),
+                    retry_after=config.get('RETRY_AFTER', 1),
+                )
+    return _pool
+
+
+def _run(func, *args):
+    pool = get_credential_pool()
+    if pool is None:
+        return func(*args)
+    return pool.run(func, *args)
+
+
+def hash_password(raw_password):
+    if raw_password is None:
+        # An unusable password is just a random string; no hashing involved.
+        return hashers.make_password(None)
+    return _run(hashers.make_password, raw_password)
+
+
+def verify_password(raw_password, encoded):
+    """
+    (is_correct, must_update) for a raw password against a stored hash,
+    where must_update means the hash uses outdated hasher settings.
+    """
+    return _run(hashers.verify_password, raw_password, encoded)
+
+
+def get_hashing_stats():
+    pool = get_credential_pool()
+    return pool.stats() if pool is not None else {}
+
+
+def collect_metrics():
+    """
+    The credential pool's counters and queue waits, for /api/metrics/.
+    """
+    stats = get_hashing_stats()
+    if not stats:
+        return []
+    return [
+        ('password_hashing_calls_total', 'counter', 'Credential pool calls by outcome.', [
+            ({'outcome': outcome}, stats[outcome]) for outcome in ('submitted', 'rejected', 'completed')
+        ]),
+        ('password_hashing_in_flight', 'gauge', 'Credential pool calls queued or running.', [({}, stats['in_flight'])]),
+        ('password_hashing_queue_wait_seconds', 'gauge', 'Wait for a credential pool worker over the last 1024 calls.', [
+            ({'quantile': '0.5'}, stats['queue_wait_p50_ms'] / 1000),
+            ({'quantile': '0.99'}, stats['queue_wait_p99_ms'] / 1000),
+            ({'quantile': '1'}, stats['queue_wait_max_ms'] / 1000),
+        ]),
+    ]
@@ -0,0 +1,110 @@
+"""
+Idempotency-Key support for retried POSTs.
+
+The first response for a key is stored in the cache as a compact
+`(fingerprint, status, data)` tuple. Retries with the same key and body get
+that response back without running the view again, so a client retrying a
+booking over a flaky network never touches the FitnessClass rows twice.
+
+That only holds when every worker shares the cache. In a process-local
+cache such as LocMemCache, a retry that reaches another worker finds no
+record and runs the booking again, so `manage.py check --deploy` warns
+about one (check_idempotency_cache).
+"""
+import hashlib
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.response import Response
+
+from .cache import is_shared_cache
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+# How long a key is reserved while its first request is still running.
+IN_PROGRESS_TIMEOUT = 30
+
+
+def get_cache():
+    return caches[getattr(settings, 'IDEMPOTENCY_CACHE_ALIAS', 'default')]
+
+
+def check_idempotency_cache(app_configs=None, **kwargs):
+    if is_shared_cache(get_cache()):
+        return []
+    return [checks.Warning(
+        'IDEMPOTENCY_CACHE_ALIAS points at a process-local cache.',
+        hint=(
+            'Retries that reach another worker run the request again. Point the alias '
+            'at a cache all workers share, such as Redis or memcached.'
+        ),
+        id='app.W001',
+    )]
+
+
+def get_key_ttl():
+    return getattr(settings, 'IDEMPOTENCY_KEY_TTL', 60 * 60 * 24)
+
+
+def request_fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(body.encode('utf-8')).hexdigest()[:32]
+
+
+def replay(record):
+    _, status_code, data = record
+    return Response(data, status=status_code, headers={'Idempotent-Replayed': 'true'})
+
+
+def idempotent(scope):
+    """
+    Decorator for APIView handlers that honours an `Idempotency-Key` header.
+
+    - A stored response for the key is replayed as-is.
+    - Reusing a key with a different request body is rejected with 422.
+    - A retry that arrives while the first request is still running gets 409.
+    - 5xx responses and exceptions are not stored, so the client can retry them.
+    """
+    def decorator(handler):
+        @wraps(handler)
+        def wrapper(view, request, *args, **kwargs):
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            if not key:
+                return handler(view, request, *args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return Response(
+                    {"detail": f"{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters."},
+                    status=status.HTTP_400_BAD_REQUEST)
+
+            cache = get_cache()
+            digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+            record_key = f'idempotency:{scope}:{digest}'
+            lock_key = f'{record_key}:lock'
+            fingerprint = request_fingerprint(request)
+
+            record = cache.get(record_key)
+            if record is not None:
+                if record[0] != fingerprint:
+                    return Response(
+                        {"detail": f"This {IDEMPOTENCY_HEADER} was already used with a different request body."},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+                return replay(record)
+
+            if not cache.add(lock_key, fingerprint, timeout=IN_PROGRESS_TIMEOUT):
+                return Response(
+                    {"detail": f"A request with this {IDEMPOTENCY_HEADER} is still being processed."},
+                    status=status.HTTP_409_CONFLICT)
+            try:
+                response = handler(view, request, *args, **kwargs)
+                if response.status_code < 500:
+                    cache.set(record_key, (fingerprint, response.status_code, response.data), timeout=get_key_ttl())
+            finally:
+                cache.delete(lock_key)
+            return response
+        return wrapper
+    return decorator
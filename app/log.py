@@ -0,0 +1,239 @@
+"""
+Non-blocking, batched logging for the `app` logger.
+
+Request threads only put the raw LogRecord on a bounded queue; formatting and
+file/console I/O happen on a background listener thread that drains the
+queue in batches and flushes each handler once per batch. When the queue is
+full the record is dropped according to the overflow policy and counted, so
+logging can never stall a booking request.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+
+from django.conf import settings
+
+# Attributes every LogRecord has; anything else on a record came from `extra=`.
+RESERVED_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+DROP_NEWEST = 'drop_newest'
+DROP_OLDEST = 'drop_oldest'
+
+
+# `extra` values of other types (e.g. the request Django attaches) are left out.
+LOGGABLE_TYPES = (str, int, float, bool, type(None), dict, list, tuple)
+
+
+def format_value(value):
+    text = str(value)
+    if not text or any(char.isspace() or char in '"=' for char in text):
+        return json.dumps(text)
+    return text
+
+
+class KeyValueFormatter(logging.Formatter):
+    """
+    Formatter that appends the record's `extra` fields as `key=value` pairs,
+    so log lines carry structured context without pre-formatting f-strings.
+    """
+
+    def format(self, record):
+        line = super().format(record)
+        fields = [
+            f'{key}={format_value(value)}'
+            for key, value in record.__dict__.items()
+            if key not in RESERVED_ATTRS and not key.startswith('_') and isinstance(value, LOGGABLE_TYPES)
+        ]
+        return f"{line} {' '.join(fields)}" if fields else line
+
+
+class AsyncQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that never blocks: it enqueues with put_nowait() and applies
+    the overflow policy when the queue is full.
+    """
+
+    def __init__(self, log_queue, policy=DROP_NEWEST):
+        super().__init__(log_queue)
+        if policy not in (DROP_NEWEST, DROP_OLDEST):
+            raise ValueError(f"Unknown overflow policy '{policy}'.")
+        self.policy = policy
+        self._lock = threading.Lock()
+        self.enqueued = 0
+        self.dropped = 0
+
+    def prepare(self, record):
+        # The base class merges args into the message here, on the request
+        # thread. The listener thread formats the record instead.
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            if self.policy == DROP_OLDEST:
+                try:
+                    self.queue.get_nowait()
+                    self.queue.put_nowait(record)
+                except (queue.Empty, queue.Full):
+                    pass
+            with self._lock:
+                self.dropped += 1
+            return
+        with self._lock:
+            self.enqueued += 1
+
+
+class BatchingQueueListener(logging.handlers.QueueListener):
+    """
+    QueueListener that handles records in batches of up to `batch_size`,
+    waiting at most `flush_interval` seconds to fill a batch, and flushes
+    each target handler once per batch instead of once per record.
+    """
+
+    def __init__(self, log_queue, *handlers, batch_size=256, flush_interval=0.5):
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.batches = 0
+        self.written = 0
+
+    def enqueue_sentinel(self):
+        # Block rather than put_nowait(): the queue may be full at shutdown,
+        # and the listener is still draining it.
+        self.queue.put(self._sentinel)
+
+    def _monitor(self):
+        while True:
+            record = self.queue.get()
+            if record is self._sentinel:
+                return
+            batch = [record]
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    record = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if record is self._sentinel:
+                    stop = True
+                    break
+                batch.append(record)
+            self.handle_batch(batch)
+            if stop:
+                return
+
+    def handle_batch(self, batch):
+        for handler in self.handlers:
+            records = [
+                record for record in batch
+                if record.levelno >= handler.level and handler.filter(record)
+            ]
+            if not records:
+                continue
+            stream = self._get_stream(handler)
+            handler.acquire()
+            try:
+                if stream is None:
+                    for record in records:
+                        handler.emit(record)
+                else:
+                    for record in records:
+                        try:
+                            stream.write(handler.format(record) + handler.terminator)
+                        except Exception:
+                            handler.handleError(record)
+                    handler.flush()
+            finally:
+                handler.release()
+        self.batches += 1
+        self.written += len(batch)
+
+    @staticmethod
+    def _get_stream(handler):
+        if not isinstance(handler, logging.StreamHandler):
+            return None
+        if handler.stream is None and isinstance(handler, logging.FileHandler):
+            handler.stream = handler._open()
+        return handler.stream
+
+
+_installed = {}
+
+
+def install_async_logging(logger_names, queue_size=10_000, batch_size=256, flush_interval=0.5, policy=DROP_NEWEST):
+    """
+    Moves the handlers of each named logger behind one AsyncQueueHandler and
+    starts a BatchingQueueListener that writes to them.
+    """
+    for name in logger_names:
+        if name in _installed:
+            continue
+        logger = logging.getLogger(name)
+        targets = list(logger.handlers)
+        if not targets:
+            continue
+        log_queue = queue.Queue(maxsize=queue_size)
+        handler = AsyncQueueHandler(log_queue, policy=policy)
+        listener = BatchingQueueListener(log_queue, *targets, batch_size=batch_size, flush_interval=flush_interval)
+        for target in targets:
+            logger.removeHandler(target)
+        logger.addHandler(handler)
+        listener.start()
+        atexit.register(listener.stop)
+        _installed[name] = (handler, listener)
+
+
+def configure_from_settings():
+    config = getattr(settings, 'ASYNC_LOGGING', {})
+    if not config.get('ENABLED', False):
+        return
+    install_async_logging(
+        config.get('LOGGERS', ['app']),
+        queue_size=config.get('QUEUE_SIZE', 10_000),
+        batch_size=config.get('BATCH_SIZE', 256),
+        flush_interval=config.get('FLUSH_INTERVAL', 0.5),
+        policy=config.get('OVERFLOW_POLICY', DROP_NEWEST),
+    )
+
+
+def get_logging_stats():
+    stats = {}
+    for name, (handler, listener) in _installed.items():
+        stats[name] = {
+            'enqueued': handler.enqueued,
+            'dropped': handler.dropped,
+            'queued': handler.queue.qsize(),
+            'batches': listener.batches,
+            'written': listener.written,
+        }
+    return stats
+
+
+def collect_metrics():
+    """
+    The async logging counters per logger, for /api/metrics/.
+    """
+    stats = get_logging_stats()
+    if not stats:
+        return []
+    return [
+        ('log_records_total', 'counter', 'Log records by logger and outcome.', [
+            ({'logger': name, 'outcome': outcome}, counts[outcome])
+            for name, counts in sorted(stats.items()) for outcome in ('enqueued', 'dropped', 'written')
+        ]),
+        ('log_batches_total', 'counter', 'Batches written by the logging listener.', [
+            ({'logger': name}, counts['batches']) for name, counts in sorted(stats.items())
+        ]),
+        ('log_queue_size', 'gauge', 'Log records waiting to be written.', [
+            ({'logger': name}, counts['queued']) for name, counts in sorted(stats.items())
+        ]),
+    ]
@@ -0,0 +1,52 @@
+import datetime
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from app.archive import archivable_classes, archive_batch
+from app.models import Booking
+
+
+class Command(BaseCommand):
+    help = (
+        "Move classes that started more than ARCHIVE_AFTER_DAYS ago, with their "
+        "bookings, from the live tables to the archive tables. Works in chunks, "
+        "each in its own transaction, so it can be stopped and run again at any time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help='Archive classes older than this many days (default: ARCHIVE_AFTER_DAYS).')
+        parser.add_argument('--batch-size', type=int, default=500, help='Classes moved per transaction.')
+        parser.add_argument('--pause', type=float, default=0.0, help='Seconds to sleep between chunks.')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many rows would be archived.')
+
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else getattr(settings, 'ARCHIVE_AFTER_DAYS', 365)
+        if days < 0:
+            raise CommandError('--days cannot be negative.')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+
+        cutoff = timezone.now() - datetime.timedelta(days=days)
+        if options['dry_run']:
+            classes = archivable_classes(cutoff)
+            bookings = Booking.objects.filter(fitness_class__in=classes.values('id')).count()
+            self.stdout.write(f"Would archive {classes.count()} classes ({bookings} bookings) that started before {cutoff:%Y-%m-%d %H:%M}.")
+            return
+
+        classes = bookings = chunks = 0
+        while True:
+            moved_classes, moved_bookings = archive_batch(cutoff, batch_size=options['batch_size'])
+            if not moved_classes:
+                break
+            classes += moved_classes
+            bookings += moved_bookings
+            chunks += 1
+            if options['pause']:
+                time.sleep(options['pause'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {classes} classes ({bookings} bookings) in {chunks} chunks."
+        ))
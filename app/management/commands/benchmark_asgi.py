@@ -0,0 +1,106 @@
+import asyncio
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+
+from app.benchmark import BENCHMARK_INSTRUCTOR, delete_seeded_classes, format_summary, seed_classes, summarize
+from app.models import Booking, FitnessClass
+
+BENCHMARK_EMAIL = 'benchmark@example.com'
+
+ENDPOINTS = {
+    'classes': ('class-list', 'class-list-async', {}),
+    'bookings': ('booking-list', 'booking-list-async', {'client_email': BENCHMARK_EMAIL}),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare throughput of the sync DRF list endpoints (WSGI, one thread per "
+        "in-flight request) with the native async ones (ASGI, one event loop), "
+        "driving both in-process at the same concurrency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoint', choices=sorted(ENDPOINTS), default='classes')
+        parser.add_argument('--requests', type=int, default=1000, help='Requests per mode.')
+        parser.add_argument('--concurrency', type=int, default=50, help='Requests in flight at once.')
+        parser.add_argument('--classes', type=int, default=1000, help='Classes to seed.')
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded rows instead of deleting them afterwards.')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--requests and --concurrency must be positive.')
+
+        sync_name, async_name, params = ENDPOINTS[options['endpoint']]
+        self.seed(options['classes'])
+        try:
+            # The in-process clients send requests for the 'testserver' host.
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                for label, run in (('WSGI', self.run_wsgi), ('ASGI', self.run_asgi)):
+                    url = reverse(sync_name if label == 'WSGI' else async_name)
+                    started = time.perf_counter()
+                    samples, errors = run(url, params, options['requests'], options['concurrency'])
+                    elapsed = time.perf_counter() - started
+                    self.stdout.write(self.style.SUCCESS(
+                        f"{label}: {len(samples) / elapsed:,.0f} req/s, {errors} errors, {format_summary(summarize(samples))}"
+                    ))
+        finally:
+            if not options['keep']:
+                delete_seeded_classes()
+
+    def seed(self, count):
+        self.stdout.write(f"Seeding {count} classes...")
+        seed_classes(count)
+        seeded = FitnessClass.objects.filter(instructor=BENCHMARK_INSTRUCTOR).values_list('id', flat=True)[:100]
+        Booking.objects.bulk_create([
+            Booking(fitness_class_id=class_id, client_name='Benchmark', client_email=BENCHMARK_EMAIL)
+            for class_id in seeded
+        ])
+
+    def run_wsgi(self, url, params, total, concurrency):
+        samples, errors, lock = [], [0], threading.Lock()
+        per_worker = [total // concurrency + (1 if i < total % concurrency else 0) for i in range(concurrency)]
+
+        def worker(count):
+            client = Client()
+            try:
+                for _ in range(count):
+                    start = time.perf_counter()
+                    response = client.get(url, params)
+                    duration = time.perf_counter() - start
+                    with lock:
+                        samples.append(duration)
+                        errors[0] += response.status_code != 200
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(count,)) for count in per_worker]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return samples, errors[0]
+
+    def run_asgi(self, url, params, total, concurrency):
+        samples, errors = [], [0]
+
+        async def request(client, semaphore):
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get(url, params)
+                samples.append(time.perf_counter() - start)
+                errors[0] += response.status_code != 200
+
+        async def main():
+            client = AsyncClient()
+            semaphore = asyncio.Semaphore(concurrency)
+            await asyncio.gather(*(request(client, semaphore) for _ in range(total)))
+
+        asyncio.run(main())
+        return samples, errors[0]
@@ -0,0 +1,162 @@
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Case, Count, F, OuterRef, Q, Subquery, Sum, When
+from django.db.models.functions import Coalesce
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from app.benchmark import (
+    BENCHMARK_INSTRUCTOR, delete_seeded_classes, format_summary, seed_open_classes, summarize, zipf_weights,
+)
+from app.models import FitnessClass, SlotShard
+
+SLOT_UPDATES = tuple(f'UPDATE "{model._meta.db_table}"' for model in (FitnessClass, SlotShard))
+
+MODES = ('hot', 'spread')
+
+
+class Command(BaseCommand):
+    help = (
+        "Fire concurrent POST /api/book/ requests from a pool of threads, against "
+        "one hot class and against many classes with skewed popularity. Report "
+        "throughput, latency and the time spent waiting on the slot UPDATE, then "
+        "check that the free seats == total_slots - bookings for every class."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', choices=(*MODES, 'all'), default='all')
+        parser.add_argument('--classes', type=int, default=200, help='Classes to seed for the spread run.')
+        parser.add_argument('--clients', type=int, default=5000, help='Distinct client emails to draw from.')
+        parser.add_argument('--requests', type=int, default=2000, help='Booking requests per run.')
+        parser.add_argument('--concurrency', type=int, default=16, help='Threads booking at once.')
+        parser.add_argument('--hot-slots', type=int, default=100, help='Seats in the hot class.')
+        parser.add_argument('--shards', type=int, default=0, help='Split the hot class seats over this many shards.')
+        parser.add_argument('--skew', type=float, default=1.1, help='Zipf exponent of class popularity in the spread run.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded rows instead of deleting them afterwards.')
+
+    def handle(self, *args, **options):
+        for name in ('classes', 'clients', 'requests', 'concurrency', 'hot_slots'):
+            if options[name] < 1:
+                raise CommandError(f"--{name.replace('_', '-')} must be positive.")
+        if options['shards'] < 0:
+            raise CommandError('--shards cannot be negative.')
+
+        modes = MODES if options['mode'] == 'all' else (options['mode'],)
+        rng = random.Random(options['seed'])
+        # The in-process client sends requests for the 'testserver' host.
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for mode in modes:
+                delete_seeded_classes()
+                try:
+                    requests = self.plan(mode, rng, options)
+                    report = self.run(requests, options['concurrency'])
+                    self.write_report(mode, report)
+                    self.check_invariant()
+                finally:
+                    if not options['keep']:
+                        delete_seeded_classes()
+
+    def plan(self, mode, rng, options):
+        """
+        The (class_id, client_email) pairs to book, in firing order.
+        """
+        if mode == 'hot':
+            [class_id] = seed_open_classes(1, options['hot_slots'], options['hot_slots'], seed=options['seed'])
+            if options['shards']:
+                FitnessClass.objects.get(pk=class_id).set_shard_count(options['shards'])
+            class_ids, weights = [class_id], [1]
+        else:
+            class_ids = seed_open_classes(options['classes'], seed=options['seed'])
+            weights = zipf_weights(len(class_ids), options['skew'])
+        self.stdout.write(f"{mode}: {len(class_ids)} classes, {options['requests']} requests from {options['clients']} clients")
+        return [
+            (class_id, f"client{rng.randrange(options['clients'])}@benchmark.example.com")
+            for class_id in rng.choices(class_ids, weights=weights, k=options['requests'])
+        ]
+
+    def run(self, requests, concurrency):
+        url = reverse('book-class')
+        latencies, lock_waits, statuses = [], [], {}
+        lock = threading.Lock()
+        chunks = [requests[i::concurrency] for i in range(concurrency)]
+
+        def time_slot_updates(execute, sql, params, many, context):
+            # The conditional UPDATE is where bookings for the same class
+            # queue on the row (or, on SQLite, the database write) lock.
+            if not sql.startswith(SLOT_UPDATES):
+                return execute(sql, params, many, context)
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                with lock:
+                    lock_waits.append(time.perf_counter() - start)
+
+        def worker(chunk):
+            client = Client(raise_request_exception=False)
+            try:
+                with connection.execute_wrapper(time_slot_updates):
+                    for class_id, email in chunk:
+                        data = {'class_id': class_id, 'client_name': 'Benchmark', 'client_email': email}
+                        start = time.perf_counter()
+                        response = client.post(url, data, content_type='application/json')
+                        duration = time.perf_counter() - start
+                        with lock:
+                            latencies.append(duration)
+                            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(chunk,)) for chunk in chunks if chunk]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        return {'elapsed': elapsed, 'latencies': latencies, 'lock_waits': lock_waits, 'statuses': statuses}
+
+    def write_report(self, mode, report):
+        statuses = report['statuses']
+        booked = statuses.get(201, 0)
+        rejected = statuses.get(400, 0)
+        errors = sum(statuses.values()) - booked - rejected
+        self.stdout.write(self.style.SUCCESS(
+            f"{mode}: {len(report['latencies']) / report['elapsed']:,.0f} req/s, "
+            f"{booked} booked, {rejected} rejected, {errors} errors"
+        ))
+        self.stdout.write(f"  latency: {format_summary(summarize(report['latencies']))}")
+        self.stdout.write(f"  slot UPDATE wait: {format_summary(summarize(report['lock_waits']))}")
+
+    def check_invariant(self):
+        shard_total = (
+            SlotShard.objects.filter(fitness_class_id=OuterRef('pk'))
+            .order_by().values('fitness_class_id').annotate(total=Sum('available')).values('total')
+        )
+        # A sharded class's free seats are its shard total; its stored
+        # available_slots is only kept exact at zero.
+        classes = FitnessClass.objects.filter(instructor=BENCHMARK_INSTRUCTOR).annotate(
+            booked=Count('bookings'),
+            free=Case(When(shard_count__gt=0, then=Coalesce(Subquery(shard_total), 0)), default=F('available_slots')),
+        )
+        broken = ~Q(free=F('total_slots') - F('booked')) | (
+            Q(shard_count__gt=0) & (Q(free=0) ^ Q(available_slots=0))
+        )
+        violations = list(
+            classes.filter(broken).values_list('id', 'total_slots', 'free', 'available_slots', 'booked')[:10]
+        )
+        if violations:
+            details = ', '.join(
+                f"class {class_id}: total={total} free={free} stored={stored} booked={booked}"
+                for class_id, total, free, stored, booked in violations
+            )
+            raise CommandError(f"Slot accounting is broken: {details}")
+        self.stdout.write(self.style.SUCCESS(
+            f"  invariant: available_slots == total_slots - bookings holds for {classes.count()} classes"
+        ))
@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from app.benchmark import BENCHMARK_INSTRUCTOR, delete_seeded_classes, format_summary, seed_classes, stopwatch, summarize
+from app.models import FitnessClass
+from app.pagination import FitnessClassCursorPagination
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed N fitness classes and report the EXPLAIN output and p50/p99 latency "
+        "of the upcoming-classes list query, for the first page and a deep keyset page."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--classes', type=int, default=100_000, help='Number of classes to seed.')
+        parser.add_argument('--runs', type=int, default=200, help='Timed executions per query.')
+        parser.add_argument('--page-size', type=int, default=FitnessClassCursorPagination.page_size)
+        parser.add_argument('--batch-size', type=int, default=10_000, help='Rows per bulk_create batch.')
+        parser.add_argument('--full-ratio', type=float, default=0.2, help='Fraction of seeded classes with no seats left.')
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded rows instead of deleting them afterwards.')
+
+    def handle(self, *args, **options):
+        if options['classes'] < 1 or options['runs'] < 1:
+            raise CommandError('--classes and --runs must be positive.')
+
+        self.stdout.write(f"Seeding {options['classes']} classes...")
+        seed_classes(options['classes'], options['batch_size'], options['full_ratio'])
+        try:
+            self.analyze()
+            now = timezone.now()
+            limit = options['page_size'] + 1
+            first_page = FitnessClass.objects.upcoming(now)[:limit]
+
+            # A cursor halfway through the upcoming range, as a client deep into paging would send.
+            middle = FitnessClass.objects.upcoming(now).filter(instructor=BENCHMARK_INSTRUCTOR)
+            boundary = middle[middle.count() // 2] if middle.exists() else None
+            queries = [('first page', first_page)]
+            if boundary is not None:
+                keyset = FitnessClassCursorPagination().get_keyset_filter(('date_time', 'id'), (boundary.date_time, boundary.id))
+                queries.append(('deep page', FitnessClass.objects.upcoming(now).filter(keyset)[:limit]))
+
+            for label, queryset in queries:
+                self.stdout.write(self.style.MIGRATE_HEADING(f"{label}:"))
+                self.stdout.write(str(queryset.query))
+                self.stdout.write(queryset.explain())
+                samples = []
+                for _ in range(options['runs']):
+                    with stopwatch(samples):
+                        list(queryset.all())
+                self.stdout.write(self.style.SUCCESS(f"{label} latency: {format_summary(summarize(samples))}"))
+        finally:
+            if not options['keep']:
+                delete_seeded_classes(options['batch_size'])
+
+    def analyze(self):
+        # Refresh planner statistics so the plan reflects the seeded volume.
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(f'ANALYZE {FitnessClass._meta.db_table}')
+            elif connection.vendor == 'sqlite':
+                cursor.execute('ANALYZE')
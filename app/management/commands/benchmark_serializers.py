@@ -0,0 +1,52 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.benchmark import format_summary, stopwatch, summarize
+from app.models import Booking, FitnessClass
+from app.serializers import BookingListSerializer, FitnessClassSerializer, resolve_timezone
+
+
+class Command(BaseCommand):
+    help = (
+        "Serialize N in-memory classes and bookings with the list serializers, in the "
+        "default and the compact format, and report rows/s with p50/p99 latency per run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10_000, help='Rows serialized per run.')
+        parser.add_argument('--runs', type=int, default=5, help='Timed runs per serializer.')
+        parser.add_argument('--timezone', default='America/New_York', help='Timezone the rows are rendered in.')
+
+    def handle(self, *args, **options):
+        if options['rows'] < 1 or options['runs'] < 1:
+            raise CommandError('--rows and --runs must be positive.')
+
+        # Unsaved rows: this measures serialization alone, not the queries.
+        start = datetime.datetime(2030, 1, 1, tzinfo=datetime.timezone.utc)
+        classes = [
+            FitnessClass(id=i, name='Yoga', date_time=start + datetime.timedelta(minutes=15 * i), instructor='Jane Doe', total_slots=20, available_slots=10)
+            for i in range(1, options['rows'] + 1)
+        ]
+        bookings = [
+            Booking(id=i, fitness_class=fitness_class, client_name='Client', client_email=f'client{i}@example.com', booking_time=start)
+            for i, fitness_class in enumerate(classes, start=1)
+        ]
+        target_tz = resolve_timezone(options['timezone'])
+        cases = [
+            ('FitnessClassSerializer', FitnessClassSerializer, classes, False),
+            ('FitnessClassSerializer compact', FitnessClassSerializer, classes, True),
+            ('BookingListSerializer', BookingListSerializer, bookings, False),
+            ('BookingListSerializer compact', BookingListSerializer, bookings, True),
+        ]
+        for label, serializer_class, instances, compact in cases:
+            samples = []
+            for _ in range(options['runs']):
+                serializer = serializer_class(many=True, context={'timezone': target_tz})
+                with stopwatch(samples):
+                    if compact:
+                        serializer.child.to_compact(instances)
+                    else:
+                        serializer.to_representation(instances)
+            rate = len(instances) * len(samples) / sum(samples)
+            self.stdout.write(self.style.SUCCESS(f"{label}: {rate:,.0f} rows/s, {format_summary(summarize(samples))}"))
@@ -0,0 +1,136 @@
+import csv
+import json
+import time
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from app.cache import bump_catalogue_version
+from app.models import FitnessClass
+from app.serializers import DEFAULT_TIMEZONE
+
+FORMATS = ('csv', 'jsonl')
+
+
+def read_csv(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        # The header is line 1, so data rows start at line 2.
+        for line, row in enumerate(csv.DictReader(f), start=2):
+            yield line, row
+
+
+def read_jsonl(path):
+    with open(path, encoding='utf-8') as f:
+        for line, text in enumerate(f, start=1):
+            if not text.strip():
+                continue
+            try:
+                yield line, json.loads(text)
+            except json.JSONDecodeError as e:
+                yield line, e
+
+
+def build_class(row, tz):
+    """
+    An unsaved FitnessClass from one timetable row, validated in memory.
+    Raises ValueError or ValidationError for a bad row.
+    """
+    if not isinstance(row, dict):
+        raise ValueError(f"expected an object, got {row}")
+    missing = [field for field in ('name', 'date_time', 'instructor', 'total_slots') if row.get(field) in (None, '')]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+    date_time = parse_datetime(str(row['date_time']))
+    if date_time is None:
+        raise ValueError(f"invalid date_time '{row['date_time']}'")
+    if timezone.is_naive(date_time):
+        date_time = timezone.make_aware(date_time, tz)
+    total_slots = int(row['total_slots'])
+    available = row.get('available_slots')
+    fitness_class = FitnessClass(
+        name=row['name'], date_time=date_time, instructor=row['instructor'], total_slots=total_slots,
+        available_slots=total_slots if available in (None, '') else int(available),
+    )
+    fitness_class.clean_in_memory()
+    return fitness_class
+
+
+def describe(error):
+    if isinstance(error, ValidationError) and hasattr(error, 'error_dict'):
+        return '; '.join(f"{field}: {' '.join(messages)}" for field, messages in error.message_dict.items())
+    if isinstance(error, ValidationError):
+        return ' '.join(error.messages)
+    return str(error)
+
+
+class Command(BaseCommand):
+    help = (
+        "Import classes from a CSV or JSON Lines timetable with the columns "
+        "name, date_time, instructor, total_slots and optionally available_slots. "
+        "Rows are streamed and validated in memory, then inserted with bulk_create "
+        "in batches, so memory use does not grow with the file. Invalid rows are "
+        "skipped and reported with their line numbers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Timetable file.')
+        parser.add_argument('--format', choices=FORMATS, default=None, help='File format (default: from the extension).')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Classes per INSERT.')
+        parser.add_argument('--timezone', default=DEFAULT_TIMEZONE, help='Timezone of date_time values without an offset.')
+        parser.add_argument('--max-errors', type=int, default=20, help='Invalid rows to print before only counting them.')
+        parser.add_argument('--dry-run', action='store_true', help='Only validate the rows.')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+        try:
+            tz = ZoneInfo(options['timezone'])
+        except (ZoneInfoNotFoundError, ValueError):
+            raise CommandError(f"Unknown timezone '{options['timezone']}'.")
+        file_format = options['format'] or options['path'].rsplit('.', 1)[-1].lower()
+        if file_format not in FORMATS:
+            raise CommandError(f"Cannot tell the format of {options['path']}; pass --format {' or '.join(FORMATS)}.")
+        reader = read_csv if file_format == 'csv' else read_jsonl
+
+        rows = imported = skipped = 0
+        batch = []
+        started = time.perf_counter()
+        try:
+            for line, row in reader(options['path']):
+                rows += 1
+                try:
+                    if isinstance(row, Exception):
+                        raise row
+                    batch.append(build_class(row, tz))
+                except (ValueError, TypeError, ValidationError) as e:
+                    skipped += 1
+                    if skipped <= options['max_errors']:
+                        self.stderr.write(f"line {line}: {describe(e)}")
+                    continue
+                if len(batch) >= options['batch_size']:
+                    imported += self.flush(batch, options['dry_run'])
+                    batch = []
+            imported += self.flush(batch, options['dry_run'])
+        except OSError as e:
+            raise CommandError(f"Cannot read {options['path']}: {e}")
+        finally:
+            if imported and not options['dry_run']:
+                bump_catalogue_version()
+        elapsed = time.perf_counter() - started
+
+        verb = 'Validated' if options['dry_run'] else 'Imported'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {imported} classes, skipped {skipped} invalid rows "
+            f"({rows / elapsed if elapsed else 0:,.0f} rows/s)."
+        ))
+
+    def flush(self, batch, dry_run):
+        if dry_run or not batch:
+            return len(batch)
+        with transaction.atomic():
+            FitnessClass.objects.bulk_create(batch)
+        return len(batch)
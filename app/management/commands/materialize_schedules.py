@@ -0,0 +1,35 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from app.models import ClassSchedule
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate the classes of every recurring schedule up to the scheduling "
+        "horizon. Occurrences that already exist are skipped, so this is safe "
+        "to run from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help='Days ahead to generate (default: SCHEDULE_HORIZON_DAYS).')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Classes per INSERT.')
+
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else getattr(settings, 'SCHEDULE_HORIZON_DAYS', 90)
+        if days < 0:
+            raise CommandError('--days cannot be negative.')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+
+        until = timezone.localdate() + datetime.timedelta(days=days)
+        today = timezone.localdate()
+        schedules = ClassSchedule.objects.exclude(ends_on__lt=today).order_by('id')
+        created = count = 0
+        for schedule in schedules.iterator():
+            created += schedule.materialize(until, batch_size=options['batch_size'])
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Created {created} classes from {count} schedules up to {until}."))
@@ -0,0 +1,268 @@
+"""
+Per-endpoint request metrics: wall time, database queries and time,
+serializer time and response size.
+
+RequestMetricsMiddleware times each request. Database queries are counted
+by an execute wrapper installed on every connection. Serializers add their
+time through TimedSerializerMixin. The numbers for the current request
+live in a context variable, so they follow the request into the
+sync_to_async threads that the async views query from. Each request
+reports a Server-Timing header and is aggregated into in-process
+histograms per URL name, exposed in Prometheus text format at
+/api/metrics/.
+
+Other modules add their own process counters and gauges to the same page
+with MetricsRegistry.add_collector(), registered in AppConfig.ready().
+
+The histograms are per process. Scrape every worker, or sum the workers
+in Prometheus. With REQUEST_METRICS['ENABLED'] off, the middleware passes
+requests straight through. The query wrapper and serializers then only
+read one unset context variable.
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+METRICS = (
+    # (name, help, buckets)
+    ('request_duration_seconds', 'Wall time of the request.', DURATION_BUCKETS),
+    ('db_queries', 'Database queries per request.', COUNT_BUCKETS),
+    ('db_duration_seconds', 'Time spent in database queries per request.', DURATION_BUCKETS),
+    ('serializer_duration_seconds', 'Time spent validating and rendering serializers per request.', DURATION_BUCKETS),
+    ('response_size_bytes', 'Size of the response body.', SIZE_BUCKETS),
+)
+
+PREFIX = 'omnify_'
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    __slots__ = ('db_queries', 'db_time', 'serializer_time')
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels.items()) + '}'
+
+
+def _format_value(value):
+    return f'{value:.6g}' if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """
+    Histograms per (metric, view), and response counts per (view, status).
+    Collectors add further metrics: functions returning
+    `(name, type, help, [(labels, value), ...])` tuples, called on render.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._responses = {}
+        self._collectors = []
+
+    def add_collector(self, collect):
+        with self._lock:
+            if collect not in self._collectors:
+                self._collectors.append(collect)
+
+    def record(self, view, status_code, values):
+        with self._lock:
+            for name, _, buckets in METRICS:
+                if values.get(name) is None:
+                    continue
+                histogram = self._histograms.get((name, view))
+                if histogram is None:
+                    histogram = self._histograms[(name, view)] = Histogram(buckets)
+                histogram.observe(values[name])
+            key = (view, status_code)
+            self._responses[key] = self._responses.get(key, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._responses.clear()
+
+    def render(self):
+        """
+        All metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        with self._lock:
+            lines.append(f'# HELP {PREFIX}responses_total Responses by view and status code.')
+            lines.append(f'# TYPE {PREFIX}responses_total counter')
+            for (view, status_code), count in sorted(self._responses.items()):
+                lines.append(f'{PREFIX}responses_total{{view="{view}",status="{status_code}"}} {count}')
+            for name, help_text, _ in METRICS:
+                lines.append(f'# HELP {PREFIX}{name} {help_text}')
+                lines.append(f'# TYPE {PREFIX}{name} histogram')
+                for (metric, view), histogram in sorted(self._histograms.items()):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f'{PREFIX}{name}_bucket{{view="{view}",le="{bound}"}} {cumulative}')
+                    lines.append(f'{PREFIX}{name}_bucket{{view="{view}",le="+Inf"}} {histogram.count}')
+                    lines.append(f'{PREFIX}{name}_sum{{view="{view}"}} {histogram.sum:.6g}')
+                    lines.append(f'{PREFIX}{name}_count{{view="{view}"}} {histogram.count}')
+            collectors = list(self._collectors)
+        # Outside the lock: collectors take their own.
+        for collect in collectors:
+            for name, kind, help_text, samples in collect():
+                lines.append(f'# HELP {PREFIX}{name} {help_text}')
+                lines.append(f'# TYPE {PREFIX}{name} {kind}')
+                for labels, value in samples:
+                    lines.append(f'{PREFIX}{name}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def get_config():
+    return getattr(settings, 'REQUEST_METRICS', {})
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Execute wrapper installed on every database connection.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_queries += 1
+        metrics.db_time += time.perf_counter() - start
+
+
+def install_query_wrapper(sender, connection, **kwargs):
+    """
+    connection_created receiver. Persistent connections that reconnect
+    keep their wrapper list, so the wrapper is only added once.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def serializer_timer():
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serializer_time += time.perf_counter() - start
+
+
+class TimedSerializerMixin:
+    """
+    Adds the time spent in is_valid() and .data to the request's
+    serializer time. Nested serializers are timed by their parent.
+    """
+
+    def is_valid(self, *args, **kwargs):
+        with serializer_timer():
+            return super().is_valid(*args, **kwargs)
+
+    @property
+    def data(self):
+        with serializer_timer():
+            return super().data
+
+
+class RequestMetricsMiddleware:
+    # Async-capable, so the async views stay on the event loop under ASGI.
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not get_config().get('ENABLED', False):
+            return self.get_response(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, response, metrics, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        if not get_config().get('ENABLED', False):
+            return await self.get_response(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, response, metrics, time.perf_counter() - start)
+        return response
+
+    def finish(self, request, response, metrics, duration):
+        match = getattr(request, 'resolver_match', None)
+        view = match.url_name if match and match.url_name else 'unmatched'
+        # Streaming bodies are not buffered, so their size is unknown here.
+        size = None if response.streaming else len(response.content)
+        registry.record(view, response.status_code, {
+            'request_duration_seconds': duration,
+            'db_queries': metrics.db_queries,
+            'db_duration_seconds': metrics.db_time,
+            'serializer_duration_seconds': metrics.serializer_time,
+            'response_size_bytes': size,
+        })
+        if get_config().get('SERVER_TIMING', True):
+            response['Server-Timing'] = (
+                f'app;dur={duration * 1000:.1f}, '
+                f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.db_queries} queries", '
+                f'ser;dur={metrics.serializer_time * 1000:.1f}'
+            )
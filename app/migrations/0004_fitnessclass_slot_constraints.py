@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0003_rename_class_id_booking_fitness_class_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='fitnessclass',
+            name='available_slots',
+            field=models.PositiveIntegerField(),
+        ),
+        migrations.AlterField(
+            model_name='fitnessclass',
+            name='total_slots',
+            field=models.PositiveIntegerField(),
+        ),
+        migrations.AddConstraint(
+            model_name='fitnessclass',
+            constraint=models.CheckConstraint(condition=models.Q(('available_slots__gte', 0)), name='fitnessclass_available_slots_gte_0'),
+        ),
+        migrations.AddConstraint(
+            model_name='fitnessclass',
+            constraint=models.CheckConstraint(condition=models.Q(('available_slots__lte', models.F('total_slots'))), name='fitnessclass_available_slots_lte_total'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_fitnessclass_slot_constraints'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='fitnessclass',
+            index=models.Index(condition=models.Q(('available_slots__gt', 0)), fields=['date_time', 'id'], name='fitnessclass_upcoming_idx'),
+        ),
+    ]
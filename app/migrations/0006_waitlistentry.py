@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_fitnessclass_upcoming_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WaitlistEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('client_name', models.CharField(max_length=100)),
+                ('client_email', models.EmailField(max_length=254)),
+                ('joined_at', models.DateTimeField(auto_now_add=True)),
+                ('fitness_class', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist', to='app.fitnessclass')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['fitness_class', 'joined_at', 'id'], name='waitlist_queue_idx'), models.Index(fields=['client_email'], name='waitlist_client_email_idx')],
+                'unique_together': {('fitness_class', 'client_email')},
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_waitlistentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fitnessclass',
+            name='shard_count',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='SlotShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveSmallIntegerField()),
+                ('available', models.PositiveIntegerField()),
+                ('fitness_class', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slot_shards', to='app.fitnessclass')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('fitness_class', 'index'), name='slotshard_class_index_unique'), models.CheckConstraint(condition=models.Q(('available__gte', 0)), name='slotshard_available_gte_0')],
+            },
+        ),
+    ]
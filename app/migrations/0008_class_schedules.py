@@ -0,0 +1,38 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:55
+
+import app.models
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_slot_shards'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClassSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('instructor', models.CharField(max_length=100)),
+                ('weekdays', models.CharField(help_text='RRULE BYDAY codes, e.g. MO,WE,FR', max_length=20, validators=[app.models.validate_weekdays])),
+                ('start_time', models.TimeField()),
+                ('timezone', models.CharField(default='Asia/Kolkata', max_length=64, validators=[app.models.validate_timezone_name])),
+                ('capacity', models.PositiveIntegerField()),
+                ('starts_on', models.DateField()),
+                ('ends_on', models.DateField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='fitnessclass',
+            name='schedule',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='classes', to='app.classschedule'),
+        ),
+        migrations.AddConstraint(
+            model_name='fitnessclass',
+            constraint=models.UniqueConstraint(fields=('schedule', 'date_time'), name='fitnessclass_schedule_occurrence_unique'),
+        ),
+    ]
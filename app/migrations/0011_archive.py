@@ -0,0 +1,45 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:19
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0010_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedFitnessClass',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=100)),
+                ('date_time', models.DateTimeField()),
+                ('instructor', models.CharField(max_length=100)),
+                ('total_slots', models.PositiveIntegerField()),
+                ('available_slots', models.PositiveIntegerField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date_time'], name='archivedclass_date_time_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedBooking',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('client_name', models.CharField(max_length=100)),
+                ('client_email', models.EmailField(max_length=254)),
+                ('booking_time', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('fitness_class', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bookings', to='app.archivedfitnessclass')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['client_email'], name='archivedbooking_email_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0011_archive'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='archivedbooking',
+            index=models.Index(fields=['booking_time'], name='archivedbooking_time_idx'),
+        ),
+    ]
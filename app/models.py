@@ -1,7 +1,18 @@
-from django.db import models
+import datetime
+import random
+from operator import attrgetter
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.db import models, transaction
+from django.db.models import Count, Exists, F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.db.models.query import ModelIterable
 from django.utils import timezone 
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.core.exceptions import ValidationError
+from .cache import bump_catalogue_version, invalidate_cached_user
+from .events import get_hub, publish_slots, publish_slots_from_db
+from .hashing import hash_password, verify_password
 
 class CustomUserManager(BaseUserManager):
 
@@ -49,6 +60,192 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     def __str__(self):
         return self.email
 
+    def set_password(self, raw_password):
+        self.password = hash_password(raw_password)
+        self._password = raw_password
+
+    def check_password(self, raw_password):
+        """
+        Verify on the credential pool, and re-hash with the current hasher
+        settings when the stored hash is outdated.
+        """
+        is_correct, must_update = verify_password(raw_password, self.password)
+        if is_correct and must_update:
+            self.set_password(raw_password)
+            # Password hash upgrades shouldn't be considered password changes.
+            self._password = None
+            self.save(update_fields=['password'])
+        return is_correct
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        invalidate_cached_user(self.pk, using=kwargs.get('using'))
+
+    def delete(self, *args, **kwargs):
+        user_id = self.pk
+        result = super().delete(*args, **kwargs)
+        invalidate_cached_user(user_id, using=kwargs.get('using'))
+        return result
+
+
+class NoAvailableSlots(Exception):
+    """Raised when a booking cannot claim a seat because the class is full."""
+
+
+def load_shard_seats(fitness_classes, using=None):
+    """
+    Sets available_slots of the sharded classes among `fitness_classes` to
+    their shard total, with one query. Their stored available_slots is only
+    exact at zero (see SlotShardQuerySet.sync_available_slots()).
+    """
+    sharded = {fitness_class.pk: fitness_class for fitness_class in fitness_classes if fitness_class.shard_count}
+    if not sharded:
+        return
+    totals = dict(
+        SlotShard.objects.using(using).filter(fitness_class_id__in=sharded)
+        .order_by().values('fitness_class_id').annotate(total=Sum('available'))
+        .values_list('fitness_class_id', 'total')
+    )
+    for class_id, fitness_class in sharded.items():
+        fitness_class.available_slots = totals.get(class_id, 0)
+
+
+class FreeSeatsIterable(ModelIterable):
+    """
+    Model instances with the free seats of sharded classes read from their
+    shards. `class_path` is the attribute holding the class, if not the row.
+    """
+    class_path = None
+
+    def __iter__(self):
+        instances = list(super().__iter__())
+        get_class = attrgetter(self.class_path) if self.class_path else (lambda instance: instance)
+        load_shard_seats([get_class(instance) for instance in instances], using=self.queryset.db)
+        yield from instances
+
+
+class BookingFreeSeatsIterable(FreeSeatsIterable):
+    class_path = 'fitness_class'
+
+
+class FitnessClassQuerySet(models.QuerySet):
+
+    def with_free_seats(self):
+        """
+        Classes whose available_slots is exact for sharded classes too, for
+        the reads that show it. Costs one query when sharded classes are
+        among the results.
+        """
+        clone = self._chain()
+        clone._iterable_class = FreeSeatsIterable
+        return clone
+
+    def upcoming(self, now=None):
+        """
+        Classes that have not started yet and still have seats, in start order.
+        Served by the partial `fitnessclass_upcoming_idx` index.
+        """
+        now = now or timezone.now()
+        return self.filter(date_time__gte=now, available_slots__gt=0).order_by('date_time', 'id')
+
+
+WEEKDAY_CODES = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+
+
+def validate_weekdays(value):
+    codes = [code.strip().upper() for code in value.split(',') if code.strip()]
+    invalid = [code for code in codes if code not in WEEKDAY_CODES]
+    if not codes or invalid:
+        raise ValidationError(f"Enter weekdays as comma-separated RRULE codes ({','.join(WEEKDAY_CODES)}).")
+
+
+def validate_timezone_name(value):
+    try:
+        ZoneInfo(value)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValidationError(f"Unknown timezone '{value}'.")
+
+
+class ClassSchedule(models.Model):
+    """
+    A weekly recurring class, like an RRULE with FREQ=WEEKLY;BYDAY=...:
+    `name` with `instructor` on `weekdays` at `start_time` local time,
+    from `starts_on` until `ends_on` (or open-ended).
+    """
+    name = models.CharField(max_length=100)
+    instructor = models.CharField(max_length=100)
+    weekdays = models.CharField(max_length=20, validators=[validate_weekdays], help_text="RRULE BYDAY codes, e.g. MO,WE,FR")
+    start_time = models.TimeField()
+    timezone = models.CharField(max_length=64, default='Asia/Kolkata', validators=[validate_timezone_name])
+    capacity = models.PositiveIntegerField()
+    starts_on = models.DateField()
+    ends_on = models.DateField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} - {self.instructor} on {self.weekdays} at {self.start_time.strftime('%H:%M')}"
+
+    def occurrences(self, start, end):
+        """
+        Aware start datetimes of the occurrences on dates in [start, end].
+        """
+        days = {WEEKDAY_CODES.index(code.strip().upper()) for code in self.weekdays.split(',') if code.strip()}
+        tz = ZoneInfo(self.timezone)
+        day = max(start, self.starts_on)
+        last = min(end, self.ends_on) if self.ends_on else end
+        while day <= last:
+            if day.weekday() in days:
+                yield datetime.datetime.combine(day, self.start_time, tzinfo=tz)
+            day += datetime.timedelta(days=1)
+
+    def materialize(self, until, batch_size=1000, using=None):
+        """
+        Creates the FitnessClass rows for every upcoming occurrence up to
+        `until` that does not exist yet, and returns how many were added.
+
+        The shared fields are validated once, in memory. Existing occurrences
+        are read with one query, and new rows go in with bulk_create in
+        batches, so a quarter's timetable costs a handful of queries instead
+        of a full_clean() and INSERT per class. Occurrences another run
+        inserted in the meantime are skipped and not counted.
+        """
+        now = timezone.now()
+        template = FitnessClass(
+            name=self.name, instructor=self.instructor, date_time=now,
+            total_slots=self.capacity, available_slots=self.capacity,
+        )
+        template.clean_in_memory()
+        today = timezone.localdate(now, timezone=ZoneInfo(self.timezone))
+        upcoming = FitnessClass.objects.using(using).filter(schedule=self, date_time__gt=now)
+
+        def insert(batch):
+            # With ignore_conflicts, bulk_create returns every object passed
+            # in, including those another run inserted first, so count the
+            # batch's rows before and after instead.
+            rows = upcoming.filter(date_time__in=[fitness_class.date_time for fitness_class in batch])
+            before = rows.count()
+            FitnessClass.objects.using(using).bulk_create(batch, ignore_conflicts=True)
+            return rows.count() - before
+
+        created = 0
+        batch = []
+        with transaction.atomic(using=using):
+            existing = set(upcoming.values_list('date_time', flat=True))
+            for date_time in self.occurrences(today, until):
+                if date_time <= now or date_time in existing:
+                    continue
+                batch.append(FitnessClass(
+                    schedule=self, name=self.name, instructor=self.instructor, date_time=date_time,
+                    total_slots=self.capacity, available_slots=self.capacity,
+                ))
+                if len(batch) >= batch_size:
+                    created += insert(batch)
+                    batch = []
+            if batch:
+                created += insert(batch)
+            if created:
+                bump_catalogue_version(using=using)
+        return created
+
 
 class FitnessClass(models.Model): 
     name = models.CharField(max_length=100) 
@@ -56,6 +253,33 @@ class FitnessClass(models.Model):
     instructor = models.CharField(max_length=100) 
     total_slots = models.PositiveIntegerField() 
     available_slots = models.PositiveIntegerField() 
+    # The recurring schedule this class was generated from, if any.
+    schedule = models.ForeignKey(ClassSchedule, on_delete=models.SET_NULL, null=True, blank=True, related_name='classes')
+    # Number of SlotShard rows the free seats are split over; 0 means the
+    # seats are claimed from available_slots directly.
+    shard_count = models.PositiveSmallIntegerField(default=0)
+    # Set by save() and bulk_create(); the QuerySet.update() calls below set
+    # it explicitly. List ETags are built from it.
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = FitnessClassQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Matches FitnessClassQuerySet.upcoming(): range scan on date_time with the
+            # pagination tie-breaker, skipping full classes entirely. Backends without
+            # partial index support (MySQL, Oracle) skip it.
+            models.Index(fields=['date_time', 'id'], condition=Q(available_slots__gt=0), name='fitnessclass_upcoming_idx'),
+            # Admin date filters and exact-match search on name and instructor.
+            models.Index(fields=['date_time'], name='fitnessclass_date_time_idx'),
+            models.Index(fields=['name', 'date_time'], name='fitnessclass_name_idx'),
+            models.Index(fields=['instructor', 'date_time'], name='fitnessclass_instructor_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['schedule', 'date_time'], name='fitnessclass_schedule_occurrence_unique'),
+            models.CheckConstraint(condition=Q(available_slots__gte=0), name='fitnessclass_available_slots_gte_0'),
+            models.CheckConstraint(condition=Q(available_slots__lte=F('total_slots')), name='fitnessclass_available_slots_lte_total'),
+        ]
     
     def __str__(self): 
         return f"{self.id}. {self.name} - {self.instructor} on {self.date_time.strftime('%Y-%m-%d %H:%M')}"
@@ -64,9 +288,288 @@ class FitnessClass(models.Model):
         if self.available_slots > self.total_slots:
             raise ValidationError("Available slots cannot be greater than total slots.")
 
+    def clean_in_memory(self):
+        """
+        full_clean() without the checks that query the database (the schedule
+        foreign key, uniqueness and constraints), for validating rows before
+        a bulk_create.
+        """
+        self.clean_fields(exclude=['schedule'])
+        self.clean()
+
     def save(self, *args, **kwargs):
-        self.full_clean()
+        # The slot CHECK constraints are already covered in memory by clean() and
+        # the field validators, so skip the extra SELECT per constraint.
+        self.full_clean(validate_constraints=False)
         super().save(*args, **kwargs)
+        bump_catalogue_version(using=kwargs.get('using'))
+        publish_slots(self.pk, self.available_slots, using=kwargs.get('using'))
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        bump_catalogue_version(using=kwargs.get('using'))
+        return result
+
+    def set_shard_count(self, shard_count, using=None):
+        """
+        Splits the class's free seats evenly over `shard_count` SlotShard rows,
+        or folds them back into available_slots when `shard_count` is 0.
+        Calling it with the current count rebalances drained shards.
+
+        While a class is sharded its shards are the source of truth, and
+        available_slots is a copy refreshed after every claim or release.
+        """
+        with transaction.atomic(using=using):
+            locked = FitnessClass.objects.using(using).select_for_update().get(pk=self.pk)
+            # Locking the shards too stops a concurrent claim from being lost.
+            shards = list(SlotShard.objects.using(using).select_for_update().filter(fitness_class=locked))
+            free = sum(shard.available for shard in shards) if locked.shard_count else locked.available_slots
+            SlotShard.objects.using(using).filter(fitness_class=locked).delete()
+            if shard_count:
+                SlotShard.objects.using(using).bulk_create([
+                    SlotShard(fitness_class=locked, index=index, available=free // shard_count + (index < free % shard_count))
+                    for index in range(shard_count)
+                ])
+            FitnessClass.objects.using(using).filter(pk=self.pk).update(
+                shard_count=shard_count, available_slots=free, updated_at=timezone.now()
+            )
+            self.shard_count, self.available_slots = shard_count, free
+            bump_catalogue_version(using=using)
+            publish_slots(self.pk, free, using=using)
+
+
+class SlotShardQuerySet(models.QuerySet):
+
+    def claim(self, fitness_class, seats=1):
+        """
+        Takes `seats` seats from the class's shards, all or none, and returns
+        whether it succeeded. Each seat is claimed with a conditional UPDATE
+        on a random shard, so concurrent bookings for one class spread their
+        row locks over `shard_count` rows instead of queueing on one.
+        """
+        try:
+            with transaction.atomic(using=self.db):
+                for _ in range(seats):
+                    if not self._claim_one(fitness_class):
+                        raise NoAvailableSlots
+        except NoAvailableSlots:
+            return False
+        return True
+
+    def _claim_one(self, fitness_class):
+        shards = self.filter(fitness_class_id=fitness_class.pk)
+        index = random.randrange(fitness_class.shard_count)
+        while True:
+            if shards.filter(index=index, available__gt=0).update(available=F('available') - 1):
+                return True
+            # That shard is drained; move on to the one with the most seats left.
+            index = shards.filter(available__gt=0).order_by('-available').values_list('index', flat=True).first()
+            if index is None:
+                return False
+
+    def release(self, fitness_class, seats=1):
+        """
+        Returns seats to a random shard of the class.
+        """
+        index = random.randrange(fitness_class.shard_count)
+        self.filter(fitness_class_id=fitness_class.pk, index=index).update(available=F('available') + seats)
+
+    def sync_available_slots(self, class_ids):
+        """
+        Publishes each sharded class's free seats, its shard total.
+
+        The class row itself is only written when the class sells out or
+        gets a seat back. available_slots of a sharded class is a copy that
+        is exact at zero, which is all upcoming() and the waitlist need, so
+        the bookings in between never queue on the class row. Reads that
+        show the count use FitnessClassQuerySet.with_free_seats().
+        """
+        totals = dict(
+            self.filter(fitness_class_id__in=class_ids)
+            .order_by().values('fitness_class_id').annotate(total=Sum('available'))
+            .values_list('fitness_class_id', 'total')
+        )
+        classes = FitnessClass.objects.using(self.db).filter(pk__in=class_ids, shard_count__gt=0)
+        stored = list(classes.values_list('pk', 'available_slots'))
+        flipped = [class_id for class_id, available_slots in stored if (available_slots > 0) != (totals.get(class_id, 0) > 0)]
+        if flipped:
+            total = (
+                SlotShard.objects.filter(fitness_class_id=OuterRef('pk'))
+                .order_by()
+                .values('fitness_class_id')
+                .annotate(total=Sum('available'))
+                .values('total')
+            )
+            # The total is recomputed in the UPDATE, in case it moved since the read.
+            classes.filter(pk__in=flipped).update(available_slots=Coalesce(Subquery(total), 0), updated_at=timezone.now())
+            bump_catalogue_version(using=self.db)
+        hub = get_hub()
+        for class_id, _ in stored:
+            hub.publish(class_id, totals.get(class_id, 0))
+
+
+class SlotShard(models.Model):
+    fitness_class = models.ForeignKey(FitnessClass, on_delete=models.CASCADE, related_name='slot_shards')
+    index = models.PositiveSmallIntegerField()
+    available = models.PositiveIntegerField()
+
+    objects = SlotShardQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['fitness_class', 'index'], name='slotshard_class_index_unique'),
+            models.CheckConstraint(condition=Q(available__gte=0), name='slotshard_available_gte_0'),
+        ]
+
+    def __str__(self):
+        return f"Shard {self.index} of class {self.fitness_class_id}: {self.available} free"
+
+
+class BookingQuerySet(models.QuerySet):
+
+    def with_free_seats(self):
+        """
+        FitnessClassQuerySet.with_free_seats() for the classes loaded with
+        select_related('fitness_class').
+        """
+        clone = self._chain()
+        clone._iterable_class = BookingFreeSeatsIterable
+        return clone
+
+
+class BookingManager(models.Manager.from_queryset(BookingQuerySet)):
+
+    def _claim_seats(self, fitness_class, seats):
+        if fitness_class.shard_count:
+            return SlotShard.objects.using(self.db).claim(fitness_class, seats)
+        # shard_count=0 guards against a class sharded since it was loaded.
+        return FitnessClass.objects.filter(pk=fitness_class.pk, shard_count=0, available_slots__gte=seats).update(
+            available_slots=F('available_slots') - seats, updated_at=timezone.now()
+        ) > 0
+
+    def _release_seat(self, fitness_class):
+        if fitness_class.shard_count:
+            SlotShard.objects.using(self.db).release(fitness_class)
+        else:
+            FitnessClass.objects.filter(pk=fitness_class.pk).update(
+                available_slots=F('available_slots') + 1, updated_at=timezone.now()
+            )
+
+    def _seats_changed(self, fitness_classes):
+        """
+        Publishes the new seat counts once the transaction commits. Sharded
+        classes are read from their shards, after the booking transaction,
+        and only write the class row when they sell out or reopen.
+        """
+        sharded = [fitness_class.pk for fitness_class in fitness_classes if fitness_class.shard_count]
+        plain = [fitness_class.pk for fitness_class in fitness_classes if not fitness_class.shard_count]
+        if sharded:
+            # robust: the booking has committed, so a failed sync is only
+            # logged; the next claim or release on the class syncs it again.
+            transaction.on_commit(
+                lambda: SlotShard.objects.using(self.db).sync_available_slots(sharded), using=self.db, robust=True
+            )
+        if plain:
+            publish_slots_from_db(FitnessClass.objects.filter(pk__in=plain), using=self.db)
+
+    def book(self, fitness_class, **fields):
+        """
+        Claims a seat with a single conditional UPDATE and inserts the booking.
+
+        The seat is taken by `available_slots = available_slots - 1 WHERE
+        available_slots > 0`, so concurrent bookings only contend for the
+        duration of that one statement instead of holding a row lock across
+        a read, a full_clean() and a full-row save. Sharded classes claim from
+        one of their SlotShard rows instead.
+        """
+        return self.add(self.model(fitness_class=fitness_class, **fields))
+
+    def add(self, booking, **save_kwargs):
+        """
+        book() for an unsaved Booking instance. Booking.save() goes through
+        here when adding, so bookings made in the admin or at model level
+        claim their seat the same way, from the shards of a sharded class.
+        """
+        fitness_class = booking.fitness_class
+        with transaction.atomic(using=self.db):
+            if not self._claim_seats(fitness_class, 1):
+                raise NoAvailableSlots(f"No available slots for class '{fitness_class.pk}'.")
+            booking.save(using=self.db, adjust_slots=False, **save_kwargs)
+            bump_catalogue_version(using=self.db)
+            self._seats_changed([fitness_class])
+        return booking
+
+    def bulk_book(self, items):
+        """
+        Books many `{'fitness_class', 'client_name', 'client_email'}` items in one
+        transaction, the bulk equivalent of book() and Booking.save().
+
+        Duplicates (already booked, or repeated within the batch) are found with
+        one set-based query. Seats are claimed per class with one conditional
+        UPDATE for the whole group (one per seat for sharded classes), so a
+        class either seats every requested
+        client or none of them, and the bookings are inserted with bulk_create.
+        Returns a list of `(booking, error)` pairs in input order.
+        """
+        results = [None] * len(items)
+        pairs = {(item['fitness_class'].pk, item['client_email']) for item in items}
+        existing = set(
+            self.filter(
+                fitness_class_id__in={class_pk for class_pk, _ in pairs},
+                client_email__in={email for _, email in pairs},
+            ).values_list('fitness_class_id', 'client_email')
+        ) & pairs
+
+        groups = {}
+        for index, item in enumerate(items):
+            key = (item['fitness_class'].pk, item['client_email'])
+            if key in existing:
+                results[index] = (None, "You have already booked this class.")
+                continue
+            existing.add(key)
+            groups.setdefault(item['fitness_class'].pk, []).append(index)
+
+        with transaction.atomic(using=self.db):
+            bookings = []
+            for class_pk, indexes in groups.items():
+                if not self._claim_seats(items[indexes[0]]['fitness_class'], len(indexes)):
+                    for index in indexes:
+                        results[index] = (None, "Not enough available slots for this class.")
+                    continue
+                for index in indexes:
+                    booking = self.model(**items[index])
+                    results[index] = (booking, None)
+                    bookings.append(booking)
+            if bookings:
+                self.bulk_create(bookings)
+                bump_catalogue_version(using=self.db)
+                self._seats_changed({booking.fitness_class_id: booking.fitness_class for booking in bookings}.values())
+        return results
+
+    def cancel(self, booking):
+        """
+        Deletes the booking and hands its seat to the first client on the
+        class waitlist, in one transaction.
+
+        With someone waiting, the seat goes straight to them and
+        available_slots never changes, so the class does not reappear in
+        the catalogue for other clients to race for. Only with an empty
+        waitlist is the seat returned with one conditional UPDATE.
+
+        Returns the delete's (count, {label: count}), like Model.delete().
+        The promoted Booking, or None, is set on `booking.promoted_booking`.
+        """
+        with transaction.atomic(using=self.db):
+            result = self.filter(pk=booking.pk).delete()
+            if not result[0]:
+                raise self.model.DoesNotExist(f"Booking '{booking.pk}' does not exist.")
+            promoted = WaitlistEntry.objects.using(self.db).promote_next(booking.fitness_class)
+            if promoted is None:
+                self._release_seat(booking.fitness_class)
+                bump_catalogue_version(using=self.db)
+                self._seats_changed([booking.fitness_class])
+        booking.promoted_booking = promoted
+        return result
 
 
 class Booking(models.Model): 
@@ -74,22 +577,127 @@ class Booking(models.Model):
     client_name = models.CharField(max_length=100) 
     client_email = models.EmailField() 
     booking_time = models.DateTimeField(auto_now_add=True) 
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = BookingManager()
     
     class Meta: 
+        unique_together = ('fitness_class', 'client_email')
         indexes = [
             models.Index(fields=['client_email'], name='booking_client_email_idx'),
+            models.Index(fields=['booking_time'], name='booking_time_idx'),
         ] 
 
     def __str__(self): 
         return f"Booking for {self.client_name} in {self.fitness_class.name}"
 
-    def save(self, *args, **kwargs):
-        if self._state.adding:
-            self.fitness_class.available_slots -= 1
-            self.fitness_class.save()
+    def save(self, *args, adjust_slots=True, **kwargs):
+        if self._state.adding and adjust_slots:
+            Booking.objects.db_manager(kwargs.pop('using', None)).add(self, *args, **kwargs)
+            return
         super().save(*args, **kwargs)
 
     def delete(self, *args, **kwargs):
-        self.fitness_class.available_slots += 1
-        self.fitness_class.save()
-        super().delete(*args, **kwargs)
\ No newline at end of file
+        return Booking.objects.db_manager(kwargs.get('using')).cancel(self)
+
+
+class WaitlistQuerySet(models.QuerySet):
+
+    def with_position(self):
+        """
+        Annotates each entry with `position`, its 1-based place in its
+        class's queue, in the same query.
+        """
+        ahead = (
+            WaitlistEntry.objects
+            .filter(fitness_class_id=OuterRef('fitness_class_id'))
+            .filter(Q(joined_at__lt=OuterRef('joined_at')) | Q(joined_at=OuterRef('joined_at'), id__lt=OuterRef('id')))
+            .order_by()
+            .values('fitness_class_id')
+            .annotate(count=Count('id'))
+            .values('count')
+        )
+        return self.annotate(position=Coalesce(Subquery(ahead), 0) + 1)
+
+    def promote_next(self, fitness_class):
+        """
+        Books the longest-waiting client into `fitness_class` and removes
+        their waitlist entry. The caller must already hold the seat. Returns
+        the new Booking, or None when nobody is waiting.
+        """
+        already_booked = Booking.objects.filter(
+            fitness_class_id=OuterRef('fitness_class_id'), client_email=OuterRef('client_email')
+        )
+        waiting = self.filter(fitness_class=fitness_class).exclude(Exists(already_booked)).order_by('joined_at', 'id')
+        while True:
+            entry = waiting.first()
+            if entry is None:
+                return None
+            # Whoever deletes the entry owns the promotion; a concurrent
+            # cancellation that picked the same entry moves on to the next.
+            if self.filter(pk=entry.pk).delete()[0]:
+                booking = Booking(fitness_class=fitness_class, client_name=entry.client_name, client_email=entry.client_email)
+                booking.save(using=self.db, adjust_slots=False)
+                return booking
+
+
+class WaitlistEntry(models.Model):
+    fitness_class = models.ForeignKey(FitnessClass, on_delete=models.CASCADE, related_name='waitlist')
+    client_name = models.CharField(max_length=100)
+    client_email = models.EmailField()
+    joined_at = models.DateTimeField(auto_now_add=True)
+
+    objects = WaitlistQuerySet.as_manager()
+
+    class Meta:
+        unique_together = ('fitness_class', 'client_email')
+        indexes = [
+            # Head of each class's queue for promote_next().
+            models.Index(fields=['fitness_class', 'joined_at', 'id'], name='waitlist_queue_idx'),
+            models.Index(fields=['client_email'], name='waitlist_client_email_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.client_name} waiting for {self.fitness_class.name}"
+
+
+# --- Archive ---
+# Classes that started before the archive cutoff and their bookings, moved
+# out of the live tables by app.archive. Rows keep their original ids.
+
+class ArchivedFitnessClass(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    name = models.CharField(max_length=100)
+    date_time = models.DateTimeField()
+    instructor = models.CharField(max_length=100)
+    total_slots = models.PositiveIntegerField()
+    available_slots = models.PositiveIntegerField()
+    # Copied from the live row, so list ETags stay the same after archiving.
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['date_time'], name='archivedclass_date_time_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.id}. {self.name} - {self.instructor} on {self.date_time.strftime('%Y-%m-%d %H:%M')}"
+
+
+class ArchivedBooking(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    fitness_class = models.ForeignKey(ArchivedFitnessClass, on_delete=models.CASCADE, related_name='bookings')
+    client_name = models.CharField(max_length=100)
+    client_email = models.EmailField()
+    booking_time = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['client_email'], name='archivedbooking_email_idx'),
+            models.Index(fields=['booking_time'], name='archivedbooking_time_idx'),
+        ]
+
+    def __str__(self):
+        return f"Booking for {self.client_name} in {self.fitness_class.name}"
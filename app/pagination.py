@@ -0,0 +1,207 @@
+import hashlib
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import namedtuple
+from operator import attrgetter
+from urllib import parse
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int, _reverse_ordering
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+Cursor = namedtuple('Cursor', ['reverse', 'position'])
+
+
+class KeysetCursorPagination(BasePagination):
+    """
+    Keyset pagination over a composite, unique ordering such as ('date_time', 'id').
+
+    Unlike DRF's CursorPagination, which keys on the first ordering field and
+    falls back to offsets for ties, the cursor here stores the full ordering
+    tuple of the boundary row. Every page is a single indexed range query
+    (`WHERE (a, b) > (x, y) ORDER BY a, b LIMIT n`) no matter how deep the
+    client has paged, and rows sharing a timestamp are never skipped.
+    """
+    cursor_query_param = 'cursor'
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('id',)
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.get_page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        paginate_queryset() for async views, fetching the page with the async ORM.
+        """
+        queryset = self.get_page_queryset(queryset, request)
+        return self.set_page([instance async for instance in queryset.aiterator()])
+
+    def paginate_querysets(self, querysets, request, view=None):
+        """
+        One page over several querysets of rows with the same ordering
+        fields and disjoint ids, such as live and archived bookings. Each is
+        paged with the same cursor and the pages are merged, so it is still
+        one range query per table.
+        """
+        results = [instance for queryset in querysets for instance in self.get_page_queryset(queryset, request)]
+        return self.set_page(self.merge(results))
+
+    async def apaginate_querysets(self, querysets, request, view=None):
+        results = []
+        for queryset in querysets:
+            results += [instance async for instance in self.get_page_queryset(queryset, request).aiterator()]
+        return self.set_page(self.merge(results))
+
+    def merge(self, results):
+        ordering = _reverse_ordering(self.ordering) if self.cursor is not None and self.cursor.reverse else self.ordering
+        # Stable sorts, least significant field first.
+        for order in reversed(ordering):
+            results.sort(key=attrgetter(order.lstrip('-')), reverse=order.startswith('-'))
+        return results[:self.page_size + 1]
+
+    def get_page_queryset(self, queryset, request):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.fields = [queryset.model._meta.get_field(order.lstrip('-')) for order in self.ordering]
+        self.cursor = self.decode_cursor(request)
+
+        reverse = self.cursor is not None and self.cursor.reverse
+        ordering = _reverse_ordering(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if self.cursor is not None:
+            queryset = queryset.filter(self.get_keyset_filter(ordering, self.cursor.position))
+
+        # Fetch one extra row to find out whether another page follows.
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        self.page = results[:self.page_size]
+        has_more = len(results) > self.page_size
+
+        if self.cursor is not None and self.cursor.reverse:
+            self.page.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def get_keyset_filter(self, ordering, position):
+        """
+        Build `a >= x AND ((a > x) OR (a = x AND b > y) OR ...)` for the given
+        ordering, flipping each comparison for descending fields. The leading
+        `a >= x` is redundant but lets the planner turn the cursor into an
+        index range seek instead of filtering the OR row by row.
+        """
+        condition = Q()
+        equal_prefix = {}
+        for order, value in zip(ordering, position):
+            name = order.lstrip('-')
+            lookup = 'lt' if order.startswith('-') else 'gt'
+            condition |= Q(**equal_prefix, **{f'{name}__{lookup}': value})
+            equal_prefix[name] = value
+        first = ordering[0]
+        bound = Q(**{f"{first.lstrip('-')}__{'lte' if first.startswith('-') else 'gte'}": position[0]})
+        return bound & condition
+
+    def get_position(self, instance):
+        return [field.value_to_string(instance) for field in self.fields]
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            querystring = urlsafe_b64decode(encoded.encode('ascii')).decode('ascii')
+            tokens = parse.parse_qs(querystring, keep_blank_values=True)
+            reverse = bool(int(tokens.get('r', ['0'])[0]))
+            values = tokens['p']
+            if len(values) != len(self.fields):
+                raise ValueError('Cursor does not match the ordering.')
+            position = [field.to_python(value) for field, value in zip(self.fields, values)]
+        except (TypeError, ValueError, KeyError, UnicodeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+        return Cursor(reverse=reverse, position=position)
+
+    def encode_cursor(self, cursor):
+        tokens = {'p': cursor.position}
+        if cursor.reverse:
+            tokens['r'] = '1'
+        querystring = parse.urlencode(tokens, doseq=True)
+        encoded = urlsafe_b64encode(querystring.encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(Cursor(reverse=False, position=self.get_position(self.page[-1])))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(Cursor(reverse=True, position=self.get_position(self.page[0])))
+
+    def get_etag(self, *parts):
+        """
+        Weak ETag of the current page, from each row's version, the paging
+        state and `parts` (request options that change the representation,
+        such as the timezone). The rows are never serialized for it, so a
+        matching If-None-Match costs only the page query.
+        """
+        digest = hashlib.md5(repr((self.has_next, self.has_previous, parts)).encode())
+        for instance in self.page:
+            digest.update(repr(self.get_row_version(instance)).encode())
+        return f'W/"{digest.hexdigest()}"'
+
+    def get_row_version(self, instance):
+        """
+        A value that changes whenever the row's representation does.
+        """
+        return instance.pk, instance.updated_at
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+
+class FitnessClassCursorPagination(KeysetCursorPagination):
+    ordering = ('date_time', 'id')
+
+    def get_row_version(self, instance):
+        # Booking a sharded class claims a shard without saving the class.
+        return instance.pk, instance.updated_at, instance.available_slots
+
+
+class BookingCursorPagination(KeysetCursorPagination):
+    ordering = ('-booking_time', 'id')
+
+    def get_row_version(self, instance):
+        # Bookings embed their class, and booking_expired flips once it starts.
+        fitness_class = instance.fitness_class
+        return (
+            instance.pk, instance.updated_at, fitness_class.updated_at, fitness_class.available_slots,
+            fitness_class.date_time < timezone.now(),
+        )
@@ -0,0 +1,114 @@
+"""
+Primary/replica database routing with read-your-writes stickiness.
+
+Every write goes to `default`, the primary. Reads go to the primary as
+well, except inside `replica_reads()`: there, reads of the catalogue and
+booking models go to one of settings.DATABASE_REPLICAS. The class and
+booking list views open that block for their request (see
+ReplicaReadMixin).
+
+Replicas lag the primary. A client that has just booked, cancelled or
+joined a waitlist is pinned to the primary for REPLICA_PIN_SECONDS. The
+pin is kept in a cookie for browsers, and under the client's email in the
+REPLICA_PIN_CACHE_ALIAS cache, so the client's next list request shows
+their own write. Clients that drop the cookie, such as API and mobile
+clients, rely on the email pin, and that only reaches every worker when the
+cache is shared. With a process-local cache their next read is only pinned
+if it hits the same worker, so `manage.py check --deploy` warns about one
+when replicas are configured (check_replica_pin_cache).
+"""
+import contextvars
+import hashlib
+import random
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+
+from .cache import is_shared_cache
+
+PIN_COOKIE = 'primary_pin'
+
+_replica_reads = contextvars.ContextVar('replica_reads', default=False)
+
+
+def get_replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """
+    Lets the router send reads in this block to a replica.
+    """
+    token = _replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+class PrimaryReplicaRouter:
+    # Read-heavy models served by the list endpoints. Users, tokens and
+    # slot shards are always read from the primary.
+    replica_models = {'app.fitnessclass', 'app.booking', 'app.archivedfitnessclass', 'app.archivedbooking'}
+
+    def db_for_read(self, model, **hints):
+        if 'instance' in hints:
+            # Related objects come from the database their instance was read from.
+            return None
+        replicas = get_replicas()
+        if replicas and _replica_reads.get() and model._meta.label_lower in self.replica_models:
+            return random.choice(replicas)
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary.
+        return True
+
+
+def get_pin_cache():
+    return caches[getattr(settings, 'REPLICA_PIN_CACHE_ALIAS', 'default')]
+
+
+def check_replica_pin_cache(app_configs=None, **kwargs):
+    if not get_replicas() or is_shared_cache(get_pin_cache()):
+        return []
+    return [checks.Warning(
+        'REPLICA_PIN_CACHE_ALIAS points at a process-local cache.',
+        hint=(
+            'Clients without the pin cookie may read their own writes from a lagging replica '
+            'on another worker. Point the alias at a cache all workers share, such as Redis or memcached.'
+        ),
+        id='app.W002',
+    )]
+
+
+def _pin_key(client_email):
+    digest = hashlib.sha256(client_email.strip().lower().encode()).hexdigest()
+    return f'primary-pin:{digest}'
+
+
+def pin_to_primary(response, client_emails):
+    """
+    Pins the clients that made a write to the primary for REPLICA_PIN_SECONDS.
+    """
+    seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+    if not get_replicas() or not seconds:
+        return
+    emails = [email for email in client_emails if email]
+    if emails:
+        get_pin_cache().set_many({_pin_key(email): True for email in emails}, timeout=seconds)
+    response.set_cookie(PIN_COOKIE, '1', max_age=seconds, httponly=True, samesite='Lax')
+
+
+def is_pinned(request, client_email=None):
+    if not get_replicas():
+        return False
+    if request.COOKIES.get(PIN_COOKIE):
+        return True
+    return bool(client_email) and get_pin_cache().get(_pin_key(client_email)) is not None
@@ -2,14 +2,26 @@ from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from rest_framework.validators import UniqueValidator
 from django.contrib.auth.password_validation import validate_password
-from .models import FitnessClass, Booking
-from zoneinfo import ZoneInfo
+from rest_framework_simplejwt.serializers import (
+    TokenObtainPairSerializer as BaseTokenObtainPairSerializer,
+    TokenRefreshSerializer as BaseTokenRefreshSerializer,
+)
+from .models import FitnessClass, Booking, WaitlistEntry
+from .tokens import FilteredRefreshToken
+from .metrics import TimedSerializerMixin, serializer_timer
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 from django.utils import timezone
+from django.core.exceptions import FieldDoesNotExist
 
 User = get_user_model()
 
+
+class TimedListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    pass
+
 # --- User Serializer ---
-class RegisterSerializer(serializers.ModelSerializer):
+class RegisterSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     email = serializers.EmailField(
         required=True,
         validators=[UniqueValidator(queryset=User.objects.all())]
@@ -34,32 +46,177 @@ class RegisterSerializer(serializers.ModelSerializer):
         validated_data.pop('password2')
         user = User.objects.create_user(**validated_data)
         return user
-    
+
+
+class TokenObtainPairSerializer(TimedSerializerMixin, BaseTokenObtainPairSerializer):
+    pass
+
+
+class TokenRefreshSerializer(TimedSerializerMixin, BaseTokenRefreshSerializer):
+    token_class = FilteredRefreshToken
+
+
+# --- Timezone helpers ---
+DEFAULT_TIMEZONE = 'Asia/Kolkata'
+
+
+@lru_cache(maxsize=128)
+def _load_timezone(name):
+    return ZoneInfo(name)
+
+
+def resolve_timezone(name):
+    """
+    Returns the ZoneInfo for `name`, falling back to DEFAULT_TIMEZONE when it is
+    missing or invalid. Resolved zones are kept in an LRU cache.
+    """
+    try:
+        return _load_timezone(name or DEFAULT_TIMEZONE)
+    except (ZoneInfoNotFoundError, ValueError):
+        return _load_timezone(DEFAULT_TIMEZONE)
+
+
+class RequestTimezoneMixin:
+    """
+    Resolves the `?timezone=` query parameter once per request. The result is
+    stored on the root serializer's context, which list and nested serializers
+    share, so every row reuses it.
+    """
+
+    @property
+    def target_timezone(self):
+        context = self.context
+        target_tz = context.get('timezone')
+        if target_tz is None:
+            request = context.get('request')
+            target_tz = resolve_timezone(request.query_params.get('timezone') if request else None)
+            context['timezone'] = target_tz
+        return target_tz
+
+
+# --- Sparse fieldsets and the compact format ---
+def _has_field_path(model, path):
+    for name in path.split('__'):
+        try:
+            model = model._meta.get_field(name).related_model
+        except FieldDoesNotExist:
+            return False
+    return True
+
+
+class ProjectionMixin:
+    """
+    `?fields=` projection and the compact columnar format for the list
+    serializers. `field_getters` maps each output field to a function of
+    (serializer, instance); `field_sources` maps it to the model fields it
+    reads, which the views pass to QuerySet.only(). `required_sources` are
+    read regardless, for the pagination ordering and the page ETag.
+
+    Full and projected rows are both built from `field_getters`, rather than
+    through the per-field ModelSerializer path, so date_time is localized
+    and formatted exactly once.
+    """
+    field_getters = {}
+    field_sources = {}
+    required_sources = ()
+
+    @classmethod
+    def parse_fields(cls, value, param='fields'):
+        """
+        The field names in the comma-separated `value`, or None for all of them.
+        """
+        if value is None:
+            return None
+        names = list(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+        unknown = [name for name in names if name not in cls.field_getters]
+        if not names or unknown:
+            raise serializers.ValidationError({
+                param: [f"Unknown fields: {', '.join(unknown) or value!r}. Choose from {', '.join(cls.field_getters)}."]
+            })
+        return names
+
+    @classmethod
+    def get_model_fields(cls, names, class_names=None):
+        names = names or cls.field_getters
+        return {source for name in names for source in cls.field_sources[name]} | set(cls.required_sources)
+
+    @classmethod
+    def project_queryset(cls, queryset, projection):
+        """
+        `queryset` loading only the columns the projection shows.
+        """
+        if projection['fields'] is None and projection.get('class_fields') is None:
+            return queryset
+        sources = cls.get_model_fields(projection['fields'], projection.get('class_fields'))
+        # Archived rows share the field names but have no shard_count.
+        return queryset.only(*(source for source in sources if _has_field_path(queryset.model, source)))
+
+    def to_representation(self, instance):
+        return self.represent(instance, self.context.get('fields'))
+
+    def represent(self, instance, names=None):
+        getters = self.field_getters
+        if names is None:
+            return {name: getter(self, instance) for name, getter in getters.items()}
+        return {name: getters[name](self, instance) for name in names}
+
+    def get_column_getters(self, names):
+        return [self.field_getters[name] for name in names]
+
+    def to_compact(self, instances):
+        """
+        `instances` as `{"columns": [...], "rows": [[...], ...]}`, with the
+        field names sent once per page instead of once per row.
+        """
+        with serializer_timer():
+            return self.get_compact(instances)
+
+    def get_compact(self, instances):
+        names = self.context.get('fields') or list(self.field_getters)
+        getters = self.get_column_getters(names)
+        return {'columns': names, 'rows': [[getter(self, instance) for getter in getters] for instance in instances]}
+
+
+def parse_projection(query_params, serializer_class):
+    """
+    The `fields`, `class_fields` and `compact` list options, for the
+    serializer context. Raises ValidationError for unknown field names.
+    """
+    nested = getattr(serializer_class, 'nested_serializer_class', None)
+    return {
+        'fields': serializer_class.parse_fields(query_params.get('fields')),
+        'class_fields': nested.parse_fields(query_params.get('class_fields'), 'class_fields') if nested else None,
+        'compact': query_params.get('compact', '').lower() in ('1', 'true'),
+    }
+
 
 # --- Classes Serializers ---
-class FitnessClassSerializer(serializers.ModelSerializer):
+class FitnessClassSerializer(ProjectionMixin, TimedSerializerMixin, RequestTimezoneMixin, serializers.ModelSerializer):
+    field_getters = {
+        'id': lambda self, fitness_class: fitness_class.id,
+        'name': lambda self, fitness_class: fitness_class.name,
+        'date_time': lambda self, fitness_class: fitness_class.date_time.astimezone(self.target_timezone).isoformat(),
+        'instructor': lambda self, fitness_class: fitness_class.instructor,
+        'total_slots': lambda self, fitness_class: fitness_class.total_slots,
+        'available_slots': lambda self, fitness_class: fitness_class.available_slots,
+    }
+    field_sources = {
+        'id': (),
+        'name': ('name',),
+        'date_time': ('date_time',),
+        'instructor': ('instructor',),
+        'total_slots': ('total_slots',),
+        'available_slots': ('available_slots',),
+    }
+    required_sources = ('date_time', 'updated_at', 'available_slots', 'shard_count')
 
     class Meta:
         model = FitnessClass
+        list_serializer_class = TimedListSerializer
         fields = ['id', 'name', 'date_time', 'instructor', 'total_slots', 'available_slots']
 
-    def to_representation(self, instance):
-        representation = super().to_representation(instance)
-        user_timezone = self.context['request'].query_params.get('timezone', 'Asia/Kolkata')
 
-        try:
-            target_tz = ZoneInfo(user_timezone)
-            utc_datetime = instance.date_time
-            representation['date_time'] = utc_datetime.astimezone(target_tz).isoformat()
-        except KeyError:
-            ist_tz = ZoneInfo('Asia/Kolkata')
-            utc_datetime = instance.date_time
-            representation['date_time'] = utc_datetime.astimezone(ist_tz).isoformat()
-            
-        return representation
-
-
-class BookingCreateSerializer(serializers.ModelSerializer):
+class BookingCreateSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class_id = serializers.PrimaryKeyRelatedField(
         queryset=FitnessClass.objects.all(),
         source='fitness_class' 
@@ -68,35 +225,150 @@ class BookingCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Booking
         fields = ['class_id', 'client_name', 'client_email']
+        # validate() reports duplicates with its own message; skip the generated unique_together check.
+        validators = []
     
     def validate(self, data):
         if Booking.objects.filter(fitness_class=data['fitness_class'], client_email=data['client_email']).exists():
             raise serializers.ValidationError("You have already booked this class.")
         return data
 
+    def create(self, validated_data):
+        return Booking.objects.book(**validated_data)
+
+
+class WaitlistJoinSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    class_id = serializers.PrimaryKeyRelatedField(
+        queryset=FitnessClass.objects.all(),
+        source='fitness_class'
+    )
+
+    class Meta:
+        model = WaitlistEntry
+        fields = ['class_id', 'client_name', 'client_email']
+        validators = []
+
+    def validate(self, data):
+        if Booking.objects.filter(fitness_class=data['fitness_class'], client_email=data['client_email']).exists():
+            raise serializers.ValidationError("You have already booked this class.")
+        if WaitlistEntry.objects.filter(fitness_class=data['fitness_class'], client_email=data['client_email']).exists():
+            raise serializers.ValidationError("You are already on the waitlist for this class.")
+        return data
+
+
+class WaitlistEntrySerializer(TimedSerializerMixin, RequestTimezoneMixin, serializers.ModelSerializer):
+    """
+    Expects entries from WaitlistEntry.objects.with_position(), with the
+    class loaded through select_related('fitness_class').
+    """
+
+    class Meta:
+        model = WaitlistEntry
+        list_serializer_class = TimedListSerializer
+        fields = ['id', 'fitness_class', 'client_name', 'client_email', 'joined_at']
 
-class BookingListSerializer(serializers.ModelSerializer):
+    def to_representation(self, instance):
+        return {
+            'id': instance.id,
+            'class_id': instance.fitness_class_id,
+            'class_name': instance.fitness_class.name,
+            'date_time': instance.fitness_class.date_time.astimezone(self.target_timezone).isoformat(),
+            'client_name': instance.client_name,
+            'client_email': instance.client_email,
+            'joined_at': self.fields['joined_at'].to_representation(instance.joined_at),
+            'position': instance.position,
+        }
+
+
+class BulkBookingItemSerializer(serializers.Serializer):
+    class_id = serializers.IntegerField(min_value=1)
+    client_name = serializers.CharField(max_length=100)
+    client_email = serializers.EmailField()
+
+
+class BulkBookingSerializer(TimedSerializerMixin, serializers.Serializer):
+    bookings = serializers.ListField(child=serializers.DictField(), allow_empty=False, max_length=200)
+
+
+class BookingListSerializer(ProjectionMixin, TimedSerializerMixin, RequestTimezoneMixin, serializers.ModelSerializer):
     fitness_class = FitnessClassSerializer(read_only=True)
+    # Projected by `class_fields`.
+    nested_serializer_class = FitnessClassSerializer
+
+    field_getters = {
+        'id': lambda self, booking: booking.id,
+        'fitness_class': lambda self, booking: self.fields['fitness_class'].represent(booking.fitness_class, self.context.get('class_fields')),
+        'client_name': lambda self, booking: booking.client_name,
+        'client_email': lambda self, booking: booking.client_email,
+        'booking_time': lambda self, booking: self.fields['booking_time'].to_representation(booking.booking_time),
+        'date_time': lambda self, booking: booking.booking_time.astimezone(self.target_timezone).isoformat(),
+        'booking_expired': lambda self, booking: booking.fitness_class.date_time < self.context.setdefault('now', timezone.now()),
+    }
+    field_sources = {
+        'id': (),
+        'fitness_class': (),
+        'client_name': ('client_name',),
+        'client_email': ('client_email',),
+        'booking_time': ('booking_time',),
+        'date_time': ('booking_time',),
+        'booking_expired': (),
+    }
+    # The class is always joined: BookingCursorPagination versions each row
+    # by its class's updated_at, free seats and start time.
+    required_sources = (
+        'booking_time', 'updated_at', 'fitness_class', 'fitness_class__updated_at', 'fitness_class__date_time',
+        'fitness_class__available_slots', 'fitness_class__shard_count',
+    )
 
     class Meta:
         model = Booking
+        list_serializer_class = TimedListSerializer
         fields = ['id', 'fitness_class', 'client_name', 'client_email', 'booking_time']
         read_only_fields = ['booking_time']
 
-    def to_representation(self, instance):
-        representation = super().to_representation(instance)
-        user_timezone = self.context['request'].query_params.get('timezone', 'Asia/Kolkata')
+    @classmethod
+    def get_model_fields(cls, names, class_names=None):
+        sources = super().get_model_fields(names)
+        if 'fitness_class' in (names or cls.field_getters):
+            nested = cls.nested_serializer_class
+            sources.update(f'fitness_class__{source}' for source in nested.get_model_fields(class_names))
+        return sources
+
+    def get_compact(self, instances):
+        # Each class is sent once, in a `classes` table keyed by id, and the
+        # `fitness_class` column holds the id.
+        compact = super().get_compact(instances)
+        if 'fitness_class' in compact['columns']:
+            class_serializer = self.fields['fitness_class']
+            class_names = self.context.get('class_fields')
+            classes = {}
+            for instance in instances:
+                if instance.fitness_class_id not in classes:
+                    classes[instance.fitness_class_id] = class_serializer.represent(instance.fitness_class, class_names)
+            compact['classes'] = classes
+        return compact
+
+    def get_column_getters(self, names):
+        getters = super().get_column_getters(names)
+        if 'fitness_class' in names:
+            getters[names.index('fitness_class')] = lambda self, booking: booking.fitness_class_id
+        return getters
+
 
+class BookingExportFilterSerializer(serializers.Serializer):
+    # Not `format`, which DRF reserves for choosing a renderer.
+    export_format = serializers.ChoiceField(choices=['csv', 'ndjson'], default='csv')
+    start = serializers.DateTimeField(required=False, help_text="Bookings made at or after this time.")
+    end = serializers.DateTimeField(required=False, help_text="Bookings made before this time.")
+    class_id = serializers.CharField(required=False, help_text="Comma-separated class ids.")
+
+    def validate_class_id(self, value):
         try:
-            target_tz = ZoneInfo(user_timezone)
-            utc_datetime = instance.booking_time
-            representation['date_time'] = utc_datetime.astimezone(target_tz).isoformat()
-        except KeyError:
-            ist_tz = ZoneInfo('Asia/Kolkata')
-            utc_datetime = instance.booking_time
-            representation['date_time'] = utc_datetime.astimezone(ist_tz).isoformat()
-
-        now = timezone.now()
-        representation['booking_expired'] = instance.fitness_class.date_time < now 
-
-        return representation
\ No newline at end of file
+            return [int(class_id) for class_id in value.split(',') if class_id.strip()]
+        except ValueError:
+            raise serializers.ValidationError("Enter comma-separated class ids.")
+
+    def validate(self, data):
+        if data.get('start') and data.get('end') and data['start'] >= data['end']:
+            raise serializers.ValidationError("start must be before end.")
+        return data
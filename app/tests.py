@@ -1,9 +1,50 @@
 from django.urls import reverse
 from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.test import APITestCase
-from .models import FitnessClass, Booking
+from .authentication import CachedJWTAuthentication
+from .cache import bump_catalogue_version, get_cache_stats, get_catalogue_version, reset_cache_stats, user_cache_key
+from .events import SlotEventHub, get_hub, stream_events
+from .export import export_queryset
+from .idempotency import check_idempotency_cache
+from .routers import check_replica_pin_cache
+from .hashing import CredentialPool, CredentialPoolBusy, get_credential_pool
+from .models import ArchivedBooking, ArchivedFitnessClass, ClassSchedule, FitnessClass, Booking, SlotShard, WaitlistEntry, NoAvailableSlots
+from . import serializers as app_serializers
+from .tokens import BlacklistFilter, BloomFilter, FilteredRefreshToken, bump_blacklist_version, get_blacklist_filter
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from .log import AsyncQueueHandler, BatchingQueueListener, KeyValueFormatter, DROP_OLDEST
+from .metrics import registry as metrics_registry
+import logging
+import asyncio
+import queue
+import threading
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.checks import run_checks
+from django.core.management import call_command
+from django.db import IntegrityError, OperationalError, connection, transaction
+from asgiref.sync import async_to_sync, sync_to_async
+from io import StringIO
+from rest_framework.test import APIRequestFactory
+from django.test import AsyncClient, SimpleTestCase, TransactionTestCase, override_settings
+from django.contrib.auth.hashers import make_password
+from rest_framework.request import Request
+from unittest import mock
+import time
+from django.db.models import Sum
 from django.utils import timezone
 import datetime
+from zoneinfo import ZoneInfo
+from django.core.exceptions import ValidationError
+from django.test.utils import CaptureQueriesContext
+import os
+import tempfile
+import csv
+import gzip
+import json
+
+User = get_user_model()
 
 class FitnessClassListViewTests(APITestCase):
     def setUp(self):
@@ -19,7 +60,7 @@ class FitnessClassListViewTests(APITestCase):
         url = reverse('class-list')
         response = self.client.get(url, format='json')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 2)
+        self.assertEqual(len(response.data['results']), 2)
 
     def test_list_fitness_classes_with_timezone(self):
         """
@@ -28,7 +69,7 @@ class FitnessClassListViewTests(APITestCase):
         url = reverse('class-list')
         response = self.client.get(url, {'timezone': 'America/New_York'}, format='json')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertIn('-04:00', response.data[0]['date_time'])
+        self.assertIn('-04:00', response.data['results'][0]['date_time'])
 
 
 class BookingCreateViewTests(APITestCase):
@@ -73,6 +114,498 @@ class BookingCreateViewTests(APITestCase):
         self.assertIn('You have already booked this class.', response.data['non_field_errors'])
         self.assertEqual(Booking.objects.count(), 1)
 
+class AtomicSlotClaimTests(APITestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        self.fitness_class = FitnessClass.objects.create(name='Yoga', date_time=self.now + datetime.timedelta(days=1), instructor='Jane Doe', total_slots=2, available_slots=2)
+
+    def test_book_claims_slots_until_full(self):
+        """
+        Ensure the conditional update hands out exactly the available seats.
+        """
+        Booking.objects.book(self.fitness_class, client_name='A', client_email='a@example.com')
+        Booking.objects.book(self.fitness_class, client_name='B', client_email='b@example.com')
+        with self.assertRaises(NoAvailableSlots):
+            Booking.objects.book(self.fitness_class, client_name='C', client_email='c@example.com')
+        self.fitness_class.refresh_from_db()
+        self.assertEqual(self.fitness_class.available_slots, 0)
+        self.assertEqual(Booking.objects.count(), 2)
+
+    def test_duplicate_insert_releases_the_claimed_slot(self):
+        """
+        Ensure a duplicate booking that slips past validation rolls back its seat claim.
+        """
+        Booking.objects.book(self.fitness_class, client_name='A', client_email='a@example.com')
+        with self.assertRaises(IntegrityError):
+            Booking.objects.book(self.fitness_class, client_name='A', client_email='a@example.com')
+        self.fitness_class.refresh_from_db()
+        self.assertEqual(self.fitness_class.available_slots, 1)
+
+    def test_database_rejects_invalid_slot_counts(self):
+        """
+        Ensure the CHECK constraints guard slot counts even for raw updates.
+        """
+        for available_slots in (-1, 3):
+            with self.assertRaises(IntegrityError), transaction.atomic():
+                FitnessClass.objects.filter(pk=self.fitness_class.pk).update(available_slots=available_slots)
+
+
+class BulkBookingCreateViewTests(APITestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        self.url = reverse('book-bulk')
+        self.team_class = FitnessClass.objects.create(name='Team Yoga', date_time=self.now + datetime.timedelta(days=1), instructor='Jane Doe', total_slots=5, available_slots=5)
+        self.small_class = FitnessClass.objects.create(name='Small Class', date_time=self.now + datetime.timedelta(days=1), instructor='John Doe', total_slots=1, available_slots=1)
+        self.past_class = FitnessClass.objects.create(name='Past Class', date_time=self.now - datetime.timedelta(days=1), instructor='Old Timer', total_slots=5, available_slots=5)
+
+    def item(self, fitness_class, n):
+        return {'class_id': fitness_class.id, 'client_name': f'Member {n}', 'client_email': f'member{n}@example.com'}
+
+    def test_books_a_whole_team(self):
+        """
+        Ensure a team is booked into a class in one request with correct slot accounting.
+        """
+        data = {'bookings': [self.item(self.team_class, n) for n in range(3)]}
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['booked'], 3)
+        self.assertEqual([r['status'] for r in response.data['results']], ['booked'] * 3)
+        self.team_class.refresh_from_db()
+        self.assertEqual(self.team_class.available_slots, 2)
+        self.assertEqual(Booking.objects.filter(fitness_class=self.team_class).count(), 3)
+
+    def test_reports_per_item_failures(self):
+        """
+        Ensure invalid, expired, duplicate and overbooked items fail individually.
+        """
+        Booking.objects.create(fitness_class=self.team_class, client_name='Member 0', client_email='member0@example.com')
+        data = {'bookings': [
+            self.item(self.team_class, 0),                         # already booked
+            self.item(self.team_class, 1),                         # booked
+            self.item(self.team_class, 1),                         # repeated in the batch
+            self.item(self.past_class, 2),                         # expired
+            {'class_id': 9999, 'client_name': 'X', 'client_email': 'x@example.com'},
+            {'class_id': self.team_class.id, 'client_name': 'Y'},  # missing email
+            self.item(self.small_class, 3),                        # two clients, one seat
+            self.item(self.small_class, 4),
+        ]}
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        statuses = [r['status'] for r in response.data['results']]
+        self.assertEqual(statuses, ['failed', 'booked', 'failed', 'failed', 'failed', 'failed', 'failed', 'failed'])
+        self.assertEqual(response.data['results'][0]['errors']['detail'], 'You have already booked this class.')
+        self.assertEqual(response.data['results'][6]['errors']['detail'], 'Not enough available slots for this class.')
+        self.assertIn('client_email', response.data['results'][5]['errors'])
+        self.small_class.refresh_from_db()
+        self.assertEqual(self.small_class.available_slots, 1)
+        self.team_class.refresh_from_db()
+        self.assertEqual(self.team_class.available_slots, 3)
+
+    def test_all_failures_return_bad_request(self):
+        response = self.client.post(self.url, {'bookings': [self.item(self.past_class, 1)]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(self.url, {'bookings': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_query_count_is_independent_of_batch_size(self):
+        """
+        Ensure a batch costs one query per class, not per client.
+        """
+        data = {'bookings': [self.item(self.team_class, n) for n in range(5)]}
+        # in_bulk, duplicate check, savepoint, one UPDATE, bulk INSERT, release.
+        with self.assertNumQueries(6):
+            response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.data['booked'], 5)
+
+
+class IdempotencyKeyTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.now = timezone.now()
+        self.fitness_class = FitnessClass.objects.create(name='Yoga', date_time=self.now + datetime.timedelta(days=1), instructor='Jane Doe', total_slots=5, available_slots=5)
+        self.url = reverse('book-class')
+        self.data = {'class_id': self.fitness_class.id, 'client_name': 'Test User', 'client_email': 'test@example.com'}
+
+    def test_deploy_check_requires_a_shared_cache(self):
+        """
+        Ensure the deploy checks warn when idempotency records would live in one worker's private cache.
+        """
+        with self.settings(CACHES=WORKER_CACHES, IDEMPOTENCY_CACHE_ALIAS='worker1'):
+            self.assertEqual([warning.id for warning in check_idempotency_cache()], ['app.W001'])
+            self.assertIn('app.W001', [message.id for message in run_checks(include_deployment_checks=True)])
+        with self.settings(CACHES=WORKER_CACHES, IDEMPOTENCY_CACHE_ALIAS='shared'):
+            self.assertEqual(check_idempotency_cache(), [])
+
+    def test_retry_replays_the_first_response(self):
+        """
+        Ensure a retried booking returns the stored 201 without touching the database.
+        """
+        first = self.client.post(self.url, self.data, format='json', HTTP_IDEMPOTENCY_KEY='retry-1')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        with self.assertNumQueries(0):
+            retry = self.client.post(self.url, self.data, format='json', HTTP_IDEMPOTENCY_KEY='retry-1')
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.fitness_class.refresh_from_db()
+        self.assertEqual(self.fitness_class.available_slots, 4)
+
+    def test_failed_responses_are_replayed_too(self):
+        """
+        Ensure a retry gets the same 4xx answer as the original request.
+        """
+        self.fitness_class.available_slots = 0
+        self.fitness_class.save()
+        first = self.client.post(self.url, self.data, format='json', HTTP_IDEMPOTENCY_KEY='full-1')
+        retry = self.client.post(self.url, self.data, format='json', HTTP_IDEMPOTENCY_KEY='full-1')
+        self.assertEqual(first.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual((retry.status_code, retry.data), (first.status_code, first.data))
+
+    def test_key_reused_with_a_different_body(self):
+        self.client.post(self.url, self.data, format='json', HTTP_IDEMPOTENCY_KEY='reused')
+        other = dict(self.data, client_email='other@example.com')
+        response = self.client.post(self.url, other, format='json', HTTP_IDEMPOTENCY_KEY='reused')
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_retry_while_first_request_is_in_flight(self):
+        with mock.patch('app.idempotency.get_cache') as get_cache:
+            get_cache.return_value.get.return_value = None
+            get_cache.return_value.add.return_value = False
+            response = self.client.post(self.url, self.data, format='json', HTTP_IDEMPOTENCY_KEY='in-flight')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    def test_requests_without_a_key_are_not_stored(self):
+        self.client.post(self.url, self.data, format='json')
+        response = self.client.post(self.url, self.data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertNotIn('Idempotent-Replayed', response)
+
+
+class SlotShardTests(APITestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        self.fitness_class = FitnessClass.objects.create(name='Launch', date_time=self.now + datetime.timedelta(days=1), instructor='Celebrity', total_slots=10, available_slots=10)
+
+    def shard_seats(self):
+        return list(SlotShard.objects.filter(fitness_class=self.fitness_class).order_by('index').values_list('available', flat=True))
+
+    def book(self, email):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Booking.objects.book(self.fitness_class, client_name='Fan', client_email=email)
+
+    def test_sharding_splits_and_folds_back_free_seats(self):
+        """
+        Ensure sharding spreads the free seats evenly and unsharding restores available_slots.
+        """
+        self.fitness_class.set_shard_count(4)
+        self.assertEqual(self.shard_seats(), [3, 3, 2, 2])
+        self.book('fan@example.com')
+        self.fitness_class.set_shard_count(0)
+        self.fitness_class.refresh_from_db()
+        self.assertEqual((self.fitness_class.shard_count, self.fitness_class.available_slots), (0, 9))
+        self.assertEqual(self.shard_seats(), [])
+
+    def test_booking_claims_from_shards_without_writing_the_class_row(self):
+        """
+        Ensure a sharded booking takes a seat from one shard, never updates the class row, and lists read the shard total.
+        """
+        self.fitness_class.set_shard_count(4)
+        etag = self.client.get(reverse('class-list'))['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            self.book('fan@example.com')
+        self.assertFalse([query for query in queries if query['sql'].startswith('UPDATE "app_fitnessclass"')])
+        self.assertEqual(sum(self.shard_seats()), 9)
+        cache.clear()
+        response = self.client.get(reverse('class-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['available_slots'], 9)
+        response = self.client.get(reverse('booking-list'), {'client_email': 'fan@example.com', 'class_fields': 'available_slots'})
+        self.assertEqual(response.json()['results'][0]['fitness_class'], {'available_slots': 9})
+
+    def test_drained_shards_fall_back_to_fuller_ones(self):
+        """
+        Ensure every seat can be booked even when the random shard is empty, and no more.
+        """
+        self.fitness_class.set_shard_count(4)
+        for i in range(10):
+            self.book(f'fan{i}@example.com')
+        self.assertEqual(self.shard_seats(), [0, 0, 0, 0])
+        with self.assertRaises(NoAvailableSlots):
+            self.book('late@example.com')
+        # Selling out is written to the class row, so upcoming() drops it.
+        self.fitness_class.refresh_from_db()
+        self.assertEqual(self.fitness_class.available_slots, 0)
+        self.assertFalse(FitnessClass.objects.upcoming().exists())
+        with self.captureOnCommitCallbacks(execute=True):
+            Booking.objects.cancel(Booking.objects.first())
+        self.fitness_class.refresh_from_db()
+        self.assertEqual(self.fitness_class.available_slots, 1)
+
+    def test_cancel_and_bulk_book_on_sharded_class(self):
+        """
+        Ensure cancellations return seats to the shards and bulk bookings claim them all-or-nothing.
+        """
+        self.fitness_class.set_shard_count(3)
+        booking = self.book('fan@example.com')
+        with self.captureOnCommitCallbacks(execute=True):
+            Booking.objects.cancel(booking)
+        self.assertEqual(sum(self.shard_seats()), 10)
+
+        items = [{'fitness_class': self.fitness_class, 'client_name': 'Fan', 'client_email': f'team{i}@example.com'} for i in range(11)]
+        self.assertTrue(all(booking is None for booking, _ in Booking.objects.bulk_book(items)))
+        self.assertEqual(sum(self.shard_seats()), 10)
+        with self.captureOnCommitCallbacks(execute=True):
+            results = Booking.objects.bulk_book(items[:10])
+        self.assertTrue(all(booking is not None for booking, _ in results))
+        self.assertEqual(self.shard_seats(), [0, 0, 0])
+        self.fitness_class.refresh_from_db()
+        self.assertEqual(self.fitness_class.available_slots, 0)
+
+    def test_model_and_admin_bookings_claim_shards(self):
+        """
+        Ensure bookings saved at model level or in the admin claim a shard seat, and sharded seats are read-only there.
+        """
+        self.fitness_class.set_shard_count(4)
+        with self.captureOnCommitCallbacks(execute=True):
+            Booking.objects.create(fitness_class=self.fitness_class, client_name='Fan', client_email='model@example.com')
+        admin_user = User.objects.create_superuser(email='admin@example.com', password='Pass@1234', firstname='Ad', lastname='Min')
+        self.client.force_login(admin_user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('admin:app_booking_add'), {
+                'fitness_class': self.fitness_class.pk, 'client_name': 'Fan', 'client_email': 'admin@example.com',
+            })
+        self.assertEqual(response.status_code, 302)
+        self.book('api@example.com')
+        self.assertEqual(sum(self.shard_seats()), 7)
+        self.assertEqual(FitnessClass.objects.with_free_seats().get(pk=self.fitness_class.pk).available_slots, 7)
+
+        response = self.client.get(reverse('admin:app_fitnessclass_change', args=[self.fitness_class.pk]))
+        self.assertIn('available_slots', response.context['adminform'].readonly_fields)
+
+        self.fitness_class.set_shard_count(4)
+        SlotShard.objects.filter(fitness_class=self.fitness_class).update(available=0)
+        response = self.client.post(reverse('admin:app_booking_add'), {
+            'fitness_class': self.fitness_class.pk, 'client_name': 'Fan', 'client_email': 'late@example.com',
+        })
+        self.assertContains(response, 'No available slots for this class.')
+
+
+class WaitlistTests(APITestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        self.fitness_class = FitnessClass.objects.create(name='Yoga', date_time=self.now + datetime.timedelta(days=1), instructor='Jane Doe', total_slots=1, available_slots=1)
+        self.booking = Booking.objects.book(self.fitness_class, client_name='Booked', client_email='booked@example.com')
+
+    def join(self, email, class_id=None):
+        data = {'class_id': class_id or self.fitness_class.id, 'client_name': email.split('@')[0], 'client_email': email}
+        return self.client.post(reverse('waitlist'), data, format='json')
+
+    def cancel(self, booking, email=None):
+        url = reverse('booking-cancel', args=[booking.pk])
+        return self.client.post(url, {'client_email': email or booking.client_email}, format='json')
+
+    def test_join_full_class(self):
+        """
+        Ensure clients can join the waitlist of a full class and see their place in the queue.
+        """
+        first = self.join('first@example.com')
+        second = self.join('second@example.com')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((first.data['position'], second.data['position']), (1, 2))
+
+        response = self.client.get(reverse('waitlist'), {'client_email': 'second@example.com'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([(entry['class_id'], entry['position']) for entry in response.data], [(self.fitness_class.id, 2)])
+
+    def test_join_rejects_open_booked_and_duplicate(self):
+        """
+        Ensure the waitlist only takes clients who cannot book directly and are not already queued.
+        """
+        open_class = FitnessClass.objects.create(name='Open', date_time=self.now + datetime.timedelta(days=1), instructor='Jane Doe', total_slots=5, available_slots=5)
+        self.assertEqual(self.join('first@example.com', open_class.id).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.join('booked@example.com').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.join('first@example.com').status_code, status.HTTP_201_CREATED)
+        response = self.join('first@example.com')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(str(response.data['non_field_errors'][0]), "You are already on the waitlist for this class.")
+
+    def test_cancellation_promotes_head_of_waitlist(self):
+        """
+        Ensure cancelling hands the seat to the longest-waiting client without freeing it to everyone.
+        """
+        self.join('first@example.com')
+        self.join('second@example.com')
+        response = self.cancel(self.booking)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['waitlist_promoted'])
+
+        self.fitness_class.refresh_from_db()
+        self.assertEqual(self.fitness_class.available_slots, 0)
+        self.assertFalse(Booking.objects.filter(pk=self.booking.pk).exists())
+        self.assertTrue(Booking.objects.filter(fitness_class=self.fitness_class, client_email='first@example.com').exists())
+        self.assertEqual(list(WaitlistEntry.objects.values_list('client_email', flat=True)), ['second@example.com'])
+        response = self.client.get(reverse('waitlist'), {'client_email': 'second@example.com'})
+        self.assertEqual(response.data[0]['position'], 1)
+
+    def test_cancellation_frees_seat_when_nobody_waits(self):
+        """
+        Ensure cancelling with an empty waitlist returns the seat to the class.
+        """
+        response = self.cancel(self.booking)
+        self.assertFalse(response.data['waitlist_promoted'])
+        self.fitness_class.refresh_from_db()
+        self.assertEqual(self.fitness_class.available_slots, 1)
+
+    def test_delete_returns_the_deleted_rows(self):
+        """
+        Ensure Booking.delete() reports what it deleted, like Model.delete(), and records the promotion.
+        """
+        self.join('first@example.com')
+        self.assertEqual(self.booking.delete(), (1, {'app.Booking': 1}))
+        self.assertEqual(self.booking.promoted_booking.client_email, 'first@example.com')
+
+    def test_promotion_skips_clients_who_already_booked(self):
+        """
+        Ensure a waitlisted client who has since booked the class is not promoted twice.
+        """
+        self.join('first@example.com')
+        self.join('second@example.com')
+        # A second seat is added and the first waitlisted client books it directly.
+        FitnessClass.objects.filter(pk=self.fitness_class.pk).update(total_slots=2, available_slots=1)
+        Booking.objects.book(self.fitness_class, client_name='first', client_email='first@example.com')
+        self.cancel(self.booking)
+        emails = set(Booking.objects.filter(fitness_class=self.fitness_class).values_list('client_email', flat=True))
+        self.assertEqual(emails, {'first@example.com', 'second@example.com'})
+
+    def test_cancel_requires_matching_email(self):
+        """
+        Ensure a booking can only be cancelled with the client email it was made with.
+        """
+        self.assertEqual(self.cancel(self.booking, email='other@example.com').status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.cancel(self.booking).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.cancel(self.booking).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_leave_waitlist(self):
+        """
+        Ensure clients can leave a waitlist with their email.
+        """
+        entry_id = self.join('first@example.com').data['id']
+        url = reverse('waitlist-entry', args=[entry_id])
+        self.assertEqual(self.client.delete(f'{url}?client_email=other@example.com').status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.delete(f'{url}?client_email=first@example.com').status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(WaitlistEntry.objects.exists())
+
+
+class SlotEventStreamTests(APITestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        self.fitness_class = FitnessClass.objects.create(name='Yoga', date_time=self.now + datetime.timedelta(days=1), instructor='Jane Doe', total_slots=2, available_slots=2)
+        self.hub = get_hub()
+
+    def test_slot_changes_are_published_after_commit(self):
+        """
+        Ensure booking, cancelling and editing a class each publish the committed slot count.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = Booking.objects.book(self.fitness_class, client_name='Test User', client_email='test@example.com')
+        self.assertEqual(self.hub._buffer[-1].as_dict(), {'class_id': self.fitness_class.id, 'available_slots': 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Booking.objects.cancel(booking)
+        self.assertEqual(self.hub._buffer[-1].as_dict(), {'class_id': self.fitness_class.id, 'available_slots': 2})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            FitnessClass.objects.filter(pk=self.fitness_class.pk).update(total_slots=5)
+            self.fitness_class.refresh_from_db()
+            self.fitness_class.available_slots = 5
+            self.fitness_class.save()
+        self.assertEqual(self.hub._buffer[-1].as_dict(), {'class_id': self.fitness_class.id, 'available_slots': 5})
+
+    def test_rolled_back_write_is_not_published(self):
+        """
+        Ensure a booking that rolls back never reaches the stream.
+        """
+        last_seq = self.hub.last_seq
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    Booking.objects.book(self.fitness_class, client_name='Test User', client_email='test@example.com')
+                    raise IntegrityError
+            except IntegrityError:
+                pass
+        self.assertEqual(self.hub.last_seq, last_seq)
+
+    async def test_resume_from_sequence_number(self):
+        """
+        Ensure a reconnecting client gets exactly the events after its Last-Event-ID, or a reset once they are gone.
+        """
+        hub = SlotEventHub(buffer_size=3)
+        for slots in range(5, 0, -1):
+            hub.publish(1, slots)
+        subscription, backlog = hub.subscribe(after_seq=3)
+        self.assertEqual([(event.seq, event.available_slots) for event in backlog], [(4, 2), (5, 1)])
+        _, backlog = hub.subscribe(after_seq=1)
+        self.assertIsNone(backlog)
+        _, backlog = hub.subscribe(after_seq=5)
+        self.assertEqual(backlog, [])
+        # An id this hub never issued, e.g. from before a restart.
+        _, backlog = hub.subscribe(after_seq=9)
+        self.assertIsNone(backlog)
+
+        hub.publish(1, 0)
+        event = await asyncio.wait_for(subscription.queue.get(), timeout=1)
+        self.assertEqual((event.seq, event.available_slots), (6, 0))
+
+    async def test_resume_after_restart_resets(self):
+        """
+        Ensure a client resuming with an id from before a server restart is told to reload, whatever the ids.
+        """
+        before = SlotEventHub(first_seq=time.time_ns() // 1000)
+        for slots in range(3):
+            before.publish(1, slots)
+        last_event_id = before.last_seq
+        time.sleep(0.001)
+        after = SlotEventHub(first_seq=time.time_ns() // 1000)
+        _, backlog = after.subscribe(after_seq=last_event_id)
+        self.assertIsNone(backlog)
+        for slots in range(5):
+            after.publish(1, slots)
+        _, backlog = after.subscribe(after_seq=last_event_id)
+        self.assertIsNone(backlog)
+
+    async def test_stream_delivers_live_events(self):
+        """
+        Ensure the SSE body carries live events for the requested classes only.
+        """
+        stream = stream_events(class_ids={1})
+        self.assertTrue((await anext(stream)).startswith('retry:'))
+        pending = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0)
+        self.hub.publish(2, 7)
+        self.hub.publish(1, 3)
+        chunk = await asyncio.wait_for(pending, timeout=1)
+        self.assertIn('event: slots', chunk)
+        self.assertIn('data: {"class_id": 1, "available_slots": 3}', chunk)
+        await stream.aclose()
+
+    async def test_stream_endpoint_resumes_from_last_event_id(self):
+        """
+        Ensure the stream endpoint replays missed events as text/event-stream and then ends after MAX_DURATION.
+        """
+        event = self.hub.publish(self.fitness_class.id, 1)
+        with override_settings(SLOT_EVENT_STREAM={'MAX_DURATION': 0.2, 'HEARTBEAT_INTERVAL': 0.05}):
+            response = await AsyncClient().get(reverse('class-slot-stream'), headers={'Last-Event-ID': str(event.seq - 1)})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            body = ''.join([chunk.decode() async for chunk in response.streaming_content])
+        self.assertIn(f'id: {event.seq}\nevent: slots\ndata: {{"class_id": {self.fitness_class.id}, "available_slots": 1}}', body)
+        self.assertIn(': keep-alive', body)
+
+        response = await AsyncClient().get(reverse('class-slot-stream'), headers={'Last-Event-ID': 'abc'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
 class BookingListViewTests(APITestCase):
     def setUp(self):
         self.now = timezone.now()
@@ -89,7 +622,7 @@ class BookingListViewTests(APITestCase):
         url = reverse('booking-list')
         response = self.client.get(url, {'client_email': 'test@example.com'}, format='json')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 2)
+        self.assertEqual(len(response.data['results']), 2)
 
     def test_list_bookings_for_client_with_no_bookings(self):
         """
@@ -98,7 +631,7 @@ class BookingListViewTests(APITestCase):
         url = reverse('booking-list')
         response = self.client.get(url, {'client_email': 'nobody@example.com'}, format='json')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 0)
+        self.assertEqual(len(response.data['results']), 0)
 
     def test_list_bookings_without_email(self):
         """
@@ -107,4 +640,1474 @@ class BookingListViewTests(APITestCase):
         url = reverse('booking-list')
         response = self.client.get(url, format='json')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 0)
\ No newline at end of file
+        self.assertEqual(len(response.data['results']), 0)
+
+
+class CursorPaginationTests(APITestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        start = self.now + datetime.timedelta(days=1)
+        # Several classes share a start time so the id tie-breaker is exercised.
+        self.classes = [
+            FitnessClass.objects.create(name=f'Class {i}', date_time=start + datetime.timedelta(hours=i // 3), instructor='Jane Doe', total_slots=10, available_slots=10)
+            for i in range(7)
+        ]
+        for fitness_class in self.classes:
+            Booking.objects.create(fitness_class=fitness_class, client_name='Test User', client_email='test@example.com')
+
+    def collect_pages(self, url, params):
+        ids, response = [], self.client.get(url, params, format='json')
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids.extend(item['id'] for item in response.data['results'])
+            if not response.data['next']:
+                return ids, response
+            response = self.client.get(response.data['next'], format='json')
+
+    def test_classes_are_paged_by_date_time_and_id(self):
+        """
+        Ensure walking the class cursors returns every class once, in (date_time, id) order.
+        """
+        ids, _ = self.collect_pages(reverse('class-list'), {'page_size': 2})
+        expected = [c.id for c in sorted(self.classes, key=lambda c: (c.date_time, c.id))]
+        self.assertEqual(ids, expected)
+
+    def test_bookings_are_paged_newest_first(self):
+        """
+        Ensure walking the booking cursors returns every booking once, newest first.
+        """
+        ids, _ = self.collect_pages(reverse('booking-list'), {'client_email': 'test@example.com', 'page_size': 3})
+        expected = list(Booking.objects.order_by('-booking_time', 'id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+
+    def test_previous_link_returns_the_prior_page(self):
+        """
+        Ensure the previous cursor walks back to the same page it came from.
+        """
+        url = reverse('class-list')
+        first = self.client.get(url, {'page_size': 3}, format='json')
+        second = self.client.get(first.data['next'], format='json')
+        back = self.client.get(second.data['previous'], format='json')
+        self.assertEqual(back.data['results'], first.data['results'])
+        self.assertIsNone(first.data['previous'])
+
+    def test_page_size_is_bounded(self):
+        """
+        Ensure clients cannot request more than the maximum page size.
+        """
+        FitnessClass.objects.bulk_create([
+            FitnessClass(name='Bulk', date_time=self.now + datetime.timedelta(days=3), instructor='Jane Doe', total_slots=5, available_slots=5)
+            for _ in range(120)
+        ])
+        response = self.client.get(reverse('class-list'), {'page_size': 1000}, format='json')
+        self.assertEqual(len(response.data['results']), 100)
+
+    def test_invalid_cursor(self):
+        """
+        Ensure a tampered cursor is rejected rather than raising a server error.
+        """
+        response = self.client.get(reverse('class-list'), {'cursor': 'not-a-cursor'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class QueryCountTests(APITestCase):
+    """
+    Pin the number of SQL queries each endpoint runs so N+1 regressions fail CI.
+    """
+    def setUp(self):
+        self.now = timezone.now()
+        self.fitness_class = FitnessClass.objects.create(name='Yoga', date_time=self.now + datetime.timedelta(days=1), instructor='Jane Doe', total_slots=50, available_slots=50)
+        self.password = 'S3cure-Passw0rd!'
+        self.user = User.objects.create_user(email='member@example.com', password=self.password, firstname='Test', lastname='Member')
+        # Build the blacklist filter up front so the first request doesn't pay for it.
+        get_blacklist_filter().might_contain('')
+
+    def create_bookings(self, count):
+        for i in range(count):
+            fitness_class = FitnessClass.objects.create(name=f'Class {i}', date_time=self.now + datetime.timedelta(days=2, hours=i), instructor='John Smith', total_slots=5, available_slots=5)
+            Booking.objects.create(fitness_class=fitness_class, client_name='Test User', client_email='test@example.com')
+
+    def login(self):
+        response = self.client.post(reverse('token_obtain_pair'), {'email': self.user.email, 'password': self.password}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_register_queries(self):
+        data = {'email': 'new@example.com', 'firstname': 'New', 'lastname': 'Member', 'password': self.password, 'password2': self.password}
+        with self.assertNumQueries(2):
+            response = self.client.post(reverse('register'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_login_queries(self):
+        with self.assertNumQueries(2):
+            self.login()
+
+    # With the default process-local cache, the blacklist filter is bypassed
+    # and refresh and logout each check the blacklist in the DB.
+    def test_token_refresh_queries(self):
+        tokens = self.login()
+        with self.assertNumQueries(13):
+            response = self.client.post(reverse('token_refresh'), {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_logout_queries(self):
+        tokens = self.login()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        with self.assertNumQueries(8):
+            response = self.client.post(reverse('logout'), {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_class_list_queries_are_constant(self):
+        with self.assertNumQueries(1):
+            self.client.get(reverse('class-list'), format='json')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_bookings(10)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('class-list'), format='json')
+        self.assertEqual(len(response.data['results']), 11)
+
+    def test_book_queries(self):
+        data = {'class_id': self.fitness_class.id, 'client_name': 'Test User', 'client_email': 'test@example.com'}
+        with self.assertNumQueries(6):
+            response = self.client.post(reverse('book-class'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_booking_list_queries_are_constant(self):
+        self.create_bookings(1)
+        with self.assertNumQueries(1):
+            self.client.get(reverse('booking-list'), {'client_email': 'test@example.com'}, format='json')
+        self.create_bookings(10)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('booking-list'), {'client_email': 'test@example.com'}, format='json')
+        self.assertEqual(len(response.data['results']), 11)
+
+    def test_booking_list_without_email_runs_no_queries(self):
+        with self.assertNumQueries(0):
+            self.client.get(reverse('booking-list'), format='json')
+
+
+# Process-local caches stand in for two workers' LocMemCaches; a file-based
+# cache for a backend every worker shares, like Redis or memcached.
+WORKER_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'omnify'},
+    'worker1': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'worker1'},
+    'worker2': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'worker2'},
+    'shared': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': os.path.join(tempfile.gettempdir(), 'omnify-test-shared-cache')},
+}
+
+
+@override_settings(CACHES=WORKER_CACHES, TOKEN_BLACKLIST_CACHE_ALIAS='shared')
+class TokenBlacklistFilterTests(APITestCase):
+    def setUp(self):
+        caches['shared'].clear()
+        self.password = 'S3cure-Passw0rd!'
+        self.user = User.objects.create_user(email='member@example.com', password=self.password, firstname='Test', lastname='Member')
+        self.blacklist_filter = get_blacklist_filter()
+        self.blacklist_filter.reset()
+
+    def login(self):
+        response = self.client.post(reverse('token_obtain_pair'), {'email': self.user.email, 'password': self.password}, format='json')
+        return response.data
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        """
+        Ensure every added item is reported as present and the false positive rate stays near the target.
+        """
+        bloom = BloomFilter(1000, error_rate=0.01)
+        for i in range(1000):
+            bloom.add(f'jti-{i}')
+        self.assertTrue(all(f'jti-{i}' in bloom for i in range(1000)))
+        false_positives = sum(f'other-{i}' in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
+
+    def test_unseen_token_is_checked_without_queries(self):
+        """
+        Ensure a refresh token that was never blacklisted is verified without touching the DB.
+        """
+        refresh = self.login()['refresh']
+        self.blacklist_filter.might_contain('')
+        with self.assertNumQueries(0):
+            FilteredRefreshToken(refresh)
+
+    def test_rotated_token_is_rejected(self):
+        """
+        Ensure a refresh token cannot be reused once it has been rotated or logged out.
+        """
+        tokens = self.login()
+        response = self.client.post(reverse('token_refresh'), {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.post(reverse('token_refresh'), {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        rotated = self.login()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {rotated['access']}")
+        response = self.client.post(reverse('logout'), {'refresh': rotated['refresh']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.post(reverse('token_refresh'), {'refresh': rotated['refresh']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_filter_picks_up_blacklist_writes_from_other_processes(self):
+        """
+        Ensure a token blacklisted outside this process is rejected once the version is bumped.
+        """
+        refresh = self.login()['refresh']
+        token = FilteredRefreshToken(refresh)
+        outstanding = OutstandingToken.objects.get(jti=token['jti'])
+        # Written straight to the DB, as another worker's logout would be.
+        BlacklistedToken.objects.create(token=outstanding)
+        bump_blacklist_version()
+        response = self.client.post(reverse('token_refresh'), {'refresh': refresh}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_filter_needs_a_shared_cache(self):
+        """
+        Ensure a worker whose cache is private to it checks the DB, and workers sharing a cache see each other's writes.
+        """
+        refresh = self.login()['refresh']
+        jti = FilteredRefreshToken(refresh)['jti']
+        private = [BlacklistFilter(cache_alias='worker1'), BlacklistFilter(cache_alias='worker2')]
+        shared = [BlacklistFilter(cache_alias='shared'), BlacklistFilter(cache_alias='shared')]
+        for blacklist_filter in shared:
+            self.assertFalse(blacklist_filter.might_contain(jti))
+
+        # Worker 1 blacklists the token; only worker 1's cache records it.
+        BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti=jti))
+        with self.settings(TOKEN_BLACKLIST_CACHE_ALIAS='worker1'):
+            bump_blacklist_version()
+        self.assertFalse(private[1].enabled)
+        self.assertTrue(private[1].might_contain(jti))
+
+        bump_blacklist_version()
+        self.assertTrue(shared[1].might_contain(jti))
+
+    def test_prune_tokens_deletes_only_expired_tokens(self):
+        """
+        Ensure prune_tokens removes expired outstanding and blacklisted tokens in chunks and keeps live ones.
+        """
+        now = timezone.now()
+        for i in range(5):
+            expired = OutstandingToken.objects.create(jti=f'expired-{i}', token='x', user=self.user, expires_at=now - datetime.timedelta(hours=1))
+            if i % 2 == 0:
+                BlacklistedToken.objects.create(token=expired)
+        live = OutstandingToken.objects.create(jti='live', token='x', user=self.user, expires_at=now + datetime.timedelta(hours=1))
+        BlacklistedToken.objects.create(token=live)
+
+        out = StringIO()
+        call_command('prune_tokens', dry_run=True, stdout=out)
+        self.assertIn('Would prune 5 expired tokens (3 blacklisted).', out.getvalue())
+        self.assertEqual(OutstandingToken.objects.count(), 6)
+
+        out = StringIO()
+        call_command('prune_tokens', chunk_size=2, stdout=out)
+        self.assertIn('Pruned 5 expired tokens (3 blacklisted) in 3 chunks.', out.getvalue())
+        self.assertEqual(list(OutstandingToken.objects.values_list('jti', flat=True)), ['live'])
+        self.assertEqual(BlacklistedToken.objects.count(), 1)
+
+
+@override_settings(CACHES=WORKER_CACHES, AUTH_USER_CACHE_ALIAS='shared')
+class CachedAuthenticationTests(APITestCase):
+    def setUp(self):
+        caches['shared'].clear()
+        self.password = 'S3cure-Passw0rd!'
+        self.user = User.objects.create_user(email='member@example.com', password=self.password, firstname='Test', lastname='Member')
+        response = self.client.post(reverse('token_obtain_pair'), {'email': self.user.email, 'password': self.password}, format='json')
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        fitness_class = FitnessClass.objects.create(name='Yoga', date_time=timezone.now() + datetime.timedelta(days=1), instructor='Jane Doe', total_slots=5, available_slots=5)
+        Booking.objects.create(fitness_class=fitness_class, client_name='Test User', client_email=self.user.email)
+
+    def test_authenticated_reads_run_no_auth_queries(self):
+        """
+        Ensure only the first authenticated request loads the user; later ones run just the endpoint's own query.
+        """
+        params = {'client_email': self.user.email}
+        with self.assertNumQueries(2):
+            self.client.get(reverse('booking-list'), params, format='json')
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('booking-list'), params, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_deactivated_user_is_rejected_on_next_request(self):
+        """
+        Ensure deactivating a cached user takes effect on the very next request.
+        """
+        self.client.get(reverse('booking-list'), format='json')
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(reverse('booking-list'), format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_staff_flag_change_is_seen_on_next_request(self):
+        """
+        Ensure the request user reflects a staff flag change straight away.
+        """
+        factory = APIRequestFactory()
+        auth = self.client._credentials['HTTP_AUTHORIZATION']
+        authenticator = CachedJWTAuthentication()
+        user, _ = authenticator.authenticate(Request(factory.get('/', HTTP_AUTHORIZATION=auth)))
+        self.assertFalse(user.is_staff)
+        self.user.is_staff = True
+        self.user.save()
+        user, _ = authenticator.authenticate(Request(factory.get('/', HTTP_AUTHORIZATION=auth)))
+        self.assertTrue(user.is_staff)
+
+    def test_process_local_cache_is_not_used(self):
+        """
+        Ensure a worker with a private cache never authenticates from it, and a shared cache carries evictions across workers.
+        """
+        auth = self.client._credentials['HTTP_AUTHORIZATION']
+        request = lambda: Request(APIRequestFactory().get('/', HTTP_AUTHORIZATION=auth))
+        with self.settings(AUTH_USER_CACHE_ALIAS='worker2'):
+            CachedJWTAuthentication().authenticate(request())
+            self.assertIsNone(caches['worker2'].get(user_cache_key(self.user.pk)))
+            # Worker 1 deactivates the user; worker 2 must not keep authenticating them.
+            with self.settings(AUTH_USER_CACHE_ALIAS='worker1'):
+                self.user.is_active = False
+                self.user.save()
+            with self.assertRaises(AuthenticationFailed):
+                CachedJWTAuthentication().authenticate(request())
+
+        self.user.is_active = True
+        self.user.save()
+        CachedJWTAuthentication().authenticate(request())
+        self.assertIsNotNone(caches['shared'].get(user_cache_key(self.user.pk)))
+        # Another worker's save() evicts the shared entry.
+        User.objects.get(pk=self.user.pk).save()
+        self.assertIsNone(caches['shared'].get(user_cache_key(self.user.pk)))
+
+    def test_deleted_user_is_rejected(self):
+        """
+        Ensure a token for a deleted user no longer authenticates.
+        """
+        self.client.get(reverse('booking-list'), format='json')
+        self.user.delete()
+        response = self.client.get(reverse('booking-list'), format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class CredentialPoolTests(APITestCase):
+    def setUp(self):
+        self.password = 'S3cure-Passw0rd!'
+        self.user = User.objects.create_user(email='member@example.com', password=self.password, firstname='Test', lastname='Member')
+
+    def login(self):
+        return self.client.post(reverse('token_obtain_pair'), {'email': self.user.email, 'password': self.password}, format='json')
+
+    def test_register_and_login_hash_on_the_pool(self):
+        """
+        Ensure registration and login run their password work on the credential pool.
+        """
+        pool = get_credential_pool()
+        before = pool.stats()['completed']
+        data = {'email': 'new@example.com', 'firstname': 'New', 'lastname': 'Member', 'password': self.password, 'password2': self.password}
+        self.assertEqual(self.client.post(reverse('register'), data, format='json').status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+        stats = pool.stats()
+        self.assertEqual(stats['completed'] - before, 2)
+        self.assertEqual(stats['in_flight'], 0)
+        self.assertTrue(User.objects.get(email='new@example.com').password.startswith('pbkdf2_sha256$'))
+
+    def test_pool_rejects_calls_beyond_its_cap(self):
+        """
+        Ensure a saturated pool fails fast instead of queueing without bound.
+        """
+        pool = CredentialPool(max_workers=1, max_pending=1)
+        release = threading.Event()
+        worker = threading.Thread(target=pool.run, args=(release.wait,))
+        worker.start()
+        try:
+            while pool.stats()['in_flight'] == 0:
+                time.sleep(0.001)
+            with self.assertRaises(CredentialPoolBusy):
+                pool.run(len, 'x')
+        finally:
+            release.set()
+            worker.join()
+        self.assertEqual(pool.run(len, 'xy'), 2)
+        pool.shutdown()
+        stats = pool.stats()
+        self.assertEqual((stats['submitted'], stats['rejected'], stats['completed']), (2, 1, 2))
+
+    def test_busy_pool_returns_503_with_retry_after(self):
+        """
+        Ensure login answers 503 with Retry-After while the credential pool is saturated.
+        """
+        with mock.patch.object(CredentialPool, 'run', side_effect=CredentialPoolBusy(wait=2)):
+            response = self.login()
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response['Retry-After'], '2')
+
+    def test_busy_pool_on_admin_login_returns_503(self):
+        """
+        Ensure the admin login, which runs outside DRF, also answers 503 with Retry-After instead of a server error.
+        """
+        data = {'username': self.user.email, 'password': self.password}
+        with mock.patch.object(CredentialPool, 'run', side_effect=CredentialPoolBusy(wait=2)):
+            response = self.client.post(reverse('admin:login'), data)
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response['Retry-After'], '2')
+
+    @override_settings(PASSWORD_HASHERS=[
+        'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+        'django.contrib.auth.hashers.MD5PasswordHasher',
+    ])
+    def test_outdated_hash_is_upgraded_on_login(self):
+        """
+        Ensure a password stored with an outdated hasher is transparently re-hashed on login.
+        """
+        User.objects.filter(pk=self.user.pk).update(password=make_password(self.password, hasher='md5'))
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$'))
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+
+
+class UpcomingClassIndexTests(APITestCase):
+    def test_benchmark_reports_plan_and_latency(self):
+        """
+        Ensure the benchmark command seeds, reports and cleans up after itself.
+        """
+        out = StringIO()
+        call_command('benchmark_class_list', classes=50, runs=3, stdout=out)
+        output = out.getvalue()
+        self.assertIn('first page latency: p50=', output)
+        self.assertIn('deep page latency: p50=', output)
+        if connection.vendor == 'sqlite':
+            self.assertIn('fitnessclass_upcoming_idx', output)
+        self.assertFalse(FitnessClass.objects.exists())
+
+
+@override_settings(CACHES=WORKER_CACHES, CATALOGUE_CACHE_ALIAS='shared')
+class CatalogueCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        caches['shared'].clear()
+        reset_cache_stats()
+        self.now = timezone.now()
+        self.fitness_class = FitnessClass.objects.create(name='Yoga', date_time=self.now + datetime.timedelta(days=1), instructor='Jane Doe', total_slots=10, available_slots=10)
+        self.url = reverse('class-list')
+
+    def test_repeated_request_is_served_from_cache(self):
+        """
+        Ensure an unchanged catalogue is served without touching the database.
+        """
+        first = self.client.get(self.url, format='json')
+        self.assertEqual(first['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url, format='json')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(get_cache_stats()['hits'], 1)
+        self.assertEqual(get_cache_stats()['misses'], 1)
+
+    def test_process_local_cache_is_not_used(self):
+        """
+        Ensure pages are not cached in a per-process cache, where other workers would miss the version bump.
+        """
+        with self.settings(CATALOGUE_CACHE_ALIAS='worker1'):
+            self.client.get(self.url, format='json')
+            response = self.client.get(self.url, format='json')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(get_cache_stats()['hits'], 0)
+
+    def test_cache_varies_on_timezone_and_page(self):
+        """
+        Ensure each timezone and page size gets its own cache entry.
+        """
+        self.client.get(self.url, format='json')
+        response = self.client.get(self.url, {'timezone': 'America/New_York'}, format='json')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        response = self.client.get(self.url, {'page_size': 5}, format='json')
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+    def test_booking_invalidates_cached_slot_counts(self):
+        """
+        Ensure a booking is reflected in the very next class list response.
+        """
+        self.client.get(self.url, format='json')
+        data = {'class_id': self.fitness_class.id, 'client_name': 'Test User', 'client_email': 'test@example.com'}
+        # The catalogue version is bumped once the booking commits.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('book-class'), data, format='json')
+        response = self.client.get(self.url, format='json')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['available_slots'], 9)
+
+    def test_class_changes_invalidate_the_cache(self):
+        """
+        Ensure bookings, cancellations and class deletions are never served stale.
+        """
+        self.client.get(self.url, format='json')
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = Booking.objects.create(fitness_class=self.fitness_class, client_name='Test User', client_email='test@example.com')
+        self.assertEqual(self.client.get(self.url, format='json').data['results'][0]['available_slots'], 9)
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.delete()
+        self.assertEqual(self.client.get(self.url, format='json').data['results'][0]['available_slots'], 10)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.fitness_class.delete()
+        self.assertEqual(self.client.get(self.url, format='json').data['results'], [])
+
+    def test_version_is_bumped_only_on_commit(self):
+        """
+        Ensure a write inside a transaction bumps the catalogue version once it commits, and not before.
+        """
+        version = get_catalogue_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                bump_catalogue_version()
+                self.assertEqual(get_catalogue_version(), version)
+        self.assertNotEqual(get_catalogue_version(), version)
+
+
+class SerializerTimezoneTests(APITestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        self.fitness_class = FitnessClass.objects.create(name='Yoga', date_time=datetime.datetime(2030, 1, 15, 6, 0, tzinfo=datetime.timezone.utc), instructor='Jane Doe', total_slots=10, available_slots=10)
+        self.booking = Booking.objects.create(fitness_class=self.fitness_class, client_name='Test User', client_email='test@example.com')
+
+    def test_invalid_timezone_falls_back_to_default(self):
+        """
+        Ensure an unknown or malformed timezone renders in Asia/Kolkata.
+        """
+        for name in ('Mars/Olympus_Mons', '../../etc/passwd'):
+            response = self.client.get(reverse('class-list'), {'timezone': name}, format='json')
+            self.assertEqual(response.data['results'][0]['date_time'], '2030-01-15T11:30:00+05:30')
+
+    def test_timezone_is_resolved_once_per_request(self):
+        """
+        Ensure the timezone lookup runs once per request, not once per row.
+        """
+        for i in range(5):
+            FitnessClass.objects.create(name=f'Class {i}', date_time=self.now + datetime.timedelta(days=1), instructor='Jane Doe', total_slots=10, available_slots=10)
+        with mock.patch.object(app_serializers, 'resolve_timezone', wraps=app_serializers.resolve_timezone) as resolve:
+            response = self.client.get(reverse('class-list'), {'timezone': 'Europe/Paris'}, format='json')
+        self.assertEqual(len(response.data['results']), 6)
+        resolve.assert_called_once_with('Europe/Paris')
+
+    def test_booking_representation(self):
+        """
+        Ensure the single-pass booking representation keeps the documented shape.
+        """
+        response = self.client.get(reverse('booking-list'), {'client_email': 'test@example.com', 'timezone': 'UTC'}, format='json')
+        booking = response.data['results'][0]
+        self.assertEqual(list(booking), ['id', 'fitness_class', 'client_name', 'client_email', 'booking_time', 'date_time', 'booking_expired'])
+        self.assertEqual(booking['fitness_class']['date_time'], '2030-01-15T06:00:00+00:00')
+        self.assertTrue(booking['booking_time'].endswith('Z'))
+        self.assertEqual(booking['date_time'], self.booking.booking_time.isoformat())
+        self.assertFalse(booking['booking_expired'])
+
+
+class SerializerBenchmarkTests(APITestCase):
+    rows = 10_000
+
+    def test_fitness_class_serializer_renders_many_rows(self):
+        """
+        Ensure the class serializer renders a large page, localized once per request (throughput is reported by benchmark_serializers).
+        """
+        request = Request(APIRequestFactory().get('/api/classes/', {'timezone': 'America/New_York'}))
+        start = datetime.datetime(2030, 1, 1, tzinfo=datetime.timezone.utc)
+        classes = [
+            FitnessClass(id=i, name='Yoga', date_time=start + datetime.timedelta(minutes=15 * i), instructor='Jane Doe', total_slots=20, available_slots=10)
+            for i in range(self.rows)
+        ]
+        with mock.patch.object(app_serializers, 'resolve_timezone', wraps=app_serializers.resolve_timezone) as resolve:
+            data = app_serializers.FitnessClassSerializer(classes, many=True, context={'request': request}).data
+        self.assertEqual(resolve.call_count, 1)
+        self.assertEqual(len(data), self.rows)
+        self.assertEqual(data[0]['date_time'], '2029-12-31T19:00:00-05:00')
+
+    def test_benchmark_command_reports_each_serializer(self):
+        """
+        Ensure benchmark_serializers reports rows/s for every list serializer and format.
+        """
+        out = StringIO()
+        call_command('benchmark_serializers', rows=50, runs=2, stdout=out)
+        output = out.getvalue()
+        for label in ('FitnessClassSerializer', 'FitnessClassSerializer compact', 'BookingListSerializer', 'BookingListSerializer compact'):
+            self.assertRegex(output, rf'{label}: [\d,]+ rows/s, p50=')
+
+
+class AsyncLoggingTests(SimpleTestCase):
+    def make_logger(self, handler):
+        logger = logging.getLogger(f'app.tests.{self._testMethodName}')
+        logger.propagate = False
+        logger.handlers = [handler]
+        self.addCleanup(setattr, logger, 'handlers', [])
+        return logger
+
+    def test_records_are_written_in_batches_with_key_value_fields(self):
+        """
+        Ensure queued records reach the target handler, formatted off-thread, one flush per batch.
+        """
+        stream = StringIO()
+        target = logging.StreamHandler(stream)
+        target.setFormatter(KeyValueFormatter('{levelname} {message}', style='{'))
+        log_queue = queue.Queue(maxsize=100)
+        listener = BatchingQueueListener(log_queue, target, batch_size=50, flush_interval=0.05)
+        logger = self.make_logger(AsyncQueueHandler(log_queue))
+        with mock.patch.object(target, 'flush', wraps=target.flush) as flush:
+            for i in range(10):
+                logger.info("Booking successful.", extra={'client_email': 'a@example.com', 'class_id': i})
+            listener.start()
+            listener.stop()
+        lines = stream.getvalue().splitlines()
+        self.assertEqual(len(lines), 10)
+        self.assertEqual(lines[3], 'INFO Booking successful. client_email=a@example.com class_id=3')
+        self.assertEqual(flush.call_count, 1)
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        """
+        Ensure a full queue drops and counts records rather than stalling the caller.
+        """
+        handler = AsyncQueueHandler(queue.Queue(maxsize=2))
+        logger = self.make_logger(handler)
+        for i in range(5):
+            logger.warning("message %s", i)
+        self.assertEqual((handler.enqueued, handler.dropped), (2, 3))
+        self.assertEqual([r.getMessage() for r in handler.queue.queue], ['message 0', 'message 1'])
+
+    def test_drop_oldest_policy_keeps_the_newest_records(self):
+        handler = AsyncQueueHandler(queue.Queue(maxsize=2), policy=DROP_OLDEST)
+        logger = self.make_logger(handler)
+        for i in range(5):
+            logger.warning("message %s", i)
+        self.assertEqual(handler.dropped, 3)
+        self.assertEqual([r.getMessage() for r in handler.queue.queue], ['message 3', 'message 4'])
+
+    def test_values_with_spaces_are_quoted(self):
+        formatter = KeyValueFormatter('{message}', style='{')
+        record = logging.LogRecord('app', logging.INFO, __file__, 1, 'Done.', (), None)
+        record.detail = 'two words'
+        self.assertEqual(formatter.format(record), 'Done. detail="two words"')
+
+
+class AsyncListViewTests(APITestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        for i in range(5):
+            fitness_class = FitnessClass.objects.create(name=f'Class {i}', date_time=self.now + datetime.timedelta(days=1, hours=i), instructor='Jane Doe', total_slots=10, available_slots=10)
+            Booking.objects.create(fitness_class=fitness_class, client_name='Test User', client_email='test@example.com')
+
+    async def test_async_class_list_matches_sync_view(self):
+        """
+        Ensure the async class list returns the same page and cursors as the DRF view.
+        """
+        params = {'page_size': 2, 'timezone': 'Europe/Paris'}
+        response = await AsyncClient().get(reverse('class-list-async'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        sync_data = await sync_to_async(self.client.get)(reverse('class-list'), params, format='json')
+        data = response.json()
+        self.assertEqual(data['results'], sync_data.json()['results'])
+        follow = await AsyncClient().get(data['next'])
+        self.assertEqual(len(follow.json()['results']), 2)
+
+    @override_settings(CACHES=WORKER_CACHES, CATALOGUE_CACHE_ALIAS='shared')
+    async def test_cached_pages_link_back_to_their_own_endpoint(self):
+        """
+        Ensure the sync and async class lists never serve each other's cached pagination links.
+        """
+        await sync_to_async(caches['shared'].clear)()
+        params = {'page_size': 2}
+        for _ in range(2):
+            sync_response = await sync_to_async(self.client.get)(reverse('class-list'), params, format='json')
+            async_response = await AsyncClient().get(reverse('class-list-async'), params)
+            self.assertIn(reverse('class-list'), sync_response.json()['next'])
+            self.assertIn(reverse('class-list-async'), async_response.json()['next'])
+        self.assertEqual((sync_response['X-Cache'], async_response['X-Cache']), ('HIT', 'HIT'))
+
+    async def test_async_booking_list(self):
+        response = await AsyncClient().get(reverse('booking-list-async'), {'client_email': 'test@example.com'})
+        self.assertEqual(len(response.json()['results']), 5)
+        self.assertIn('booking_expired', response.json()['results'][0])
+        response = await AsyncClient().get(reverse('booking-list-async'))
+        self.assertEqual(response.json()['results'], [])
+
+    async def test_async_invalid_cursor(self):
+        response = await AsyncClient().get(reverse('class-list-async'), {'cursor': 'bogus'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class AsgiBenchmarkCommandTests(TransactionTestCase):
+    def test_benchmark_reports_both_servers(self):
+        """
+        Ensure the WSGI/ASGI benchmark runs both modes without errors and cleans up.
+        """
+        out = StringIO()
+        call_command('benchmark_asgi', endpoint='bookings', requests=10, concurrency=2, classes=20, stdout=out)
+        output = out.getvalue()
+        self.assertRegex(output, r'WSGI: [\d,]+ req/s, 0 errors')
+        self.assertRegex(output, r'ASGI: [\d,]+ req/s, 0 errors')
+        self.assertFalse(FitnessClass.objects.exists())
+
+
+class BookingConcurrencyTests(TransactionTestCase):
+    def test_concurrent_bookings_never_overbook(self):
+        """
+        Ensure threads racing for the last seats of one class never book more clients than it has seats.
+        """
+        fitness_class = FitnessClass.objects.create(name='Hot Class', date_time=timezone.now() + datetime.timedelta(days=1), instructor='Jane Doe', total_slots=5, available_slots=5)
+        booked = self.race_for_seats(fitness_class)
+        self.assertEqual(fitness_class.available_slots, 5 - booked)
+
+    def test_concurrent_bookings_never_overbook_sharded_class(self):
+        """
+        Ensure threads racing for the seats of a sharded class never book more clients than it has seats.
+        """
+        fitness_class = FitnessClass.objects.create(name='Hot Class', date_time=timezone.now() + datetime.timedelta(days=1), instructor='Jane Doe', total_slots=5, available_slots=5)
+        fitness_class.set_shard_count(3)
+        fitness_class.refresh_from_db()
+        booked = self.race_for_seats(fitness_class)
+        self.assertEqual(SlotShard.objects.filter(fitness_class=fitness_class).aggregate(total=Sum('available'))['total'], 5 - booked)
+
+    def race_for_seats(self, fitness_class):
+        start = threading.Barrier(12)
+        outcomes = []
+
+        def book(i):
+            start.wait()
+            try:
+                Booking.objects.book(fitness_class, client_name='Racer', client_email=f'racer{i}@example.com')
+                outcomes.append('booked')
+            except NoAvailableSlots:
+                outcomes.append('full')
+            except OperationalError:
+                # The shared in-memory test database reports lock conflicts
+                # instead of waiting; those bookings simply did not happen.
+                outcomes.append('locked')
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=book, args=(i,)) for i in range(12)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        fitness_class.refresh_from_db()
+        booked = Booking.objects.filter(fitness_class=fitness_class).count()
+        self.assertEqual(outcomes.count('booked'), booked)
+        self.assertGreaterEqual(booked, 1)
+        self.assertLessEqual(booked, 5)
+        return booked
+
+    def test_benchmark_reports_and_checks_invariant(self):
+        """
+        Ensure the booking load test runs both scenarios, reports its metrics and verifies slot accounting.
+        """
+        out = StringIO()
+        call_command('benchmark_bookings', requests=40, concurrency=4, classes=10, clients=30, hot_slots=10, stdout=out)
+        output = out.getvalue()
+        for mode in ('hot', 'spread'):
+            self.assertRegex(output, rf'{mode}: [\d,]+ req/s, \d+ booked, \d+ rejected, \d+ errors')
+        self.assertIn('slot UPDATE wait: p50=', output)
+        self.assertEqual(output.count('invariant: available_slots == total_slots - bookings holds'), 2)
+        self.assertFalse(FitnessClass.objects.exists())
+
+    def test_benchmark_checks_invariant_on_sharded_hot_class(self):
+        """
+        Ensure a correct sharded hot-class run passes the slot accounting check.
+        """
+        out = StringIO()
+        call_command('benchmark_bookings', mode='hot', shards=4, requests=10, concurrency=2, clients=30, hot_slots=100, stdout=out)
+        output = out.getvalue()
+        self.assertRegex(output, r'hot: [\d,]+ req/s, \d+ booked, \d+ rejected, \d+ errors')
+        self.assertIn('invariant: available_slots == total_slots - bookings holds for 1 classes', output)
+        self.assertFalse(FitnessClass.objects.exists())
+
+
+
+class ClassScheduleTests(APITestCase):
+    def setUp(self):
+        tomorrow = timezone.localdate() + datetime.timedelta(days=1)
+        self.schedule = ClassSchedule.objects.create(
+            name='Yoga', instructor='Asha', weekdays='MO,WE,FR', start_time=datetime.time(7, 30),
+            timezone='Asia/Kolkata', capacity=12, starts_on=tomorrow,
+        )
+        self.until = tomorrow + datetime.timedelta(days=27)
+
+    def test_materialize_creates_weekly_occurrences_in_batches(self):
+        """
+        Ensure materialize inserts each occurrence once, at the local start time, in batches.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            created = self.schedule.materialize(self.until, batch_size=5)
+        self.assertEqual(created, 12)
+        inserts = [q for q in queries.captured_queries if q['sql'].startswith('INSERT') and '"app_fitnessclass"' in q['sql']]
+        self.assertEqual(len(inserts), 3)
+        classes = FitnessClass.objects.filter(schedule=self.schedule)
+        for fitness_class in classes:
+            local = fitness_class.date_time.astimezone(ZoneInfo('Asia/Kolkata'))
+            self.assertIn(local.weekday(), (0, 2, 4))
+            self.assertEqual((local.hour, local.minute), (7, 30))
+            self.assertEqual(fitness_class.available_slots, 12)
+
+    def test_materialize_skips_existing_occurrences(self):
+        """
+        Ensure running materialize again does not duplicate classes.
+        """
+        self.schedule.materialize(self.until)
+        self.assertEqual(self.schedule.materialize(self.until), 0)
+        self.assertEqual(FitnessClass.objects.filter(schedule=self.schedule).count(), 12)
+
+    def test_materialize_counts_only_inserted_rows(self):
+        """
+        Ensure occurrences another run inserted first are not counted as created.
+        """
+        occurrences = self.schedule.occurrences
+
+        def concurrent_run(start, end):
+            dates = list(occurrences(start, end))
+            FitnessClass.objects.create(
+                schedule=self.schedule, name='Yoga', instructor='Asha', date_time=dates[0], total_slots=12, available_slots=12,
+            )
+            return dates
+
+        with mock.patch.object(self.schedule, 'occurrences', side_effect=concurrent_run):
+            self.assertEqual(self.schedule.materialize(self.until), 11)
+        self.assertEqual(FitnessClass.objects.filter(schedule=self.schedule).count(), 12)
+
+    def test_materialize_validates_before_inserting(self):
+        """
+        Ensure an invalid schedule raises before any class is created.
+        """
+        self.schedule.name = 'x' * 101
+        with self.assertRaises(ValidationError):
+            self.schedule.materialize(self.until)
+        self.assertFalse(FitnessClass.objects.exists())
+
+    def test_invalid_weekdays_are_rejected(self):
+        """
+        Ensure weekdays must be RRULE BYDAY codes.
+        """
+        self.schedule.weekdays = 'MON,XX'
+        with self.assertRaises(ValidationError):
+            self.schedule.full_clean()
+
+    def test_command_materializes_every_schedule(self):
+        """
+        Ensure materialize_schedules generates classes up to the horizon.
+        """
+        out = StringIO()
+        call_command('materialize_schedules', days=7, stdout=out)
+        self.assertEqual(FitnessClass.objects.count(), 3)
+        self.assertIn('Created 3 classes from 1 schedules', out.getvalue())
+
+
+class ImportTimetableTests(APITestCase):
+    def write(self, suffix, content):
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(fd, 'w') as f:
+            f.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_csv_import_skips_invalid_rows(self):
+        """
+        Ensure valid CSV rows are imported in batches and invalid ones are reported by line.
+        """
+        path = self.write('.csv', (
+            "name,date_time,instructor,total_slots,available_slots\n"
+            "Yoga,2030-01-01T07:00:00,Asha,10,\n"
+            "Zumba,2030-01-01T08:00:00Z,Ravi,20,5\n"
+            "HIIT,not-a-date,Ravi,20,\n"
+            "Pilates,2030-01-02T07:00:00,Meera,5,9\n"
+            "Spin,2030-01-03T07:00:00+05:30,Meera,8,\n"
+        ))
+        out, err = StringIO(), StringIO()
+        call_command('import_timetable', path, batch_size=2, stdout=out, stderr=err)
+        self.assertEqual(FitnessClass.objects.count(), 3)
+        yoga = FitnessClass.objects.get(name='Yoga')
+        self.assertEqual(yoga.available_slots, 10)
+        self.assertEqual(yoga.date_time, datetime.datetime(2030, 1, 1, 1, 30, tzinfo=datetime.timezone.utc))
+        self.assertIn('Imported 3 classes, skipped 2 invalid rows', out.getvalue())
+        self.assertIn('rows/s', out.getvalue())
+        self.assertIn('line 4: invalid date_time', err.getvalue())
+        self.assertIn('line 5: Available slots cannot be greater than total slots.', err.getvalue())
+
+    def test_jsonl_import_and_dry_run(self):
+        """
+        Ensure JSON Lines timetables are read, and a dry run only validates.
+        """
+        path = self.write('.jsonl', (
+            '{"name": "Yoga", "date_time": "2030-01-01T07:00:00Z", "instructor": "Asha", "total_slots": 10}\n'
+            '\n'
+            '{"name": "Zumba"\n'
+            '{"name": "Zumba", "date_time": "2030-01-01T08:00:00Z", "instructor": "Ravi", "total_slots": -1}\n'
+        ))
+        out, err = StringIO(), StringIO()
+        call_command('import_timetable', path, dry_run=True, stdout=out, stderr=err)
+        self.assertFalse(FitnessClass.objects.exists())
+        self.assertIn('Validated 1 classes, skipped 2 invalid rows', out.getvalue())
+        self.assertIn('line 3:', err.getvalue())
+        self.assertIn('line 4: total_slots:', err.getvalue())
+
+        call_command('import_timetable', path, stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(FitnessClass.objects.count(), 1)
+
+
+class BookingExportTests(APITestCase):
+    def setUp(self):
+        self.url = reverse('booking-export')
+        self.staff = User.objects.create_user(email='ops@example.com', password='Pass@1234', firstname='Ops', lastname='Team', is_staff=True)
+        start = timezone.now() + datetime.timedelta(days=1)
+        self.yoga = FitnessClass.objects.create(name='Yoga', date_time=start, instructor='Asha', total_slots=10, available_slots=10)
+        self.zumba = FitnessClass.objects.create(name='Zumba', date_time=start, instructor='Ravi', total_slots=10, available_slots=10)
+        for i in range(3):
+            Booking.objects.book(self.yoga, client_name=f'Client {i}', client_email=f'client{i}@example.com')
+        Booking.objects.book(self.zumba, client_name='Client 9', client_email='client9@example.com')
+
+    def content(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_export_is_staff_only(self):
+        """
+        Ensure anonymous and non-staff users cannot export bookings.
+        """
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+        member = User.objects.create_user(email='member@example.com', password='Pass@1234', firstname='M', lastname='M')
+        self.client.force_authenticate(member)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_csv_export_streams_joined_rows_in_one_query(self):
+        """
+        Ensure the CSV export streams every booking with its class using a single query.
+        """
+        self.client.force_authenticate(self.staff)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        with CaptureQueriesContext(connection) as queries:
+            rows = list(csv.DictReader(self.content(response).decode().splitlines()))
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[0]['class_name'], 'Yoga')
+        self.assertEqual(rows[0]['client_email'], 'client0@example.com')
+        self.assertEqual(rows[3]['instructor'], 'Ravi')
+
+    def test_filters_and_ndjson_format(self):
+        """
+        Ensure class and date filters apply and NDJSON emits one object per line.
+        """
+        self.client.force_authenticate(self.staff)
+        response = self.client.get(self.url, {'export_format': 'ndjson', 'class_id': str(self.zumba.id)})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in self.content(response).decode().splitlines()]
+        self.assertEqual([row['client_email'] for row in rows], ['client9@example.com'])
+
+        tomorrow = (timezone.now() + datetime.timedelta(days=1)).date().isoformat()
+        response = self.client.get(self.url, {'export_format': 'ndjson', 'start': tomorrow})
+        self.assertEqual(self.content(response), b'')
+        response = self.client.get(self.url, {'start': tomorrow, 'end': '2000-01-01'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_gzip_when_accepted(self):
+        """
+        Ensure the export is gzipped on the fly for clients that accept it.
+        """
+        self.client.force_authenticate(self.staff)
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        rows = gzip.decompress(self.content(response)).decode().splitlines()
+        self.assertEqual(len(rows), 5)
+
+    def test_command_writes_gzipped_file(self):
+        """
+        Ensure export_bookings writes the filtered export to a file.
+        """
+        fd, path = tempfile.mkstemp(suffix='.ndjson.gz')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        out = StringIO()
+        call_command('export_bookings', output=path, format='ndjson', class_id=str(self.yoga.id), gzip=True, stdout=out)
+        with gzip.open(path, 'rt') as f:
+            rows = [json.loads(line) for line in f]
+        self.assertEqual(len(rows), 3)
+        self.assertIn(f'to {path}', out.getvalue())
+
+
+class AdminChangelistTests(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(email='admin@example.com', password='Pass@1234', firstname='Ad', lastname='Min')
+        self.client.force_login(self.admin)
+        start = timezone.now() + datetime.timedelta(days=1)
+        self.classes = [
+            FitnessClass.objects.create(name=f'Class {i}', date_time=start, instructor='Asha', total_slots=50, available_slots=50)
+            for i in range(3)
+        ]
+
+    def add_bookings(self, count):
+        Booking.objects.bulk_book([
+            {'fitness_class': self.classes[i % 3], 'client_name': 'Client', 'client_email': f'client{i}@example.com'}
+            for i in range(Booking.objects.count(), Booking.objects.count() + count)
+        ])
+
+    def changelist_queries(self, url, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_booking_changelist_queries_do_not_grow_with_rows(self):
+        """
+        Ensure the booking changelist joins its classes instead of querying one per row.
+        """
+        url = reverse('admin:app_booking_changelist')
+        self.add_bookings(3)
+        _, few = self.changelist_queries(url)
+        self.add_bookings(30)
+        response, many = self.changelist_queries(url)
+        self.assertEqual(few, many)
+        self.assertEqual(response.context['cl'].result_count, 33)
+
+    def test_bookings_are_narrowed_to_a_class_by_link(self):
+        """
+        Ensure the class changelist links to that class's bookings, and exact email search works.
+        """
+        self.add_bookings(9)
+        response = self.client.get(reverse('admin:app_fitnessclass_changelist'))
+        link = reverse('admin:app_booking_changelist') + f'?fitness_class__id__exact={self.classes[0].pk}'
+        self.assertContains(response, link)
+        response = self.client.get(link)
+        self.assertEqual(response.context['cl'].result_count, 3)
+        response = self.client.get(reverse('admin:app_booking_changelist'), {'q': 'client4@example.com'})
+        self.assertEqual(response.context['cl'].result_count, 1)
+
+    @override_settings(ADMIN_COUNT_LIMIT=5)
+    def test_counts_are_capped(self):
+        """
+        Ensure changelist counts stop at ADMIN_COUNT_LIMIT instead of counting every row.
+        """
+        self.add_bookings(12)
+        response = self.client.get(reverse('admin:app_booking_changelist'))
+        self.assertEqual(response.context['cl'].result_count, 5)
+
+    def test_class_date_filter(self):
+        """
+        Ensure the class changelist filters by fixed date ranges.
+        """
+        FitnessClass.objects.create(name='Old', date_time=timezone.now() - datetime.timedelta(days=3), instructor='Asha', total_slots=5, available_slots=5)
+        url = reverse('admin:app_fitnessclass_changelist')
+        self.assertEqual(self.client.get(url, {'when': 'upcoming'}).context['cl'].result_count, 3)
+        self.assertEqual(self.client.get(url, {'when': 'past'}).context['cl'].result_count, 1)
+        self.assertEqual(self.client.get(url, {'q': 'Asha'}).context['cl'].result_count, 4)
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRoutingTests(APITestCase):
+    # Two separate SQLite test databases: 'default' is the primary and
+    # 'replica1' a replica that never catches up, so every read shows
+    # where it was routed.
+    databases = {'default', 'replica1'}
+
+    def setUp(self):
+        cache.clear()
+        start = timezone.now() + datetime.timedelta(days=1)
+        self.primary_class = FitnessClass.objects.create(name='Primary Yoga', date_time=start, instructor='Asha', total_slots=10, available_slots=10)
+        self.replica_class = FitnessClass.objects.using('replica1').create(name='Replica Zumba', date_time=start, instructor='Ravi', total_slots=10, available_slots=10)
+
+    def test_deploy_check_requires_a_shared_pin_cache(self):
+        """
+        Ensure the deploy checks warn when email pins would live in one worker's private cache.
+        """
+        with self.settings(CACHES=WORKER_CACHES, REPLICA_PIN_CACHE_ALIAS='worker1'):
+            self.assertEqual([warning.id for warning in check_replica_pin_cache()], ['app.W002'])
+        with self.settings(CACHES=WORKER_CACHES, REPLICA_PIN_CACHE_ALIAS='shared'):
+            self.assertEqual(check_replica_pin_cache(), [])
+        with self.settings(CACHES=WORKER_CACHES, REPLICA_PIN_CACHE_ALIAS='worker1', DATABASE_REPLICAS=[]):
+            self.assertEqual(check_replica_pin_cache(), [])
+
+    def class_names(self, response):
+        return [item['name'] for item in response.json()['results']]
+
+    def test_class_list_reads_from_replica(self):
+        """
+        Ensure the class list, sync and async, is served from the replica.
+        """
+        response = self.client.get(reverse('class-list'))
+        self.assertEqual(self.class_names(response), ['Replica Zumba'])
+        cache.clear()
+        response = async_to_sync(AsyncClient().get)(reverse('class-list-async'))
+        self.assertEqual(self.class_names(response), ['Replica Zumba'])
+
+    def test_booking_writes_go_to_primary_and_pin_the_client(self):
+        """
+        Ensure a booking is written to the primary and its client then reads from the primary.
+        """
+        data = {'class_id': self.primary_class.id, 'client_name': 'Rohit', 'client_email': 'rohit@example.com'}
+        response = self.client.post(reverse('book-class'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        # Another client reads the class list from the replica and caches it.
+        self.assertEqual(self.class_names(self.client_class().get(reverse('class-list'))), ['Replica Zumba'])
+        self.assertTrue(Booking.objects.using('default').filter(client_email='rohit@example.com').exists())
+        self.assertFalse(Booking.objects.using('replica1').exists())
+
+        # Pinned by cookie...
+        response = self.client.get(reverse('booking-list'), {'client_email': 'rohit@example.com'})
+        self.assertEqual(len(response.json()['results']), 1)
+        # The replica page cached by the earlier read is not served to a pinned client.
+        response = self.client.get(reverse('class-list'))
+        self.assertEqual(self.class_names(response), ['Primary Yoga'])
+        # ...and by email, for clients that do not keep cookies.
+        self.client.cookies.clear()
+        response = self.client.get(reverse('booking-list'), {'client_email': 'rohit@example.com'})
+        self.assertEqual(len(response.json()['results']), 1)
+        response = self.client.get(reverse('booking-list'), {'client_email': 'someone@example.com'})
+        self.assertEqual(response.json()['results'], [])
+
+    def test_pinning_can_be_disabled(self):
+        """
+        Ensure REPLICA_PIN_SECONDS=0 leaves clients reading from the replica after a write.
+        """
+        data = {'class_id': self.primary_class.id, 'client_name': 'Rohit', 'client_email': 'rohit@example.com'}
+        with override_settings(REPLICA_PIN_SECONDS=0):
+            self.client.post(reverse('book-class'), data, format='json')
+        self.assertNotIn('primary_pin', self.client.cookies)
+        response = self.client.get(reverse('booking-list'), {'client_email': 'rohit@example.com'})
+        self.assertEqual(response.json()['results'], [])
+
+    def test_auth_stays_on_primary(self):
+        """
+        Ensure users are registered and authenticated against the primary only.
+        """
+        payload = {'email': 'member@example.com', 'firstname': 'M', 'lastname': 'M', 'password': 'Pass@1234', 'password2': 'Pass@1234'}
+        self.client.post(reverse('register'), payload, format='json')
+        self.assertFalse(User.objects.using('replica1').exists())
+        response = self.client.post(reverse('token_obtain_pair'), {'email': 'member@example.com', 'password': 'Pass@1234'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        self.assertEqual(self.client.get(reverse('class-list')).status_code, status.HTTP_200_OK)
+
+
+class RequestMetricsTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        metrics_registry.reset()
+        self.fitness_class = FitnessClass.objects.create(name='Yoga', date_time=timezone.now() + datetime.timedelta(days=1), instructor='Asha', total_slots=10, available_slots=10)
+
+    def test_server_timing_header(self):
+        """
+        Ensure responses carry wall, database and serializer timings with the query count.
+        """
+        response = self.client.get(reverse('class-list'))
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="1 queries", ser;dur=[\d.]+$')
+
+    def test_requests_are_aggregated_per_view(self):
+        """
+        Ensure each view gets its own histograms and response counts.
+        """
+        self.client.get(reverse('class-list'))
+        self.client.get(reverse('class-list'))
+        data = {'class_id': self.fitness_class.id, 'client_name': 'Rohit', 'client_email': 'rohit@example.com'}
+        self.client.post(reverse('book-class'), data, format='json')
+        text = metrics_registry.render()
+        self.assertIn('omnify_responses_total{view="class-list",status="200"} 2', text)
+        self.assertIn('omnify_responses_total{view="book-class",status="201"} 1', text)
+        self.assertIn('omnify_request_duration_seconds_count{view="class-list"} 2', text)
+        self.assertIn('omnify_db_queries_bucket{view="class-list",le="1"} 2', text)
+        self.assertIn('omnify_response_size_bytes_count{view="book-class"} 1', text)
+        self.assertNotIn('omnify_serializer_duration_seconds_sum{view="book-class"} 0\n', text)
+
+    def test_async_views_count_queries(self):
+        """
+        Ensure queries made from async views through sync_to_async are counted.
+        """
+        response = async_to_sync(AsyncClient().get)(reverse('class-list-async'))
+        self.assertIn('desc="1 queries"', response['Server-Timing'])
+
+    def test_credential_pool_is_exported(self):
+        """
+        Ensure the credential pool's calls, rejections and queue waits appear in the metrics.
+        """
+        User.objects.create_user(email='member@example.com', password='Pass@1234', firstname='Test', lastname='Member')
+        self.client.post(reverse('token_obtain_pair'), {'email': 'member@example.com', 'password': 'Pass@1234'}, format='json')
+        stats = get_credential_pool().stats()
+        self.assertGreater(stats['completed'], 0)
+        text = metrics_registry.render()
+        self.assertIn('# TYPE omnify_password_hashing_calls_total counter', text)
+        self.assertIn(f'omnify_password_hashing_calls_total{{outcome="completed"}} {stats["completed"]}', text)
+        self.assertIn(f'omnify_password_hashing_in_flight {stats["in_flight"]}', text)
+        self.assertRegex(text, r'omnify_password_hashing_queue_wait_seconds\{quantile="0.99"\} [\d.e-]+')
+
+    @override_settings(CACHES=WORKER_CACHES, CATALOGUE_CACHE_ALIAS='shared')
+    def test_catalogue_cache_hits_are_exported(self):
+        """
+        Ensure catalogue page cache hits and misses appear in the metrics.
+        """
+        caches['shared'].clear()
+        reset_cache_stats()
+        self.client.get(reverse('class-list'))
+        self.client.get(reverse('class-list'))
+        self.client.get(reverse('class-list'))
+        text = metrics_registry.render()
+        self.assertIn('omnify_catalogue_cache_lookups_total{result="hit"} 2', text)
+        self.assertIn('omnify_catalogue_cache_lookups_total{result="miss"} 1', text)
+        self.assertIn('omnify_catalogue_cache_hit_ratio 0.666667', text)
+
+    def test_logging_counters_are_exported(self):
+        """
+        Ensure the async logging queue's enqueued, dropped and written counts appear in the metrics.
+        """
+        stats = {'app': {'enqueued': 7, 'dropped': 2, 'queued': 1, 'batches': 3, 'written': 4}}
+        with mock.patch('app.log.get_logging_stats', return_value=stats):
+            text = metrics_registry.render()
+        self.assertIn('omnify_log_records_total{logger="app",outcome="dropped"} 2', text)
+        self.assertIn('omnify_log_records_total{logger="app",outcome="written"} 4', text)
+        self.assertIn('omnify_log_batches_total{logger="app"} 3', text)
+        self.assertIn('omnify_log_queue_size{logger="app"} 1', text)
+
+    def test_metrics_endpoint_is_staff_only(self):
+        """
+        Ensure only staff can read the Prometheus metrics.
+        """
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, status.HTTP_401_UNAUTHORIZED)
+        staff = User.objects.create_user(email='ops@example.com', password='Pass@1234', firstname='Ops', lastname='Team', is_staff=True)
+        self.client.force_authenticate(staff)
+        self.client.get(reverse('class-list'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertIn(b'# TYPE omnify_request_duration_seconds histogram', response.content)
+
+    @override_settings(REQUEST_METRICS={'ENABLED': False})
+    def test_disabled(self):
+        """
+        Ensure nothing is recorded or added to responses when metrics are disabled.
+        """
+        response = self.client.get(reverse('class-list'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertNotIn('class-list', metrics_registry.render())
+
+
+@override_settings(CACHES=WORKER_CACHES, CATALOGUE_CACHE_ALIAS='shared')
+class ConditionalListTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        caches['shared'].clear()
+        start = timezone.now() + datetime.timedelta(days=1)
+        self.classes = [
+            FitnessClass.objects.create(name=f'Class {i}', date_time=start + datetime.timedelta(hours=i), instructor='Asha', total_slots=10, available_slots=10)
+            for i in range(3)
+        ]
+        self.booking = Booking.objects.book(self.classes[0], client_name='Rohit', client_email='rohit@example.com')
+
+    def test_class_list_not_modified(self):
+        """
+        Ensure a matching If-None-Match gets 304 from both the cache and the database, without serializing rows.
+        """
+        url = reverse('class-list')
+        etag = self.client.get(url)['ETag']
+        self.assertTrue(etag.startswith('W/"'))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response['ETag'], etag)
+
+        caches['shared'].clear()
+        with mock.patch.object(app_serializers.FitnessClassSerializer, 'to_representation') as to_representation:
+            with self.assertNumQueries(1):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        to_representation.assert_not_called()
+
+    def test_class_list_etag_changes_with_the_page(self):
+        """
+        Ensure the ETag changes when a seat is claimed and differs per timezone.
+        """
+        url = reverse('class-list')
+        etag = self.client.get(url)['ETag']
+        self.assertNotEqual(self.client.get(url, {'timezone': 'UTC'})['ETag'], etag)
+        before = FitnessClass.objects.get(pk=self.classes[1].pk).updated_at
+        with self.captureOnCommitCallbacks(execute=True):
+            Booking.objects.book(self.classes[1], client_name='Asha', client_email='asha@example.com')
+        self.assertGreater(FitnessClass.objects.get(pk=self.classes[1].pk).updated_at, before)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_booking_list_not_modified_until_it_changes(self):
+        """
+        Ensure the booking list revalidates, and changes once its class starts.
+        """
+        url = reverse('booking-list')
+        params = {'client_email': 'rohit@example.com'}
+        etag = self.client.get(url, params)['ETag']
+        self.assertEqual(self.client.get(url, params, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+        # booking_expired flips without any row being saved.
+        FitnessClass.objects.filter(pk=self.classes[0].pk).update(date_time=timezone.now() - datetime.timedelta(minutes=1))
+        response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.json()['results'][0]['booking_expired'])
+
+    def test_async_views_share_etags(self):
+        """
+        Ensure the async lists send the same ETags and honour If-None-Match.
+        """
+        sync_etag = self.client.get(reverse('booking-list'), {'client_email': 'rohit@example.com'})['ETag']
+        client = AsyncClient()
+        response = async_to_sync(client.get)(reverse('booking-list-async'), {'client_email': 'rohit@example.com'})
+        self.assertEqual(response['ETag'], sync_etag)
+        response = async_to_sync(client.get)(reverse('booking-list-async'), {'client_email': 'rohit@example.com'}, headers={'If-None-Match': sync_etag})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        caches['shared'].clear()
+        etag = async_to_sync(client.get)(reverse('class-list-async'))['ETag']
+        response = async_to_sync(client.get)(reverse('class-list-async'), headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['X-Cache'], 'HIT')
+
+
+
+class ProjectionTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        start = timezone.now() + datetime.timedelta(days=1)
+        self.classes = [
+            FitnessClass.objects.create(name=f'Class {i}', date_time=start + datetime.timedelta(hours=i), instructor='Asha', total_slots=10, available_slots=10)
+            for i in range(20)
+        ]
+        for fitness_class in self.classes:
+            Booking.objects.book(fitness_class, client_name='Rohit', client_email='rohit@example.com')
+
+    def test_class_list_fields(self):
+        """
+        Ensure ?fields= returns only those fields and loads only their columns.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('class-list'), {'fields': 'id,name'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['results'][0], {'id': self.classes[0].pk, 'name': 'Class 0'})
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('"instructor"', queries[0]['sql'])
+        # The full page is cached separately.
+        self.assertEqual(len(self.client.get(reverse('class-list')).json()['results'][0]), 6)
+
+    def test_unknown_fields_rejected(self):
+        """
+        Ensure unknown field names are a 400 on the sync and async lists.
+        """
+        response = self.client.get(reverse('class-list'), {'fields': 'id,secret'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('secret', response.json()['fields'][0])
+        response = async_to_sync(AsyncClient().get)(reverse('booking-list-async'), {'client_email': 'rohit@example.com', 'class_fields': 'bogus'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('class_fields', response.json())
+
+    def test_booking_list_projection_in_one_query(self):
+        """
+        Ensure booking and class fields project without deferred loads, and vary the ETag.
+        """
+        url = reverse('booking-list')
+        params = {'client_email': 'rohit@example.com', 'fields': 'id,fitness_class,booking_expired', 'class_fields': 'name'}
+        full_etag = self.client.get(url, {'client_email': 'rohit@example.com'})['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(url, params)
+        row = response.json()['results'][0]
+        self.assertEqual(set(row), {'id', 'fitness_class', 'booking_expired'})
+        self.assertEqual(set(row['fitness_class']), {'name'})
+        self.assertNotEqual(response['ETag'], full_etag)
+
+    def test_compact_booking_list(self):
+        """
+        Ensure the compact format sends columns, row arrays and a class table, and is several times smaller.
+        """
+        url = reverse('booking-list')
+        params = {'client_email': 'rohit@example.com', 'page_size': 20}
+        full = self.client.get(url, params)
+        compact = self.client.get(url, {**params, 'compact': 'true'})
+        results = compact.json()['results']
+        self.assertEqual(results['columns'], ['id', 'fitness_class', 'client_name', 'client_email', 'booking_time', 'date_time', 'booking_expired'])
+        self.assertEqual(len(results['rows']), 20)
+        first = full.json()['results'][0]
+        self.assertEqual(dict(zip(results['columns'], results['rows'][0])), {**first, 'fitness_class': first['fitness_class']['id']})
+        self.assertEqual(results['classes'][str(first['fitness_class']['id'])], first['fitness_class'])
+
+        projected = self.client.get(url, {**params, 'compact': '1', 'fields': 'id,fitness_class,booking_time', 'class_fields': 'name'})
+        self.assertLess(len(projected.content) * 3, len(full.content))
+        async_response = async_to_sync(AsyncClient().get)(reverse('booking-list-async'), {**params, 'compact': '1', 'fields': 'id,fitness_class,booking_time', 'class_fields': 'name'})
+        self.assertEqual(async_response.json(), projected.json())
+
+
+class ArchiveTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        now = timezone.now()
+        self.old = [
+            FitnessClass.objects.create(name=f'Old {i}', date_time=now - datetime.timedelta(days=400 + i), instructor='Asha', total_slots=10, available_slots=10)
+            for i in range(3)
+        ]
+        self.upcoming = FitnessClass.objects.create(name='Upcoming', date_time=now + datetime.timedelta(days=1), instructor='Asha', total_slots=10, available_slots=10)
+        for i, fitness_class in enumerate([*self.old, self.upcoming]):
+            booking = Booking.objects.book(fitness_class, client_name='Rohit', client_email='rohit@example.com')
+            Booking.objects.filter(pk=booking.pk).update(booking_time=now - datetime.timedelta(days=500 - i))
+        Booking.objects.book(self.old[0], client_name='Asha', client_email='asha@example.com')
+        WaitlistEntry.objects.create(fitness_class=self.old[0], client_name='Priya', client_email='priya@example.com')
+
+    def test_archive_classes_moves_old_classes_in_chunks(self):
+        """
+        Ensure old classes and their bookings move to the archive in chunks, keeping ids, and reruns are no-ops.
+        """
+        live = {booking.pk: booking for booking in Booking.objects.filter(fitness_class__in=self.old)}
+        out = StringIO()
+        call_command('archive_classes', dry_run=True, stdout=out)
+        self.assertIn('Would archive 3 classes (4 bookings)', out.getvalue())
+        self.assertEqual(FitnessClass.objects.count(), 4)
+
+        out = StringIO()
+        call_command('archive_classes', batch_size=2, stdout=out)
+        self.assertIn('Archived 3 classes (4 bookings) in 2 chunks.', out.getvalue())
+        self.assertEqual(list(FitnessClass.objects.values_list('pk', flat=True)), [self.upcoming.pk])
+        self.assertEqual(Booking.objects.count(), 1)
+        self.assertFalse(WaitlistEntry.objects.exists())
+        self.assertEqual(set(ArchivedFitnessClass.objects.values_list('pk', flat=True)), {c.pk for c in self.old})
+        for archived in ArchivedBooking.objects.all():
+            self.assertEqual((archived.fitness_class_id, archived.booking_time, archived.updated_at), (live[archived.pk].fitness_class_id, live[archived.pk].booking_time, live[archived.pk].updated_at))
+
+        out = StringIO()
+        call_command('archive_classes', stdout=out)
+        self.assertIn('Archived 0 classes (0 bookings) in 0 chunks.', out.getvalue())
+
+    def test_archived_sharded_class_keeps_its_free_seats(self):
+        """
+        Ensure a sharded class is archived with its shard total, not the stale stored count.
+        """
+        self.old[1].set_shard_count(2)
+        Booking.objects.book(self.old[1], client_name='Asha', client_email='asha@example.com')
+        call_command('archive_classes', stdout=StringIO())
+        self.assertEqual(ArchivedFitnessClass.objects.get(pk=self.old[1].pk).available_slots, 8)
+
+    def test_export_includes_archived_bookings(self):
+        """
+        Ensure the bookings export keeps archived bookings, in id order with the live ones.
+        """
+        before = list(export_queryset())
+        call_command('archive_classes', stdout=StringIO())
+        self.assertEqual(list(export_queryset()), before)
+        start = timezone.now() - datetime.timedelta(days=499)
+        self.assertEqual([row[0] for row in export_queryset(start=start)], [row[0] for row in before if row[1] >= start])
+        self.assertEqual(len(export_queryset(start=timezone.now() - datetime.timedelta(days=1))), 1)
+
+    def test_booking_list_include_archived(self):
+        """
+        Ensure include_archived merges live and archived bookings in order across pages, on the sync and async lists.
+        """
+        call_command('archive_classes', stdout=StringIO())
+        url = reverse('booking-list')
+        response = self.client.get(url, {'client_email': 'rohit@example.com'})
+        self.assertEqual([row['fitness_class']['name'] for row in response.json()['results']], ['Upcoming'])
+
+        params = {'client_email': 'rohit@example.com', 'include_archived': 'true', 'page_size': 2}
+        names, next_url = [], None
+        while True:
+            response = self.client.get(next_url) if next_url else self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            names += [row['fitness_class']['name'] for row in response.json()['results']]
+            next_url = response.json()['next']
+            if not next_url:
+                break
+        self.assertEqual(names, ['Upcoming', 'Old 2', 'Old 1', 'Old 0'])
+        self.assertTrue(response.json()['results'][-1]['booking_expired'])
+
+        first_page = self.client.get(url, params).json()
+        response = async_to_sync(AsyncClient().get)(reverse('booking-list-async'), params)
+        self.assertEqual(response.json(), {**first_page, 'next': first_page['next'].replace('/api/bookings/', '/api/async/bookings/')})
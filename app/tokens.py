@@ -0,0 +1,221 @@
+"""
+Refresh tokens whose blacklist check is answered in memory.
+
+Every `/api/token/refresh/` call blacklists the token it rotates, so the
+blacklist check would normally be a DB lookup on every refresh. Instead,
+each process keeps a bloom filter of the blacklisted JTIs. A JTI the filter
+has never seen is definitely not blacklisted and needs no query. Only a
+filter hit (a real reuse or a rare false positive) falls back to the DB.
+
+A shared version number in the cache tells each process when another one
+has blacklisted a token. The process then loads just the new rows. The
+filter is also rebuilt from scratch every REBUILD_INTERVAL seconds, which
+drops expired JTIs and covers any rows an incremental load missed.
+
+The version number only reaches the other processes through a cache they
+all share. With a process-local cache (LocMemCache, the default, or
+DummyCache) the filter is bypassed and every check goes to the DB, so a
+rotated or logged-out token is never accepted by another worker.
+"""
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .cache import is_shared_cache
+
+BLACKLIST_VERSION_KEY = 'token_blacklist:version'
+
+
+class BloomFilter:
+    """
+    Fixed-size bloom filter of strings, sized for `capacity` items at the
+    given false positive rate.
+    """
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = max(1, capacity)
+        self.size = max(64, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def _positions(self, item):
+        # Double hashing: k positions from the two halves of one digest.
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hash_count)]
+
+    def add(self, item):
+        positions = self._positions(item)
+        with self._lock:
+            for position in positions:
+                self.bits[position >> 3] |= 1 << (position & 7)
+            self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+def get_cache(alias=None):
+    return caches[alias or getattr(settings, 'TOKEN_BLACKLIST_CACHE_ALIAS', 'default')]
+
+
+def get_blacklist_version(cache=None):
+    cache = cache or get_cache()
+    version = cache.get(BLACKLIST_VERSION_KEY)
+    if version is None:
+        cache.add(BLACKLIST_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(BLACKLIST_VERSION_KEY, 0)
+    return version
+
+
+def _increment_version():
+    cache = get_cache()
+    try:
+        cache.incr(BLACKLIST_VERSION_KEY)
+    except ValueError:
+        cache.set(BLACKLIST_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def bump_blacklist_version(using=None):
+    """
+    Tell every process that the blacklist has new rows.
+    """
+    _increment_version()
+    # Another process that reloads before this transaction commits will not
+    # see the new row, so bump again once it is visible.
+    if transaction.get_connection(using).in_atomic_block:
+        transaction.on_commit(_increment_version, using=using)
+
+
+class BlacklistFilter:
+    """
+    Process-wide bloom filter of blacklisted JTIs, kept in step with the
+    `token_blacklist` tables.
+    """
+
+    def __init__(self, capacity=None, error_rate=None, rebuild_interval=None, cache_alias=None):
+        self.capacity = capacity or getattr(settings, 'TOKEN_BLACKLIST_FILTER_CAPACITY', 100_000)
+        self.error_rate = error_rate or getattr(settings, 'TOKEN_BLACKLIST_FILTER_ERROR_RATE', 0.001)
+        self.rebuild_interval = rebuild_interval or getattr(settings, 'TOKEN_BLACKLIST_FILTER_REBUILD_INTERVAL', 300)
+        # None follows TOKEN_BLACKLIST_CACHE_ALIAS.
+        self.cache_alias = cache_alias
+        self._lock = threading.Lock()
+        self._bloom = None
+        self._version = None
+        self._last_id = 0
+        self._built_at = 0.0
+        self.rebuilds = 0
+        self.db_checks = 0
+
+    @property
+    def enabled(self):
+        return is_shared_cache(get_cache(self.cache_alias))
+
+    def might_contain(self, jti):
+        """
+        False means the JTI is definitely not blacklisted. Always True
+        without a shared cache, which would hide other processes' writes.
+        """
+        if not self.enabled:
+            return True
+        return jti in self._sync()
+
+    def add(self, jti):
+        bloom = self._bloom
+        if bloom is not None:
+            bloom.add(jti)
+
+    def _sync(self):
+        version = get_blacklist_version(get_cache(self.cache_alias))
+        bloom = self._bloom
+        if bloom is not None and version == self._version and not self._expired():
+            return bloom
+        with self._lock:
+            if self._bloom is None or self._expired() or self._bloom.count >= self._bloom.capacity:
+                self._rebuild(version)
+            elif version != self._version:
+                self._load(version)
+            return self._bloom
+
+    def _expired(self):
+        return time.monotonic() - self._built_at >= self.rebuild_interval
+
+    def _rows(self, after_id=0):
+        return (
+            BlacklistedToken.objects
+            .filter(id__gt=after_id, token__expires_at__gt=timezone.now())
+            .order_by('id')
+            .values_list('id', 'token__jti')
+        )
+
+    def _rebuild(self, version):
+        rows = list(self._rows())
+        bloom = BloomFilter(max(self.capacity, 2 * len(rows)), self.error_rate)
+        for _, jti in rows:
+            bloom.add(jti)
+        self._last_id = rows[-1][0] if rows else 0
+        self._version = version
+        self._built_at = time.monotonic()
+        self._bloom = bloom
+        self.rebuilds += 1
+
+    def _load(self, version):
+        for row_id, jti in self._rows(self._last_id).iterator(chunk_size=2000):
+            self._bloom.add(jti)
+            self._last_id = row_id
+        self._version = version
+
+    def reset(self):
+        with self._lock:
+            self._bloom = None
+            self._version = None
+            self._last_id = 0
+            self._built_at = 0.0
+
+
+_blacklist_filter = None
+_filter_lock = threading.Lock()
+
+
+def get_blacklist_filter():
+    global _blacklist_filter
+    if _blacklist_filter is None:
+        with _filter_lock:
+            if _blacklist_filter is None:
+                _blacklist_filter = BlacklistFilter()
+    return _blacklist_filter
+
+
+class FilteredRefreshToken(RefreshToken):
+    """
+    RefreshToken that checks the in-process blacklist filter before the DB.
+    """
+
+    def check_blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        blacklist_filter = get_blacklist_filter()
+        if not blacklist_filter.might_contain(jti):
+            return
+        blacklist_filter.db_checks += 1
+        if BlacklistedToken.objects.filter(token__jti=jti).exists():
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        result = super().blacklist()
+        get_blacklist_filter().add(self.payload[api_settings.JTI_CLAIM])
+        bump_blacklist_version()
+        return result
@@ -1,5 +1,9 @@
 from django.urls import path
-from .views import RegisterView, LogoutView, FitnessClassListView, BookingCreateView, BookingListView
+from .views import (
+    RegisterView, LogoutView, FitnessClassListView, BookingCreateView, BulkBookingCreateView, BookingListView,
+    BookingCancelView, WaitlistView, WaitlistEntryDeleteView,
+    AsyncFitnessClassListView, AsyncBookingListView, SlotStreamView, BookingExportView, MetricsView,
+)
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
@@ -12,6 +16,16 @@ urlpatterns = [
     path('logout/', LogoutView.as_view(), name='logout'),
     # api
     path('classes/', FitnessClassListView.as_view(), name='class-list'),
+    path('classes/stream/', SlotStreamView.as_view(), name='class-slot-stream'),
     path('book/', BookingCreateView.as_view(), name='book-class'),
+    path('book/bulk/', BulkBookingCreateView.as_view(), name='book-bulk'),
     path('bookings/', BookingListView.as_view(), name='booking-list'),
+    path('bookings/export/', BookingExportView.as_view(), name='booking-export'),
+    path('bookings/<int:pk>/cancel/', BookingCancelView.as_view(), name='booking-cancel'),
+    path('waitlist/', WaitlistView.as_view(), name='waitlist'),
+    path('waitlist/<int:pk>/', WaitlistEntryDeleteView.as_view(), name='waitlist-entry'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
+    # async (ASGI) read endpoints
+    path('async/classes/', AsyncFitnessClassListView.as_view(), name='class-list-async'),
+    path('async/bookings/', AsyncBookingListView.as_view(), name='booking-list-async'),
 ]
\ No newline at end of file
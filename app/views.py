@@ -1,22 +1,130 @@
 from django.shortcuts import render
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views import View
 from rest_framework.views import APIView
+from rest_framework.request import Request
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.response import Response
 from rest_framework import generics, status, permissions
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-from rest_framework_simplejwt.tokens import RefreshToken
-from .serializers import RegisterSerializer, FitnessClassSerializer, BookingCreateSerializer, BookingListSerializer
+from .serializers import RegisterSerializer, FitnessClassSerializer, BookingCreateSerializer, BookingListSerializer, BulkBookingSerializer, BulkBookingItemSerializer, WaitlistJoinSerializer, WaitlistEntrySerializer, BookingExportFilterSerializer, parse_projection
 from django.contrib.auth import get_user_model
-from .models import FitnessClass, Booking
-from django.db import transaction
+from .models import ArchivedBooking, FitnessClass, Booking, WaitlistEntry, NoAvailableSlots
+from .idempotency import idempotent
+from .events import stream_events
+from .metrics import registry as metrics_registry
+from .export import CONTENT_TYPES, export_queryset, stream_export
+from .tokens import FilteredRefreshToken
+from .cache import (
+    acatalogue_cache_key, aget_cached_response, aset_cached_response,
+    catalogue_cache_key, get_cached_response, set_cached_response,
+)
+from .pagination import FitnessClassCursorPagination, BookingCursorPagination
+from .routers import is_pinned, pin_to_primary, replica_reads
+from django.db import IntegrityError
 from django.utils import timezone
+from django.utils.cache import get_conditional_response
 from rest_framework.generics import RetrieveAPIView
+import json
 import logging
 
 
 User = get_user_model()
 logger = logging.getLogger('app')
 
+
+class ReplicaReadMixin:
+    """
+    Serves the view's class and booking reads from a read replica, unless
+    the client is pinned to the primary after a recent write.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        self.pinned_to_primary = is_pinned(request, request.GET.get('client_email'))
+        use_replica = not self.pinned_to_primary
+        if self.view_is_async:
+            return self._adispatch(use_replica, request, *args, **kwargs)
+        with replica_reads(use_replica):
+            return super().dispatch(request, *args, **kwargs)
+
+    async def _adispatch(self, use_replica, request, *args, **kwargs):
+        with replica_reads(use_replica):
+            return await super().dispatch(request, *args, **kwargs)
+
+
+def conditional_response(request, etag):
+    """
+    The 304 Not Modified (or 412 Precondition Failed) response for a
+    request whose validators match `etag`, or None to send the full body.
+    """
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        response['ETag'] = etag
+    return response
+
+
+def include_archived(query_params):
+    return query_params.get('include_archived', '').lower() in ('1', 'true')
+
+
+def get_etag_parts(query_params, projection):
+    # Request options that change the representation of the same rows.
+    return (query_params.get('timezone', ''), projection['fields'], projection['class_fields'], projection['compact'])
+
+
+def serialize_page(serializer_class, page, context):
+    """
+    The rows of `page` as a list of objects, or in the compact columnar
+    format when the list was requested with `compact`.
+    """
+    if context.get('compact'):
+        return serializer_class(context=context).to_compact(page)
+    return serializer_class(page, many=True, context=context).data
+
+
+class ConditionalListMixin:
+    """
+    Tags each page with the paginator's ETag and answers a matching
+    If-None-Match with 304 Not Modified, before the rows are serialized.
+    Also applies the `fields`/`class_fields`/`compact` list options.
+    """
+
+    def get_etag_parts(self, request):
+        return get_etag_parts(request.query_params, self.projection)
+
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), **self.projection}
+
+    def list(self, request, *args, **kwargs):
+        serializer_class = self.get_serializer_class()
+        self.projection = parse_projection(request.query_params, serializer_class)
+        queryset = serializer_class.project_queryset(self.filter_queryset(self.get_queryset()), self.projection)
+        page = self.paginate_queryset(queryset)
+        etag = self.paginator.get_etag(*self.get_etag_parts(request))
+        not_modified = conditional_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+        response = self.get_paginated_response(serialize_page(serializer_class, page, self.get_serializer_context()))
+        response['ETag'] = etag
+        return response
+
+
+class PrimaryPinMixin:
+    """
+    Pins the client to the primary after a successful write, so their next
+    list request does not miss it on a lagging replica.
+    """
+
+    def get_client_emails(self, request):
+        return [request.data.get('client_email')]
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if request.method not in permissions.SAFE_METHODS and response.status_code < 400:
+            pin_to_primary(response, self.get_client_emails(request))
+        return response
+
 #####################
 # --- User Auth ---
 #####################
@@ -33,7 +141,7 @@ class LogoutView(APIView):
     def post(self, request):
         try:
             refresh_token = request.data["refresh"]
-            token = RefreshToken(refresh_token)
+            token = FilteredRefreshToken(refresh_token)
             token.blacklist()
             return Response({"detail": "Logout successful."})
         except Exception as e:
@@ -46,69 +154,418 @@ class LogoutView(APIView):
 #####################
 
 # GET /classes
-class FitnessClassListView(generics.ListAPIView):
+class FitnessClassListView(ReplicaReadMixin, ConditionalListMixin, generics.ListAPIView):
     serializer_class = FitnessClassSerializer
     permission_classes = [AllowAny]
+    pagination_class = FitnessClassCursorPagination
+
+    def list(self, request, *args, **kwargs):
+        params = request.query_params
+        cache_key = catalogue_cache_key(
+            request, 'classes', params.get('timezone', ''), params.get('cursor', ''), params.get('page_size', ''),
+            params.get('fields', ''), params.get('compact', ''),
+        )
+        # A cached page may have been read from a lagging replica.
+        cached = None if self.pinned_to_primary else get_cached_response(cache_key)
+        if cached is not None:
+            data, etag = cached
+            response = conditional_response(request, etag) or Response(data, headers={'ETag': etag})
+            response['X-Cache'] = 'HIT'
+            return response
+
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            set_cached_response(cache_key, (response.data, response['ETag']))
+        response['X-Cache'] = 'MISS'
+        return response
 
     def get_queryset(self):
-        now = timezone.now()
         try:
-            queryset = FitnessClass.objects.filter(date_time__gte=now, available_slots__gt=0).order_by('date_time')
-            logger.info(f"Request received for list of classes, Found {queryset.count()} upcoming classes.")
+            queryset = FitnessClass.objects.upcoming().with_free_seats()
+            logger.info("Request received for list of upcoming classes.")
             return queryset
         except Exception as e:
-            logger.error(f"Error fetching fitness classes: {e}")
+            logger.error("Error fetching fitness classes.", extra={"error": str(e)})
             return FitnessClass.objects.none()
 
 
 # POST /book
-class BookingCreateView(APIView):
+class BookingCreateView(PrimaryPinMixin, APIView):
     permission_classes = [AllowAny]
 
+    @idempotent('book')
     def post(self, request, *args, **kwargs):
         client_email = request.data.get('client_email', 'unknown')
         serializer = BookingCreateSerializer(data=request.data)
         if serializer.is_valid():
             fitness_class_obj = serializer.validated_data['fitness_class']
-            logger.info(f"Booking request received for client '{client_email}' for class ID '{fitness_class_obj.pk}'.")
+            logger.info("Booking request received.", extra={"client_email": client_email, "class_id": fitness_class_obj.pk})
 
             if fitness_class_obj.date_time < timezone.now():
-                logger.warning(f"Booking failed for '{client_email}'. Class '{fitness_class_obj.name}' has already expired.")
+                logger.warning("Booking failed, class has already expired.", extra={"client_email": client_email, "class_id": fitness_class_obj.pk})
                 return Response(
                     {"detail": "This class has already expired and cannot be booked."},
                     status=status.HTTP_400_BAD_REQUEST)
 
-            with transaction.atomic():
-                fitness_class = FitnessClass.objects.select_for_update().get(pk=fitness_class_obj.pk)
-
-                if fitness_class.available_slots > 0:
-                    serializer.save(fitness_class=fitness_class)
-                    logger.info(f"Booking successful for '{client_email}' in class '{fitness_class.pk}'.")
-                    return Response(serializer.data, status=status.HTTP_201_CREATED)
-                else:
-                    logger.warning(f"Booking failed for '{client_email}'. No available slots for class '{fitness_class.pk}'.")
-                    return Response({"detail": "No available slots for this class."}, status=status.HTTP_400_BAD_REQUEST)
-                
-        logger.error(f"Booking request failed due to invalid data for client '{client_email}'. Errors: {serializer.errors}")
+            try:
+                serializer.save()
+            except NoAvailableSlots:
+                logger.warning("Booking failed, no available slots.", extra={"client_email": client_email, "class_id": fitness_class_obj.pk})
+                return Response({"detail": "No available slots for this class."}, status=status.HTTP_400_BAD_REQUEST)
+            except IntegrityError:
+                # A concurrent request booked the same client in between validation and insert.
+                logger.warning("Booking failed, duplicate booking.", extra={"client_email": client_email, "class_id": fitness_class_obj.pk})
+                return Response({"non_field_errors": ["You have already booked this class."]}, status=status.HTTP_400_BAD_REQUEST)
+
+            logger.info("Booking successful.", extra={"client_email": client_email, "class_id": fitness_class_obj.pk})
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+        logger.error("Booking request failed due to invalid data.", extra={"client_email": client_email, "errors": serializer.errors})
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+# POST /book/bulk
+class BulkBookingCreateView(PrimaryPinMixin, APIView):
+    permission_classes = [AllowAny]
+
+    def get_client_emails(self, request):
+        return [item.get('client_email') for item in request.data.get('bookings', []) if isinstance(item, dict)]
+
+    @idempotent('book-bulk')
+    def post(self, request, *args, **kwargs):
+        serializer = BulkBookingSerializer(data=request.data)
+        if not serializer.is_valid():
+            logger.error("Bulk booking request rejected.", extra={"errors": serializer.errors})
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        raw_items = serializer.validated_data['bookings']
+        results = [None] * len(raw_items)
+        valid = []
+        for index, raw_item in enumerate(raw_items):
+            item_serializer = BulkBookingItemSerializer(data=raw_item)
+            if item_serializer.is_valid():
+                valid.append((index, item_serializer.validated_data))
+            else:
+                results[index] = {'status': 'failed', 'errors': item_serializer.errors}
+
+        classes = FitnessClass.objects.in_bulk({item['class_id'] for _, item in valid})
+        now = timezone.now()
+        bookable = []
+        for index, item in valid:
+            fitness_class = classes.get(item['class_id'])
+            if fitness_class is None:
+                results[index] = {'status': 'failed', 'errors': {'class_id': [f"Invalid pk \"{item['class_id']}\" - object does not exist."]}}
+            elif fitness_class.date_time < now:
+                results[index] = {'status': 'failed', 'errors': {'detail': "This class has already expired and cannot be booked."}}
+            else:
+                bookable.append((index, {'fitness_class': fitness_class, 'client_name': item['client_name'], 'client_email': item['client_email']}))
+
+        try:
+            outcomes = Booking.objects.bulk_book([item for _, item in bookable])
+        except IntegrityError:
+            # A concurrent request booked one of these clients after the duplicate check.
+            logger.warning("Bulk booking rolled back after a concurrent duplicate booking.", extra={"items": len(bookable)})
+            return Response({"detail": "Some bookings conflicted with a concurrent request. Please retry."}, status=status.HTTP_409_CONFLICT)
+
+        for (index, item), (booking, error) in zip(bookable, outcomes):
+            if booking is None:
+                results[index] = {'status': 'failed', 'errors': {'detail': error}}
+            else:
+                results[index] = {'status': 'booked', 'booking_id': booking.pk}
+
+        results = [
+            {'index': index, 'class_id': raw_item.get('class_id'), 'client_email': raw_item.get('client_email'), **result}
+            for index, (raw_item, result) in enumerate(zip(raw_items, results))
+        ]
+        booked = sum(1 for result in results if result['status'] == 'booked')
+        logger.info("Bulk booking request processed.", extra={"booked": booked, "items": len(results)})
+        return Response(
+            {'booked': booked, 'failed': len(results) - booked, 'results': results},
+            status=status.HTTP_201_CREATED if booked else status.HTTP_400_BAD_REQUEST)
+
+
 # GET /bookings
-class BookingListView(generics.ListAPIView):
+class BookingListView(ReplicaReadMixin, ConditionalListMixin, generics.ListAPIView):
     serializer_class = BookingListSerializer
     permission_classes = [AllowAny]
+    pagination_class = BookingCursorPagination
 
     def get_queryset(self):
         client_email = self.request.query_params.get('client_email', None)
 
         if client_email:
             try:
-                queryset = Booking.objects.filter(client_email=client_email).order_by('-booking_time')
-                logger.info(f"Successfully fetched {queryset.count()} bookings for client_email: {client_email}.")
+                queryset = Booking.objects.filter(client_email=client_email).select_related('fitness_class').with_free_seats().order_by('-booking_time')
+                logger.info("Request received for client bookings.", extra={"client_email": client_email})
                 return queryset
             except Exception as e:
-                logger.error(f"Error fetching bookings for client_email '{client_email}': {e}")
+                logger.error("Error fetching client bookings.", extra={"client_email": client_email, "error": str(e)})
                 return Booking.objects.none()
         
         logger.warning("Booking list request received without a client_email parameter.")
-        return Booking.objects.none()
\ No newline at end of file
+        return Booking.objects.none()
+
+    def paginate_queryset(self, queryset):
+        if not include_archived(self.request.query_params):
+            return super().paginate_queryset(queryset)
+        archived = self.get_serializer_class().project_queryset(get_archived_bookings(self.request), self.projection)
+        return self.paginator.paginate_querysets([queryset, archived], self.request, view=self)
+
+
+def get_archived_bookings(request):
+    """
+    The client's bookings of archived classes, for `include_archived`.
+    """
+    client_email = request.query_params.get('client_email')
+    if not client_email:
+        return ArchivedBooking.objects.none()
+    return ArchivedBooking.objects.filter(client_email=client_email).select_related('fitness_class')
+
+
+# POST /bookings/<id>/cancel
+class BookingCancelView(PrimaryPinMixin, APIView):
+    permission_classes = [AllowAny]
+
+    def post(self, request, pk, *args, **kwargs):
+        client_email = request.data.get('client_email')
+        if not client_email:
+            return Response({"client_email": ["This field is required."]}, status=status.HTTP_400_BAD_REQUEST)
+
+        booking = Booking.objects.select_related('fitness_class').filter(pk=pk, client_email=client_email).first()
+        if booking is None:
+            logger.warning("Cancellation failed, booking not found.", extra={"client_email": client_email, "booking_id": pk})
+            return Response({"detail": "Booking not found."}, status=status.HTTP_404_NOT_FOUND)
+        if booking.fitness_class.date_time < timezone.now():
+            return Response(
+                {"detail": "This class has already started and cannot be cancelled."},
+                status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            Booking.objects.cancel(booking)
+        except Booking.DoesNotExist:
+            # A concurrent request cancelled it first.
+            return Response({"detail": "Booking not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        promoted = booking.promoted_booking
+        logger.info("Booking cancelled.", extra={"client_email": client_email, "booking_id": pk, "promoted": promoted is not None})
+        return Response({"detail": "Booking cancelled.", "waitlist_promoted": promoted is not None})
+
+
+# GET, POST /waitlist
+class WaitlistView(APIView):
+    permission_classes = [AllowAny]
+
+    def get(self, request, *args, **kwargs):
+        client_email = request.query_params.get('client_email')
+        if not client_email:
+            logger.warning("Waitlist request received without a client_email parameter.")
+            return Response([])
+        entries = (
+            WaitlistEntry.objects.filter(client_email=client_email)
+            .with_position()
+            .select_related('fitness_class')
+            .order_by('fitness_class__date_time', 'id')
+        )
+        return Response(WaitlistEntrySerializer(entries, many=True, context={'request': request}).data)
+
+    @idempotent('waitlist')
+    def post(self, request, *args, **kwargs):
+        client_email = request.data.get('client_email', 'unknown')
+        serializer = WaitlistJoinSerializer(data=request.data)
+        if not serializer.is_valid():
+            logger.error("Waitlist request failed due to invalid data.", extra={"client_email": client_email, "errors": serializer.errors})
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        fitness_class = serializer.validated_data['fitness_class']
+        if fitness_class.date_time < timezone.now():
+            return Response(
+                {"detail": "This class has already expired and cannot be booked."},
+                status=status.HTTP_400_BAD_REQUEST)
+        if fitness_class.available_slots > 0:
+            return Response(
+                {"detail": "This class still has available slots. Book it directly."},
+                status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            entry = serializer.save()
+        except IntegrityError:
+            return Response({"non_field_errors": ["You are already on the waitlist for this class."]}, status=status.HTTP_400_BAD_REQUEST)
+
+        entry = WaitlistEntry.objects.with_position().select_related('fitness_class').get(pk=entry.pk)
+        logger.info("Client joined waitlist.", extra={"client_email": client_email, "class_id": fitness_class.pk, "position": entry.position})
+        return Response(WaitlistEntrySerializer(entry, context={'request': request}).data, status=status.HTTP_201_CREATED)
+
+
+# DELETE /waitlist/<id>
+class WaitlistEntryDeleteView(APIView):
+    permission_classes = [AllowAny]
+
+    def delete(self, request, pk, *args, **kwargs):
+        client_email = request.query_params.get('client_email')
+        if not client_email or not WaitlistEntry.objects.filter(pk=pk, client_email=client_email).delete()[0]:
+            return Response({"detail": "Waitlist entry not found."}, status=status.HTTP_404_NOT_FOUND)
+        logger.info("Client left waitlist.", extra={"client_email": client_email, "entry_id": pk})
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+#####################
+# --- Async API ---
+#####################
+
+# Native async versions of the read endpoints for ASGI deployments. They skip
+# DRF's sync request cycle, fetch the page with the async ORM, and serialize
+# from already-loaded rows, so a single worker can interleave many slow
+# clients without a thread per request.
+
+class AsyncListView(View):
+    pagination_class = None
+    serializer_class = None
+
+    def get_queryset(self, request):
+        raise NotImplementedError
+
+    def get_querysets(self, request):
+        # Querysets whose pages are merged into one, see KeysetCursorPagination.paginate_querysets().
+        return [self.get_queryset(request)]
+
+    async def get(self, request, *args, **kwargs):
+        drf_request = Request(request)
+        paginator = self.pagination_class()
+        try:
+            projection = parse_projection(drf_request.query_params, self.serializer_class)
+        except ValidationError as e:
+            return JsonResponse(e.detail, status=status.HTTP_400_BAD_REQUEST)
+        querysets = [self.serializer_class.project_queryset(queryset, projection) for queryset in self.get_querysets(drf_request)]
+        try:
+            page = await paginator.apaginate_querysets(querysets, drf_request)
+        except NotFound as e:
+            return JsonResponse({"detail": str(e.detail)}, status=status.HTTP_404_NOT_FOUND)
+        # Same ETag as the DRF views for the same page.
+        etag = paginator.get_etag(*get_etag_parts(request.GET, projection))
+        not_modified = conditional_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+        data = serialize_page(self.serializer_class, page, {'request': drf_request, **projection})
+        return JsonResponse({
+            'next': paginator.get_next_link(),
+            'previous': paginator.get_previous_link(),
+            'results': data,
+        }, headers={'ETag': etag})
+
+
+# GET /async/classes
+class AsyncFitnessClassListView(ReplicaReadMixin, AsyncListView):
+    pagination_class = FitnessClassCursorPagination
+    serializer_class = FitnessClassSerializer
+
+    async def get(self, request, *args, **kwargs):
+        params = request.GET
+        cache_key = await acatalogue_cache_key(
+            request, 'classes', params.get('timezone', ''), params.get('cursor', ''), params.get('page_size', ''),
+            params.get('fields', ''), params.get('compact', ''),
+        )
+        cached = None if self.pinned_to_primary else await aget_cached_response(cache_key)
+        if cached is not None:
+            data, etag = cached
+            response = conditional_response(request, etag) or JsonResponse(data, headers={'ETag': etag})
+            response['X-Cache'] = 'HIT'
+            return response
+
+        response = await super().get(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            await aset_cached_response(cache_key, (json.loads(response.content), response['ETag']))
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def get_queryset(self, request):
+        logger.info("Request received for list of upcoming classes.")
+        return FitnessClass.objects.upcoming().with_free_seats()
+
+
+# GET /async/bookings
+class AsyncBookingListView(ReplicaReadMixin, AsyncListView):
+    pagination_class = BookingCursorPagination
+    serializer_class = BookingListSerializer
+
+    def get_queryset(self, request):
+        client_email = request.query_params.get('client_email', None)
+        if client_email:
+            logger.info("Request received for client bookings.", extra={"client_email": client_email})
+            return Booking.objects.filter(client_email=client_email).select_related('fitness_class').with_free_seats()
+        logger.warning("Booking list request received without a client_email parameter.")
+        return Booking.objects.none()
+
+    def get_querysets(self, request):
+        querysets = super().get_querysets(request)
+        if include_archived(request.query_params):
+            querysets.append(get_archived_bookings(request))
+        return querysets
+
+
+# GET /classes/stream
+class SlotStreamView(View):
+    """
+    Server-Sent Events stream of `{class_id, available_slots}` changes, so
+    clients watching seats fill up hold one connection instead of polling
+    /classes/. Serve it under ASGI (omnify.asgi): each open stream then costs
+    a queue on the event loop rather than a worker thread.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+        class_id = request.GET.get('class_id')
+        try:
+            after_seq = int(last_event_id) if last_event_id else None
+            class_ids = {int(value) for value in class_id.split(',')} if class_id else None
+        except ValueError:
+            return JsonResponse({"detail": "Last-Event-ID and class_id must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+
+        logger.info("Slot stream opened.", extra={"last_event_id": after_seq})
+        response = StreamingHttpResponse(stream_events(after_seq, class_ids), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Stop nginx from buffering the stream.
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+# GET /bookings/export
+class BookingExportView(APIView):
+    """
+    Staff-only download of every booking joined with its class, streamed as
+    CSV or NDJSON (`export_format`) in constant memory. Filters: `start`/`end`
+    on booking time and `class_id`. Gzipped on the fly when the client accepts it.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        filters = BookingExportFilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        file_format = filters.validated_data['export_format']
+        compress = 'gzip' in request.headers.get('Accept-Encoding', '')
+
+        queryset = export_queryset(
+            start=filters.validated_data.get('start'),
+            end=filters.validated_data.get('end'),
+            class_ids=filters.validated_data.get('class_id'),
+        )
+        logger.info("Booking export started.", extra={"user_id": request.user.pk, "format": file_format, "gzip": compress})
+        response = StreamingHttpResponse(
+            stream_export(queryset, file_format, compress=compress),
+            content_type=CONTENT_TYPES[file_format],
+        )
+        response['Content-Disposition'] = f'attachment; filename="bookings.{file_format}"'
+        response['Vary'] = 'Accept-Encoding'
+        if compress:
+            response['Content-Encoding'] = 'gzip'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+# GET /metrics
+class MetricsView(APIView):
+    """
+    Staff-only request metrics of this process in Prometheus text format.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return HttpResponse(metrics_registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -43,6 +44,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover the rest of the middleware too.
+    'app.metrics.RequestMetricsMiddleware',
+    'app.hashing.CredentialPoolBusyMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -75,12 +79,49 @@ WSGI_APPLICATION = 'omnify.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# The primary is configured from DB_* environment variables and defaults to
+# the local SQLite file. DB_REPLICA_HOSTS is a comma-separated list of read
+# replicas of the primary, reached with the same name and credentials.
+# Connections are kept open for DB_CONN_MAX_AGE seconds; set DB_POOL=1 on
+# PostgreSQL to use psycopg's connection pool instead.
+def _database(host=None):
+    engine = os.environ.get('DB_ENGINE', 'django.db.backends.sqlite3')
+    database = {
+        'ENGINE': engine,
+        'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+        'USER': os.environ.get('DB_USER', ''),
+        'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+        'HOST': host if host is not None else os.environ.get('DB_HOST', ''),
+        'PORT': os.environ.get('DB_PORT', ''),
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
     }
-}
+    if os.environ.get('DB_POOL') == '1' and engine == 'django.db.backends.postgresql':
+        # Pooled connections are returned to the pool after each request.
+        database['OPTIONS'] = {'pool': True}
+        database['CONN_MAX_AGE'] = 0
+    return database
+
+
+_replica_hosts = [host.strip() for host in os.environ.get('DB_REPLICA_HOSTS', '').split(',') if host.strip()]
+
+DATABASES = {'default': _database()}
+for _index, _host in enumerate(_replica_hosts, start=1):
+    DATABASES[f'replica{_index}'] = _database(_host)
+
+# Read replicas for the class and booking list endpoints (app.routers).
+DATABASE_REPLICAS = [f'replica{index}' for index in range(1, len(_replica_hosts) + 1)]
+DATABASE_ROUTERS = ['app.routers.PrimaryReplicaRouter']
+
+# Adds a stand-in replica alias for the tests when none is configured.
+TEST_RUNNER = 'omnify.test_runner.ReplicaTestRunner'
+
+# Seconds a client stays on the primary after booking or cancelling, longer
+# than the expected replication lag.
+REPLICA_PIN_SECONDS = 5
+# Cache holding those pins by client email, for clients without the pin cookie.
+# Must be shared by every worker for the pin to follow the client across them.
+REPLICA_PIN_CACHE_ALIAS = 'default'
 
 
 # Password validation
@@ -132,7 +173,7 @@ AUTH_USER_MODEL = 'app.CustomUser'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'app.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -152,8 +193,89 @@ SIMPLE_JWT = {
     "ALGORITHM": "HS256",
     "SIGNING_KEY": SECRET_KEY,
     "AUTH_TOKEN_CLASSES": ("rest_framework_simplejwt.tokens.AccessToken",),
+    "TOKEN_OBTAIN_SERIALIZER": "app.serializers.TokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "app.serializers.TokenRefreshSerializer",
 }
 
+# --- Cache config ---
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'omnify',
+    }
+}
+
+# Cache alias and TTL (seconds) for rendered class list pages. Writes invalidate
+# pages immediately by bumping the catalogue version; the TTL only bounds how
+# long a class that has just started can still be listed. The bump only reaches
+# workers sharing the cache, so pages are cached only when the alias is a
+# shared backend; with a process-local cache such as LocMemCache they are not.
+CATALOGUE_CACHE_ALIAS = 'default'
+CATALOGUE_CACHE_TIMEOUT = 30
+
+# Stored responses for retried POST /api/book/ requests carrying an Idempotency-Key.
+# Must be a cache every worker shares, or a retry reaching another worker books
+# again; `manage.py check --deploy` warns about a process-local one.
+IDEMPOTENCY_CACHE_ALIAS = 'default'
+IDEMPOTENCY_KEY_TTL = 60 * 60 * 24
+
+# Shards per class when an admin shards the seats of a high-demand class.
+# Concurrent bookings for it then contend on one of this many rows.
+SLOT_SHARD_COUNT = 8
+
+# How many days ahead recurring class schedules are materialized into classes,
+# by the admin action and the materialize_schedules command.
+SCHEDULE_HORIZON_DAYS = 90
+
+# Classes that started more than this many days ago are moved, with their
+# bookings, to the archive tables by the archive_classes command.
+ARCHIVE_AFTER_DAYS = 365
+
+# Admin changelists count at most this many rows instead of running a full
+# COUNT(*) on every page load (see app.admin.EstimatedCountPaginator).
+ADMIN_COUNT_LIMIT = 10000
+
+# Server-Sent Events stream of slot changes (/api/classes/stream/). The last
+# BUFFER_SIZE events are kept so reconnecting clients can resume from
+# Last-Event-ID; streams close after MAX_DURATION seconds and clients reconnect.
+SLOT_EVENT_STREAM = {
+    'BUFFER_SIZE': 1000,
+    'SUBSCRIBER_QUEUE_SIZE': 100,
+    'HEARTBEAT_INTERVAL': 15,
+    'MAX_DURATION': 300,
+    'RETRY_MS': 3000,
+}
+
+# Password hashing and verification run on a small dedicated thread pool
+# (app.hashing). Beyond MAX_PENDING queued or running calls, register and
+# login answer 503 with Retry-After instead of tying up request workers.
+# Each pending call holds a request thread while it waits, so MAX_PENDING
+# must stay below the number of request threads per server process (e.g.
+# gunicorn --threads), or a login burst can still occupy all of them.
+PASSWORD_HASHING_POOL = {
+    'ENABLED': True,
+    'MAX_WORKERS': 2,
+    'MAX_PENDING': int(os.environ.get('PASSWORD_HASHING_MAX_PENDING', 4)),
+    'RETRY_AFTER': 1,
+}
+
+# Users resolved from access tokens are cached for this many seconds.
+# CustomUser.save() and delete() evict the entry straight away. Only a shared
+# backend is used for this; with a process-local cache such as LocMemCache,
+# every request loads the user from the DB, so no worker keeps stale flags.
+AUTH_USER_CACHE_ALIAS = 'default'
+AUTH_USER_CACHE_TIMEOUT = 60
+
+# In-process bloom filter in front of the refresh-token blacklist (app.tokens).
+# Processes learn about each other's writes through a version key in this
+# cache, so the filter is only used when it is a shared backend (Redis,
+# memcached, database or file-based). With a process-local cache such as
+# the default LocMemCache, every refresh checks the blacklist in the DB.
+TOKEN_BLACKLIST_CACHE_ALIAS = 'default'
+TOKEN_BLACKLIST_FILTER_CAPACITY = 100_000
+TOKEN_BLACKLIST_FILTER_ERROR_RATE = 0.001
+TOKEN_BLACKLIST_FILTER_REBUILD_INTERVAL = 300
+
 # --- Logging config ---
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -165,10 +287,12 @@ LOGGING = {
     'disable_existing_loggers': False,
     'formatters': {
         'verbose': {
+            '()': 'app.log.KeyValueFormatter',
             'format': '{levelname} {asctime} {module} {process:d} {thread:d} {message}',
             'style': '{',
         },
         'simple': {
+            '()': 'app.log.KeyValueFormatter',
             'format': '{levelname} {message}',
             'style': '{',
         },
@@ -198,4 +322,24 @@ LOGGING = {
             'propagate': False,
         },
     }
+}
+
+# Per-endpoint wall time, query count and time, serializer time and response
+# size (app.metrics), reported in a Server-Timing header and aggregated into
+# histograms served to staff at /api/metrics/.
+REQUEST_METRICS = {
+    'ENABLED': True,
+    'SERVER_TIMING': True,
+}
+
+# Moves the handlers of these loggers behind a non-blocking queue drained by a
+# background thread in batches. When the queue is full, records are dropped
+# per OVERFLOW_POLICY ('drop_newest' or 'drop_oldest') and counted.
+ASYNC_LOGGING = {
+    'ENABLED': True,
+    'LOGGERS': ['app'],
+    'QUEUE_SIZE': 10000,
+    'BATCH_SIZE': 256,
+    'FLUSH_INTERVAL': 0.5,
+    'OVERFLOW_POLICY': 'drop_newest',
 }
\ No newline at end of file
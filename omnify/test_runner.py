@@ -0,0 +1,22 @@
+"""
+Test runner that gives the replica routing tests a database to route to.
+
+Without DB_REPLICA_HOSTS, settings define no replica aliases. The runner adds
+a stand-in `replica1`, configured like the primary, before the test
+databases are created; the tests get a separate database for it. Reads only
+go to it where a test lists it in DATABASE_REPLICAS.
+"""
+import copy
+
+from django.db import connections
+from django.test.runner import DiscoverRunner
+
+STAND_IN_REPLICA = 'replica1'
+
+
+class ReplicaTestRunner(DiscoverRunner):
+
+    def setup_databases(self, **kwargs):
+        if STAND_IN_REPLICA not in connections:
+            connections.settings[STAND_IN_REPLICA] = copy.deepcopy(connections.settings['default'])
+        return super().setup_databases(**kwargs)